@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基于 asyncio 的最小 HTTP/1.1 客户端（只依赖标准库）
+
+供压测和并发导入工具使用：每个主机维护一个 keep-alive 连接池，
+支持 Content-Length 和 chunked 响应、JSON 请求体、https。
+不处理重定向、Cookie 和代理。
+
+    client = AsyncHttpClient('http://127.0.0.1:8787', max_connections=64)
+    response = await client.request('GET', '/api/products', params={'page': 1})
+    data = response.json()
+    await client.close()
+"""
+
+import asyncio
+import json
+import ssl
+from urllib.parse import urlencode, urlsplit
+
+class HttpError(Exception):
+    """连接失败、超时或响应格式错误"""
+
+class Response:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.status_code = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def text(self):
+        return self.body.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.body)
+
+class _Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self):
+        self.writer.close()
+
+async def _read_headers(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise HttpError('连接已被服务器关闭')
+    parts = status_line.decode('latin-1').split(' ', 2)
+    if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+        raise HttpError(f"无效的状态行: {status_line!r}")
+    status = int(parts[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return status, headers
+
+async def _read_chunked(reader):
+    chunks = []
+    while True:
+        size_line = await reader.readline()
+        size = int(size_line.split(b';')[0].strip() or b'0', 16)
+        if size == 0:
+            # 跳过 trailer 直到空行
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            return b''.join(chunks)
+        chunks.append(await reader.readexactly(size))
+        await reader.readexactly(2)
+
+class AsyncHttpClient:
+    """单个主机的 keep-alive 连接池，最多 max_connections 个并发连接"""
+
+    def __init__(self, base_url, max_connections=100, timeout=60, headers=None):
+        url = urlsplit(base_url)
+        self.base_url = base_url.rstrip('/')
+        self.scheme = url.scheme or 'http'
+        self.host = url.hostname
+        self.port = url.port or (443 if self.scheme == 'https' else 80)
+        self.base_path = url.path.rstrip('/')
+        self.timeout = timeout
+        self.headers = dict(headers or {})
+        self._ssl = ssl.create_default_context() if self.scheme == 'https' else None
+        self._idle = []
+        self._slots = asyncio.Semaphore(max_connections)
+        self.connections_opened = 0
+
+    async def _acquire(self):
+        while self._idle:
+            conn = self._idle.pop()
+            if not conn.reader.at_eof():
+                return conn
+            conn.close()
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=self._ssl), self.timeout)
+        self.connections_opened += 1
+        return _Connection(reader, writer)
+
+    async def request(self, method, path, params=None, json_body=None, data=None, headers=None):
+        """发送请求并读取完整响应；连接错误和超时抛出 HttpError"""
+        target = self.base_path + path
+        if params:
+            target += ('&' if '?' in target else '?') + urlencode(params)
+        request_headers = {'Host': f"{self.host}:{self.port}", 'Connection': 'keep-alive',
+                           'Accept': 'application/json', **self.headers, **(headers or {})}
+        if json_body is not None:
+            data = json.dumps(json_body, ensure_ascii=False).encode('utf-8')
+            request_headers.setdefault('Content-Type', 'application/json')
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if data is not None:
+            request_headers['Content-Length'] = str(len(data))
+        head = f"{method} {target} HTTP/1.1\r\n" + ''.join(f"{k}: {v}\r\n" for k, v in request_headers.items()) + "\r\n"
+
+        async with self._slots:
+            conn = await self._acquire()
+            try:
+                conn.writer.write(head.encode('latin-1') if data is None else head.encode('latin-1') + data)
+                await conn.writer.drain()
+                status, response_headers, body = await asyncio.wait_for(self._read_response(conn.reader, method),
+                                                                        self.timeout)
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError, HttpError) as e:
+                conn.close()
+                raise HttpError(f"{method} {path} 失败: {e!r}") from e
+
+            if response_headers.get('connection', '').lower() == 'close':
+                conn.close()
+            else:
+                self._idle.append(conn)
+        return Response(status, response_headers, body)
+
+    async def _read_response(self, reader, method):
+        status, headers = await _read_headers(reader)
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            return status, headers, b''
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            return status, headers, await _read_chunked(reader)
+        if 'content-length' in headers:
+            return status, headers, await reader.readexactly(int(headers['content-length']))
+        # 既没有长度也不是chunked：读到连接关闭为止
+        headers['connection'] = 'close'
+        return status, headers, await reader.read()
+
+    async def get(self, path, **kwargs):
+        return await self.request('GET', path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request('POST', path, **kwargs)
+
+    async def close(self):
+        while self._idle:
+            self._idle.pop().close()
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多文件并发导入工具（AIMD 自适应并发）
+
+取代 Node 导入脚本里固定的文件间/批次间休眠：
+- 读取和上传重叠：后台进程池预读、校验后面的文件（validate_csv），
+  同时上传当前文件的分块，内存中最多保留 --read-ahead 个文件
+- 同时有 N 个分块在上传，N 按 AIMD 调整：请求成功且延迟不超过基线的
+  --latency-factor 倍时每轮 N+1，遇到 429/5xx/连接错误时 N 减半
+  （同一轮内的多个失败只减一次），失败的分块退避后重试
+- 没有SKU的行先按名称和公司补上确定性SKU（csv_transform.content_skus），再用 sku_filter
+  丢弃数据库中确定已存在的行；分块重试或中途中断后重跑同一条命令时，已提交的行
+  都会按SKU被跳过，不会重复插入（名称和公司都相同的行只保留第一次导入的那一行）
+- --metrics-jsonl / --metrics-prom 在运行期间输出行数、字节数、请求延迟直方图和重试次数（见 import_metrics）
+
+用法:
+    python3 async_import.py 9.16数据/ -o 9_16_import_stats.json
+    python3 async_import.py 'converted/*_part_*.csv' --max-concurrency 16 --batch-size 500
+    python3 async_import.py part_001.csv --base-url http://127.0.0.1:8787 --password admin123
+    python3 async_import.py 9.16数据/ --metrics-jsonl import_metrics.jsonl --metrics-prom /var/lib/node_exporter/webapp_import.prom
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from async_http import AsyncHttpClient, HttpError
+from csv_common import expand_inputs
+from csv_transform import fill_content_skus
+from d1_client import API_BASE_URL, API_PASSWORD, API_USERNAME, ApiClient, ApiError
+from import_metrics import (BYTES_RECEIVED, BYTES_SENT, REQUEST_SECONDS, REQUESTS, RETRIES, ROWS_ACCEPTED,
+                            ROWS_FAILED, ROWS_READ, ROWS_REJECTED, ROWS_SENT, ROWS_SKIPPED, Metrics,
+                            add_metrics_arguments, metrics_from_args)
+from sku_filter import load_sku_index
+from validate_csv import load_valid_products
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+BATCH_ENDPOINT = '/api/products/batch'
+
+class AimdWindow:
+    """AIMD 并发窗口：健康的成功请求让窗口每轮 +1，限流或服务端错误让窗口减半"""
+
+    def __init__(self, initial=2, minimum=1, maximum=32, latency_factor=2.0):
+        self.size = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_factor = latency_factor
+        self.in_flight = 0
+        self.base_latency = None
+        self.last_decrease = 0.0
+        self.decreases = 0
+        self.peak = self.size
+        self._cond = asyncio.Condition()
+
+    @property
+    def limit(self):
+        return max(self.minimum, int(self.size))
+
+    async def acquire(self):
+        """等待空位，返回发出请求的时间（用于判断失败是否属于已经减过窗口的那一轮）"""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+            return time.monotonic()
+
+    async def release(self, started, ok, latency, throttled=True):
+        """ok 为成功（2xx）；失败时只有 throttled（429/5xx/连接错误）才缩小窗口，
+        401 等与服务端负载无关的失败只释放位置"""
+        async with self._cond:
+            self.in_flight -= 1
+            if ok:
+                # 基线取观察到的最小延迟，缓慢上浮以跟上服务端的正常变化
+                self.base_latency = latency if self.base_latency is None else min(latency, self.base_latency * 1.01)
+                if latency <= self.latency_factor * self.base_latency:
+                    self.size = min(self.maximum, self.size + 1 / self.size)
+                    self.peak = max(self.peak, self.size)
+            elif throttled and started >= self.last_decrease:
+                self.size = max(self.minimum, self.size / 2)
+                self.last_decrease = time.monotonic()
+                self.decreases += 1
+            self._cond.notify_all()
+
+def load_products(path, dedupe_names=True):
+    """在进程池中读取、校验文件并补上确定性SKU，返回 (商品列表, 被拒绝的行)"""
+    products, rejected = load_valid_products(path, dedupe_names)
+    fill_content_skus(products)
+    return products, rejected
+
+class AsyncImporter:
+    def __init__(self, client, api, window, batch_size=500, read_ahead=2, max_retries=8,
+                 sku_index=None, dedupe_names=True, metrics=None):
+        self.client = client
+        self.api = api
+        self.window = window
+        self.batch_size = batch_size
+        self.read_ahead = read_ahead
+        self.max_retries = max_retries
+        self.sku_index = sku_index
+        self.dedupe_names = dedupe_names
+        self.metrics = metrics or Metrics('async_import')
+        self.files = []
+        self.imported = 0
+        self.retries = 0
+        self._login_lock = asyncio.Lock()
+
+    # ---- 读取 ----
+
+    async def produce(self, paths, queue):
+        """按顺序预读文件：当前文件的分块排队上传时，后面 read_ahead 个文件已在进程池中解析"""
+        loop = asyncio.get_running_loop()
+        pending = deque()
+        remaining = iter(paths)
+        with ProcessPoolExecutor(max_workers=self.read_ahead) as pool:
+            def submit_next():
+                path = next(remaining, None)
+                if path is not None:
+                    pending.append((path, loop.run_in_executor(pool, load_products, path, self.dedupe_names)))
+
+            for _ in range(self.read_ahead):
+                submit_next()
+            while pending:
+                path, future = pending.popleft()
+                submit_next()
+                stats = {'file': path, 'rows': 0, 'rejected': 0, 'skipped': 0, 'chunks': 0, 'pending': 0,
+                         'success': 0, 'errors': 0, 'failed_rows': 0, 'messages': [], 'queued': False}
+                self.files.append(stats)
+                try:
+                    products, rejected = await future
+                except Exception as e:
+                    stats['error'] = str(e)
+                    print(f"❌ {path}: 读取失败: {e}")
+                    continue
+                stats['rows'] = len(products) + len(rejected)
+                stats['rejected'] = len(rejected)
+                if self.sku_index is not None:
+                    products, stats['skipped'] = self.sku_index.filter_new(products)
+                self.metrics.inc(ROWS_READ, stats['rows'])
+                self.metrics.inc(ROWS_REJECTED, stats['rejected'], stage='local')
+                self.metrics.inc(ROWS_SKIPPED, stats['skipped'])
+
+                for i in range(0, len(products), self.batch_size):
+                    stats['chunks'] += 1
+                    stats['pending'] += 1
+                    await queue.put((stats, products[i:i + self.batch_size]))
+                stats['queued'] = True
+                self._maybe_finish(stats)
+        await queue.put(None)
+
+    # ---- 上传 ----
+
+    async def _relogin(self, stale_token):
+        async with self._login_lock:
+            if self.client.headers.get('Authorization') == f"Bearer {stale_token}":
+                token = await asyncio.get_running_loop().run_in_executor(None, self.api.login, True)
+                self.client.headers['Authorization'] = f"Bearer {token}"
+
+    async def upload(self, stats, products, started):
+        """上传一个分块；调用前已占用一个窗口位置，返回前释放"""
+        # 只序列化一次，重试时复用同一个请求体，字节数也按实际发送的计
+        body = json.dumps({'products': products}, ensure_ascii=False).encode('utf-8')
+        metrics = self.metrics
+        metrics.inc(ROWS_SENT, len(products))
+        attempt = 0
+        relogged = False
+        while True:
+            token = self.client.headers.get('Authorization', '')[7:]
+            t0 = time.perf_counter()
+            response = None
+            try:
+                response = await self.client.post(BATCH_ENDPOINT, data=body,
+                                                  headers={'Content-Type': 'application/json'})
+            except HttpError as e:
+                error = str(e)
+            latency = time.perf_counter() - t0
+            status = response.status if response is not None else None
+            throttled = status is None or status in RETRY_STATUS
+            metrics.observe(REQUEST_SECONDS, latency, endpoint=f"POST {BATCH_ENDPOINT}")
+            metrics.inc(REQUESTS, endpoint=f"POST {BATCH_ENDPOINT}", status=status or 'error')
+            metrics.inc(BYTES_SENT, len(body))
+            if response is not None:
+                metrics.inc(BYTES_RECEIVED, len(response.body))
+            ok = status is not None and 200 <= status < 300
+            await self.window.release(started, ok, latency, throttled)
+
+            if status == 401 and not relogged:
+                relogged = True
+                await self._relogin(token)
+            elif throttled and attempt < self.max_retries:
+                delay = random.uniform(0, min(30.0, 0.5 * 2 ** attempt))
+                retry_after = response.headers.get('retry-after', '') if response is not None else ''
+                if retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+                attempt += 1
+                self.retries += 1
+                metrics.inc(RETRIES)
+                await asyncio.sleep(delay)
+            else:
+                break
+            started = await self.window.acquire()
+
+        if status == 200:
+            data = response.json().get('data', {})
+            stats['success'] += data.get('successCount', 0)
+            stats['errors'] += data.get('errorCount', 0)
+            stats['messages'].extend(data.get('errors', [])[:5])
+            self.imported += data.get('successCount', 0)
+            metrics.inc(ROWS_ACCEPTED, data.get('successCount', 0))
+            metrics.inc(ROWS_REJECTED, data.get('errorCount', 0), stage='server')
+        else:
+            if response is not None:
+                try:
+                    error = response.json().get('error')
+                except ValueError:
+                    error = response.text[:200]
+            stats['failed_rows'] += len(products)
+            metrics.inc(ROWS_FAILED, len(products))
+            stats['messages'].append(f"分块上传失败 (HTTP {status}): {error}")
+        stats['pending'] -= 1
+        self._maybe_finish(stats)
+
+    def _maybe_finish(self, stats):
+        if stats['queued'] and stats['pending'] == 0:
+            icon = '✅' if not stats['failed_rows'] else '⚠️'
+            print(f"{icon} {os.path.basename(stats['file'])}: {stats['rows']} 行，导入 {stats['success']}，"
+                  f"服务端拒绝 {stats['errors']}，已存在跳过 {stats['skipped']}，校验拒绝 {stats['rejected']}"
+                  + (f"，失败 {stats['failed_rows']}" if stats['failed_rows'] else '')
+                  + f"  (并发窗口 {self.window.limit})")
+
+    async def dispatch(self, queue):
+        tasks = set()
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            started = await self.window.acquire()
+            task = asyncio.create_task(self.upload(*item, started))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def run(self, paths):
+        queue = asyncio.Queue(maxsize=self.window.maximum * 2)
+        await asyncio.gather(self.produce(paths, queue), self.dispatch(queue))
+        return self.files
+
+def build_report(files, started_at, ended_at):
+    """与 Node 导入脚本的 *_import_stats.json 字段一致，另附每个文件的明细"""
+    failed = [f for f in files if f.get('error') or f['failed_rows']]
+    return {
+        'totalFiles': len(files),
+        'processedFiles': len(files),
+        'successFiles': len(files) - len(failed),
+        'failedFiles': len(failed),
+        'totalRecords': sum(f['rows'] for f in files),
+        'importedRecords': sum(f['success'] for f in files),
+        'startTime': started_at.isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+        'endTime': ended_at.isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+        'files': [{k: v for k, v in f.items() if k not in ('pending', 'queued')} for f in files],
+    }
+
+async def import_files(paths, args, metrics):
+    api = ApiClient(args.base_url, args.username, args.password, metrics=metrics)
+    token = api.login()
+    sku_index = None if args.no_sku_filter else load_sku_index(api)
+
+    client = AsyncHttpClient(args.base_url, max_connections=args.max_concurrency, timeout=args.timeout,
+                             headers={'Authorization': f"Bearer {token}"})
+    window = AimdWindow(args.initial_concurrency, 1, args.max_concurrency, args.latency_factor)
+    importer = AsyncImporter(client, api, window, args.batch_size, args.read_ahead, args.max_retries,
+                             sku_index, not args.allow_duplicate_names, metrics)
+    try:
+        await importer.run(paths)
+    finally:
+        await client.close()
+        api.close()
+    return importer
+
+def main():
+    parser = argparse.ArgumentParser(description='多文件并发导入（AIMD 自适应并发）')
+    parser.add_argument('inputs', nargs='+', help='CSV文件、目录或通配符')
+    parser.add_argument('--base-url', default=API_BASE_URL, help='API地址')
+    parser.add_argument('--username', default=API_USERNAME)
+    parser.add_argument('--password', default=API_PASSWORD)
+    parser.add_argument('--batch-size', type=int, default=500, help='每个请求上传的行数')
+    parser.add_argument('--initial-concurrency', type=int, default=2, help='初始并发分块数')
+    parser.add_argument('--max-concurrency', type=int, default=32, help='并发分块数上限')
+    parser.add_argument('--latency-factor', type=float, default=2.0,
+                        help='延迟超过基线的多少倍时停止扩大并发窗口')
+    parser.add_argument('--read-ahead', type=int, default=2, help='预读并校验的文件数')
+    parser.add_argument('--max-retries', type=int, default=8, help='每个分块的最大重试次数')
+    parser.add_argument('--timeout', type=float, default=120, help='单个请求超时（秒）')
+    parser.add_argument('--no-sku-filter', action='store_true', help='不预先过滤已存在的SKU')
+    parser.add_argument('--allow-duplicate-names', action='store_true',
+                        help='不拒绝名称和公司相同的重复行（只检查SKU重复）')
+    parser.add_argument('-o', '--output', help='导入统计保存为JSON')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        print("❌ 没有找到CSV文件")
+        return
+
+    print(f"🚀 导入 {len(paths)} 个文件到 {args.base_url}，每块 {args.batch_size} 行，"
+          f"并发 {args.initial_concurrency}→{args.max_concurrency}")
+    started_at = datetime.now(timezone.utc)
+    started = time.monotonic()
+    metrics = metrics_from_args('async_import', args)
+    try:
+        importer = asyncio.run(import_files(paths, args, metrics))
+    except ApiError as e:
+        print(f"❌ {e}")
+        return
+    finally:
+        metrics.close()
+    elapsed = time.monotonic() - started
+    report = build_report(importer.files, started_at, datetime.now(timezone.utc))
+    report['metrics'] = metrics.summary()
+
+    print(f"\n📊 完成: {report['successFiles']}/{report['totalFiles']} 个文件成功，"
+          f"导入 {report['importedRecords']}/{report['totalRecords']} 行，用时 {elapsed:.1f}s "
+          f"({report['importedRecords'] / elapsed if elapsed else 0:.0f} 行/秒)")
+    print(f"⚙️  并发窗口峰值 {importer.window.peak:.0f}，减半 {importer.window.decreases} 次，重试 {importer.retries} 次")
+    metrics.print_summary()
+    if report['failedFiles']:
+        print("⚠️  有文件未完全导入，重新运行同一命令即可补导（已导入的行会被跳过）")
+
+    if args.output:
+        tmp_path = args.output + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, args.output)
+        print(f"💾 统计已保存到 {args.output}")
+
+if __name__ == '__main__':
+    main()
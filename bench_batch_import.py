@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+/api/products/batch 批量导入吞吐量基准
+
+向本地实例发送 1k/10k 行的导入请求，每个规模重复多次，报告每个请求的耗时和行/秒；
+随后把同一批数据再导入一次，确认每一行都以“已存在”被逐行拒绝（test_duplicate_import.py
+依赖这个逐行报告）。
+
+--serve 会用同一份初始数据启动两个替身API：--import-mode row（改造前：每行一次SKU查询
+加一次插入）和 set（当前：整块一次 DB.batch），--d1-latency-ms 模拟每次D1查询的往返，
+最后并排给出两种方式的对比（替身库中默认管理员密码是 admin123）。
+也可以用 --target 直接压测 wrangler dev 等已启动的实例。
+
+用法:
+    python3 bench_batch_import.py --serve bench_import.sqlite --rows 100000 --d1-latency-ms 2 --password admin123
+    python3 bench_batch_import.py --target before=http://127.0.0.1:8787 --password admin123
+    python3 bench_batch_import.py --serve bench_import.sqlite --sizes 1000,10000 --repeat 5 --password admin123 -o batch.json
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import time
+import uuid
+
+from d1_client import API_PASSWORD, API_USERNAME, ApiClient
+from generate_test_data import FIELDS, generate_columns
+from load_test import start_standin
+from mock_api_server import prepare_database
+
+def make_products(rng, count, prefix):
+    """生成一批测试商品，SKU 带本次运行的前缀，保证都是新数据"""
+    columns = generate_columns(rng, 0, count)
+    products = []
+    for seq, row in enumerate(zip(*(columns[f] for f in FIELDS))):
+        product = dict(zip(FIELDS, row))
+        product['sku'] = f"{prefix}-{seq:07d}"
+        products.append(product)
+    return products
+
+def post_batch(api, products, timeout):
+    started = time.perf_counter()
+    response = api.post('/api/products/batch', json={'products': products}, timeout=timeout)
+    seconds = time.perf_counter() - started
+    result = response.json()
+    if response.status_code != 200 or not result.get('success'):
+        raise RuntimeError(f"导入失败 (HTTP {response.status_code}): {result.get('error')}")
+    return seconds, result['data']
+
+def bench_target(label, base_url, sizes, repeat, username, password, timeout, seed):
+    """对一个实例逐个规模地导入新数据和重复数据，返回结果列表"""
+    api = ApiClient(base_url, username, password, token_cache=None)
+    run_id = uuid.uuid4().hex[:8].upper()
+    results = []
+    try:
+        for size in sizes:
+            for i in range(repeat):
+                rng = random.Random(f"{seed}:{size}:{i}")
+                products = make_products(rng, size, f"BB-{run_id}-{size}-{i}")
+                seconds, data = post_batch(api, products, timeout)
+                dup_seconds, dup = post_batch(api, products, timeout)
+                result = {
+                    'target': label, 'size': size, 'run': i + 1,
+                    'seconds': seconds, 'rows_per_sec': data['successCount'] / seconds,
+                    'success': data['successCount'], 'errors': data['errorCount'],
+                    'dup_seconds': dup_seconds, 'dup_rows_per_sec': size / dup_seconds,
+                    'dup_rejected': dup['errorCount'],
+                    'dup_reported': sum('已存在' in e for e in dup['errors']),
+                }
+                results.append(result)
+                ok = result['success'] == size and result['dup_rejected'] == size and result['dup_reported'] == size
+                print(f"{'✅' if ok else '⚠️ '} [{label}] {size} 行 #{i + 1}: 新数据 {seconds:.2f}s "
+                      f"({result['rows_per_sec']:.0f} 行/秒，成功 {result['success']})，"
+                      f"重复数据 {dup_seconds:.2f}s（逐行报告已存在 {result['dup_reported']}/{size}）")
+    finally:
+        api.close()
+    return results
+
+def summarize(results):
+    """按 (目标, 规模) 取中位数"""
+    summary = {}
+    for r in results:
+        summary.setdefault((r['target'], r['size']), []).append(r)
+    rows = []
+    for (target, size), runs in summary.items():
+        median = sorted(runs, key=lambda r: r['rows_per_sec'])[len(runs) // 2]
+        dup_median = sorted(runs, key=lambda r: r['dup_rows_per_sec'])[len(runs) // 2]
+        rows.append({'target': target, 'size': size, 'rows_per_sec': median['rows_per_sec'],
+                     'seconds': median['seconds'], 'dup_rows_per_sec': dup_median['dup_rows_per_sec']})
+    return rows
+
+def print_summary(rows):
+    print(f"\n{'目标':<10} {'行数':>8} {'耗时(s)':>9} {'新数据 行/秒':>14} {'重复数据 行/秒':>16}")
+    for r in rows:
+        print(f"{r['target']:<10} {r['size']:>8} {r['seconds']:>9.2f} {r['rows_per_sec']:>14.0f} "
+              f"{r['dup_rows_per_sec']:>16.0f}")
+    targets = list(dict.fromkeys(r['target'] for r in rows))
+    if len(targets) == 2:
+        before = {r['size']: r for r in rows if r['target'] == targets[0]}
+        for r in rows:
+            if r['target'] == targets[1] and r['size'] in before:
+                print(f"📈 {r['size']} 行: {targets[1]} 是 {targets[0]} 的 "
+                      f"{r['rows_per_sec'] / before[r['size']]['rows_per_sec']:.1f} 倍")
+
+def serve_modes(db_path, rows, d1_latency_ms):
+    """用同一份初始数据分别以 row / set 导入方式启动替身API，返回 [(标签, 进程, base_url)]"""
+    prepare_database(db_path, rows)
+    started = []
+    for mode in ('row', 'set'):
+        copy_path = f"{os.path.splitext(db_path)[0]}-{mode}.sqlite"
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(copy_path + suffix):
+                os.remove(copy_path + suffix)
+        shutil.copyfile(db_path, copy_path)
+        process, base_url = start_standin(copy_path, 0, extra_args=(
+            '--import-mode', mode, '--d1-latency-ms', str(d1_latency_ms)))
+        started.append((mode, process, base_url))
+    return started
+
+def main():
+    parser = argparse.ArgumentParser(description='/api/products/batch 批量导入吞吐量基准')
+    parser.add_argument('--target', action='append', default=[], metavar='LABEL=URL',
+                        help='要压测的实例，可重复（例如 before=http://127.0.0.1:8787）')
+    parser.add_argument('--serve', metavar='DB', help='启动逐行/集合式两个替身API并对比')
+    parser.add_argument('--rows', type=int, default=0, help='--serve 的数据库不存在时预先生成的行数')
+    parser.add_argument('--d1-latency-ms', type=float, default=1.0, help='--serve 时每次D1查询的模拟往返延迟')
+    parser.add_argument('--sizes', default='1000,10000', help='每个请求的行数，逗号分隔')
+    parser.add_argument('--repeat', type=int, default=3, help='每个规模重复次数（取中位数）')
+    parser.add_argument('--username', default=API_USERNAME)
+    parser.add_argument('--password', default=API_PASSWORD)
+    parser.add_argument('--timeout', type=float, default=600, help='单个请求超时（秒）')
+    parser.add_argument('--seed', default='bench', help='随机种子')
+    parser.add_argument('-o', '--output', help='结果保存为JSON')
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(',')]
+
+    targets = [tuple(t.split('=', 1)) for t in args.target]
+    processes = []
+    if args.serve:
+        started = serve_modes(args.serve, args.rows, args.d1_latency_ms)
+        processes = [p for _, p, _ in started]
+        targets += [(mode, url) for mode, _, url in started]
+    if not targets:
+        parser.error('需要 --target 或 --serve')
+
+    results = []
+    try:
+        for label, base_url in targets:
+            print(f"🚀 [{label}] {base_url}，规模 {sizes}，每个规模 {args.repeat} 次")
+            results += bench_target(label, base_url, sizes, args.repeat, args.username, args.password,
+                                    args.timeout, args.seed)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    summary = summarize(results)
+    print_summary(summary)
+
+    if args.output:
+        tmp_path = args.output + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'runs': results}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, args.output)
+        print(f"💾 结果已保存到 {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+商品列表 / 搜索 / 统计查询的性能基准
+
+按 src/index.tsx 中拼出的SQL原样构造查询（/api/products 的多字段搜索 + COUNT(*) 和游标分页、
+/api/search 的 FTS5 bm25 排序、/api/stats 的汇总表查询和原来的五个聚合查询），在不同数据量的本地
+SQLite 数据库上反复执行，报告每个场景的 p50/p95 延迟、EXPLAIN QUERY PLAN、
+按执行计划估算的扫描行数和SQLite虚拟机执行步数。结果保存为JSON，便于比较改动前后。
+搜索场景中以 _like 结尾的是三元组索引（migrations/0006）之前只用 LIKE 的写法，与同名场景对照。
+
+没有指定数据库时，用 generate_test_data.py 的批量导入模式生成 20k/200k/2M 行的数据库
+（缓存在 bench_data/ 下，相同种子生成的数据完全相同）。
+
+用法:
+    python3 bench_queries.py                                   # 20k/200k/2M 三档
+    python3 bench_queries.py --sizes 20000,200000 --iterations 50
+    python3 bench_queries.py --db bench_5m.sqlite --cases search_all,stats
+    python3 bench_queries.py --sizes 1000000 --cases search_all,search_all_like,search_sku_digits,search_sku_digits_like
+    python3 bench_queries.py --compare bench_results/before.json bench_results/after.json
+"""
+
+import argparse
+import base64
+import json
+import os
+import platform
+import re
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import datetime
+
+from d1_client import apply_migrations
+
+DEFAULT_SIZES = [20000, 200000, 2000000]
+DATA_DIR = 'bench_data'
+RESULTS_DIR = 'bench_results'
+PROGRESS_STEP = 1000
+
+DATA_COLUMNS = """id, name, company_name, price, stock, description, category, sku, status,
+             created_at, updated_at"""
+
+PRODUCTS_SORT_FIELDS = ['id', 'name', 'company_name', 'price', 'stock', 'created_at']
+CURSOR_MAX_LIMIT = 1000
+
+# 无筛选条件时的总数直接读 stats_totals 汇总行（migrations/0005）
+ROLLUP_COUNT_SQL = "SELECT total_products as total FROM stats_totals WHERE id = 1"
+
+TRIGRAM_MIN_CHARS = 3
+TRIGRAM_CONDITION = " AND id IN (SELECT rowid FROM products_trigram WHERE products_trigram MATCH ?)"
+
+def trigram_match_query(search, fields=None):
+    """与 src/index.tsx 的 trigramMatchQuery 相同：能走三元组索引时返回 MATCH 表达式，否则返回 None"""
+    if len(search) < TRIGRAM_MIN_CHARS or '%' in search or '_' in search:
+        return None
+    phrase = '"' + search.replace('"', '""') + '"'
+    return f"{{{' '.join(fields)}}} : {phrase}" if fields else phrase
+
+def build_products_filter(params, trigram=True):
+    """与 GET /api/products 相同的WHERE条件：返回 (where, 参数)，参数为空表示没有筛选条件
+
+    trigram=False 时搜索只用 LIKE（三元组索引迁移之前的查询，或索引不存在时的回退）
+    """
+    search = params.get('search') or ''
+    where = "WHERE status = 'active'"
+    args = []
+    if search:
+        search_fields = params.get('searchFields') or 'all'
+        pattern = f"%{search}%"
+        if search_fields == 'all':
+            match_query = trigram and trigram_match_query(search)
+            if match_query:
+                where += TRIGRAM_CONDITION
+                args.append(match_query)
+            where += " AND (name LIKE ? OR company_name LIKE ? OR description LIKE ? OR category LIKE ? OR sku LIKE ?)"
+            args += [pattern] * 5
+        else:
+            valid = ['name', 'company_name', 'description', 'category', 'sku']
+            columns = []
+            for field in search_fields.split(','):
+                if field.strip() in valid and field.strip() not in columns:
+                    columns.append(field.strip())
+            if columns:
+                match_query = trigram and trigram_match_query(search, columns)
+                if match_query:
+                    where += TRIGRAM_CONDITION
+                    args.append(match_query)
+                where += " AND (" + ' OR '.join(f"{c} LIKE ?" for c in columns) + ")"
+                args += [pattern] * len(columns)
+    if params.get('company'):
+        where += " AND company_name LIKE ?"
+        args.append(f"%{params['company']}%")
+    if params.get('category'):
+        where += " AND category LIKE ?"
+        args.append(f"%{params['category']}%")
+    if params.get('minPrice'):
+        where += " AND price >= ?"
+        args.append(float(params['minPrice']))
+    if params.get('maxPrice'):
+        where += " AND price <= ?"
+        args.append(float(params['maxPrice']))
+    if params.get('minStock'):
+        where += " AND stock >= ?"
+        args.append(int(params['minStock']))
+    return where, args
+
+def products_sort(params):
+    """校验后的 (排序字段, 方向)"""
+    sort_by = params.get('sortBy') or 'id'
+    sort_order = params.get('sortOrder') or 'DESC'
+    return (sort_by if sort_by in PRODUCTS_SORT_FIELDS else 'id',
+            'ASC' if sort_order.upper() == 'ASC' else 'DESC')
+
+def build_products_count(where, args):
+    """总数查询：没有筛选条件时读汇总行，否则 COUNT(*)"""
+    if not args:
+        return ROLLUP_COUNT_SQL, []
+    return f"SELECT COUNT(*) as total FROM products {where}", args
+
+def build_products_queries(params, trigram=True):
+    """与 GET /api/products 分页模式相同的SQL：返回 [(count_sql, 参数), (data_sql, 参数)]"""
+    page = int(params.get('page') or 1)
+    limit = int(params.get('limit') or 20)
+    offset = (page - 1) * limit
+    where, args = build_products_filter(params, trigram)
+    safe_sort_by, safe_sort_order = products_sort(params)
+
+    data_sql = f"""
+      SELECT {DATA_COLUMNS}
+      FROM products
+      {where}
+      ORDER BY {safe_sort_by} {safe_sort_order}
+      LIMIT ? OFFSET ?
+    """
+    return [build_products_count(where, args), (data_sql, args + [limit, offset])]
+
+def encode_cursor(sort_by, sort_order, value, row_id):
+    """游标：base64url 编码的JSON，记录排序方式和上一页最后一行的排序值、id（与 src/index.tsx 的 encodeCursor 相同）"""
+    payload = json.dumps({'s': sort_by, 'o': sort_order, 'v': value, 'id': row_id},
+                         ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """解析游标，格式不对时返回 None"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get('id'), int):
+        return None
+    return data
+
+def build_cursor_query(params, cursor=None, trigram=True):
+    """与 GET /api/products 游标模式相同的SQL：返回 (data_sql, 参数)，多取一行用来判断是否还有下一页
+
+    cursor 是 decode_cursor 的结果（第一页为 None），排序方式由调用方先确认与请求一致。
+    按 (排序字段, id) 做行值比较，每页只从上一页的位置继续读，不随页数变慢
+    """
+    limit = min(max(int(params.get('limit') or 20), 1), CURSOR_MAX_LIMIT)
+    where, args = build_products_filter(params, trigram)
+    safe_sort_by, safe_sort_order = products_sort(params)
+    if cursor is not None:
+        op = '>' if safe_sort_order == 'ASC' else '<'
+        if safe_sort_by == 'id':
+            where += f" AND id {op} ?"
+            args = args + [cursor['id']]
+        else:
+            where += f" AND ({safe_sort_by}, id) {op} (?, ?)"
+            args = args + [cursor['v'], cursor['id']]
+    order = f"{safe_sort_by} {safe_sort_order}" + ('' if safe_sort_by == 'id' else f", id {safe_sort_order}")
+    data_sql = f"""
+      SELECT {DATA_COLUMNS}
+      FROM products
+      {where}
+      ORDER BY {order}
+      LIMIT ?
+    """
+    return data_sql, args + [limit + 1]
+
+def build_search_queries(query, search_fields='all', limit=20):
+    """与 GET /api/search 相同的FTS5查询"""
+    fts_query = f'"{query}"'
+    if search_fields != 'all':
+        valid = ['name', 'company_name', 'description']
+        field_queries = [f'{f.strip()}:"{query}"' for f in search_fields.split(',') if f.strip() in valid]
+        if field_queries:
+            fts_query = ' OR '.join(field_queries)
+    sql = """
+      SELECT p.id, p.name, p.company_name, p.price, p.stock, p.description,
+             p.category, p.sku, p.status, p.created_at
+      FROM products_fts fts
+      JOIN products p ON p.id = fts.rowid
+      WHERE products_fts MATCH ? AND p.status = 'active'
+      ORDER BY bm25(products_fts)
+      LIMIT ?
+    """
+    return [(sql, [fts_query, limit])]
+
+# GET /api/stats 的五个查询
+# /api/stats 读取触发器维护的汇总表（migrations/0005）
+STATS_QUERIES = [
+    ("SELECT total_products, total_stock, total_value, total_companies FROM stats_totals WHERE id = 1", []),
+    ("""
+      SELECT category, product_count as count
+      FROM stats_categories
+      WHERE category != ''
+      ORDER BY product_count DESC
+      LIMIT 10
+    """, []),
+]
+
+# 汇总表之前的五个聚合查询（汇总表未迁移时 /api/stats 的回退路径）
+STATS_SCAN_QUERIES = [
+    ("SELECT COUNT(*) as count FROM products WHERE status = 'active'", []),
+    ("SELECT SUM(stock) as total FROM products WHERE status = 'active'", []),
+    ("SELECT SUM(price * stock) as total FROM products WHERE status = 'active'", []),
+    ("SELECT COUNT(DISTINCT company_name) as count FROM products WHERE status = 'active'", []),
+    ("""
+      SELECT category, COUNT(*) as count
+      FROM products
+      WHERE status = 'active' AND category != ''
+      GROUP BY category
+      ORDER BY count DESC
+      LIMIT 10
+    """, []),
+]
+
+# 场景名 → 一次请求执行的全部查询
+CASES = {
+    'list_first_page': build_products_queries({}),
+    'list_deep_page': build_products_queries({'page': 500}),
+    'list_sort_price': build_products_queries({'sortBy': 'price', 'sortOrder': 'ASC'}),
+    'cursor_first_page': [build_cursor_query({})],
+    'cursor_deep_page': [build_cursor_query({}, {'id': 10000})],
+    'cursor_sort_price': [build_cursor_query({'sortBy': 'price', 'sortOrder': 'ASC'}, {'v': 500.0, 'id': 0})],
+    'cursor_filter_company': [build_cursor_query({'company': '美的'}, {'id': 10000})],
+    'search_all': build_products_queries({'search': 'iPhone'}),
+    'search_all_like': build_products_queries({'search': 'iPhone'}, trigram=False),
+    'search_all_no_match': build_products_queries({'search': '不存在的商品'}),
+    'search_all_no_match_like': build_products_queries({'search': '不存在的商品'}, trigram=False),
+    'search_cjk_substring': build_products_queries({'search': '护理商品'}),
+    'search_cjk_substring_like': build_products_queries({'search': '护理商品'}, trigram=False),
+    'search_name': build_products_queries({'search': 'iPhone', 'searchFields': 'name'}),
+    'search_name_like': build_products_queries({'search': 'iPhone', 'searchFields': 'name'}, trigram=False),
+    'search_sku_prefix': build_products_queries({'search': 'DE-0001', 'searchFields': 'sku'}),
+    'search_sku_prefix_like': build_products_queries({'search': 'DE-0001', 'searchFields': 'sku'}, trigram=False),
+    'search_sku_digits': build_products_queries({'search': '00012', 'searchFields': 'sku'}),
+    'search_sku_digits_like': build_products_queries({'search': '00012', 'searchFields': 'sku'}, trigram=False),
+    'filter_company_category': build_products_queries({'company': '美的', 'category': '家用电器'}),
+    'filter_price_stock': build_products_queries({'minPrice': '100', 'maxPrice': '500', 'minStock': '100'}),
+    'fts_search': build_search_queries('iPhone'),
+    'fts_search_name': build_search_queries('Nike', 'name'),
+    'stats': STATS_QUERIES,
+    'stats_scan': STATS_SCAN_QUERIES,
+}
+
+def ensure_database(rows, seed='bench', data_dir=DATA_DIR):
+    """返回指定行数的基准数据库路径，不存在时生成"""
+    path = os.path.join(data_dir, f"bench_{rows}.sqlite")
+    if not os.path.exists(path):
+        from generate_test_data import load_sqlite
+        os.makedirs(data_dir, exist_ok=True)
+        print(f"🏗️  生成 {rows:,} 行的基准数据库 {path} ...")
+        load_sqlite(path, rows, seed)
+    else:
+        # 缓存的数据库补上之后新增的迁移
+        conn = sqlite3.connect(path)
+        try:
+            apply_migrations(conn)
+        finally:
+            conn.close()
+    return path
+
+def _index_stats(conn):
+    """读取 sqlite_stat1：索引名 → 每个键值平均对应的行数"""
+    try:
+        rows = conn.execute("SELECT idx, stat FROM sqlite_stat1 WHERE idx IS NOT NULL").fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    stats = {}
+    for idx, stat in rows:
+        parts = stat.split()
+        if len(parts) >= 2:
+            stats[idx] = int(parts[1])
+    return stats
+
+_PLAN_TABLE = re.compile(r'^(SCAN|SEARCH) (\w+)(?: AS \w+)?(?: USING (?:COVERING )?INDEX (\w+))?')
+
+def estimate_rows(plan, table_rows, index_stats):
+    """按执行计划估算需要访问的行数：全表/全索引扫描和索引范围查找按该表行数（table_rows: {表名: 行数}），
+    等值查找按 sqlite_stat1 的平均值
+
+    LIMIT 可能让扫描提前结束、范围查找通常只访问一部分行，所以这是偏保守的估计；
+    FTS虚拟表的访问行数无法从计划得知，不计入。实际开销以 vm_steps 为准。
+    """
+    total = 0
+    for detail in plan:
+        m = _PLAN_TABLE.match(detail)
+        if not m or 'VIRTUAL TABLE' in detail:
+            continue
+        kind, table, index = m.groups()
+        if kind == 'SCAN' or '>' in detail or '<' in detail:
+            total += table_rows.get(table, 0)
+        elif index and index in index_stats:
+            total += index_stats[index]
+        else:
+            total += 1
+    return total
+
+def explain(conn, sql, params):
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+def count_vm_steps(conn, sql, params):
+    """执行一次查询，用进度回调统计SQLite虚拟机执行的指令数（近似值，精度 PROGRESS_STEP）"""
+    steps = 0
+
+    def tick():
+        nonlocal steps
+        steps += PROGRESS_STEP
+        return 0
+
+    conn.set_progress_handler(tick, PROGRESS_STEP)
+    try:
+        conn.execute(sql, params).fetchall()
+    finally:
+        conn.set_progress_handler(None, PROGRESS_STEP)
+    return steps
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+def run_case(conn, queries, iterations, warmup, max_seconds):
+    """重复执行一个场景的全部查询，返回延迟统计（毫秒）"""
+    for _ in range(warmup):
+        for sql, params in queries:
+            conn.execute(sql, params).fetchall()
+
+    timings = []
+    budget_end = time.perf_counter() + max_seconds
+    while len(timings) < iterations:
+        started = time.perf_counter()
+        for sql, params in queries:
+            conn.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+        if len(timings) >= 3 and time.perf_counter() > budget_end:
+            break
+
+    return {
+        'iterations': len(timings),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'min_ms': round(min(timings), 3),
+    }
+
+def bench_database(path, cases, iterations=20, warmup=1, max_seconds=30.0):
+    """在一个数据库上执行所有场景，返回结果列表"""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        table_rows = {name: conn.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0] for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND sql NOT LIKE 'CREATE VIRTUAL%'")}
+        index_stats = _index_stats(conn)
+        results = []
+        for name in cases:
+            queries = CASES[name]
+            details = []
+            for sql, params in queries:
+                plan = explain(conn, sql, params)
+                details.append({
+                    'sql': ' '.join(sql.split()),
+                    'plan': plan,
+                    'est_rows': estimate_rows(plan, table_rows, index_stats),
+                    'vm_steps': count_vm_steps(conn, sql, params),
+                })
+            timing = run_case(conn, queries, iterations, warmup, max_seconds)
+            result = {
+                'db': path,
+                'rows': table_rows['products'],
+                'case': name,
+                **timing,
+                'est_rows': sum(d['est_rows'] for d in details),
+                'vm_steps': sum(d['vm_steps'] for d in details),
+                'queries': details,
+            }
+            print(f"  {name:<26} p50 {timing['p50_ms']:>10.2f}ms  p95 {timing['p95_ms']:>10.2f}ms  "
+                  f"估算扫描 {result['est_rows']:>10,} 行  VM步数 {result['vm_steps']:>12,}")
+            results.append(result)
+        return results
+    finally:
+        conn.close()
+
+def _git_commit():
+    try:
+        with open(os.path.join('.git', 'HEAD')) as f:
+            ref = f.read().strip()
+        if ref.startswith('ref: '):
+            with open(os.path.join('.git', ref[5:])) as f:
+                return f.read().strip()[:12]
+        return ref[:12]
+    except OSError:
+        return None
+
+def save_results(results, output_path, label=None):
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    report = {
+        'label': label,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': _git_commit(),
+        'sqlite_version': sqlite3.sqlite_version,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, output_path)
+
+def compare_results(before_path, after_path):
+    """按 (数据量, 场景) 对比两次结果的 p50/p95"""
+    with open(before_path, encoding='utf-8') as f:
+        before = {(r['rows'], r['case']): r for r in json.load(f)['results']}
+    with open(after_path, encoding='utf-8') as f:
+        after = json.load(f)['results']
+
+    def change(old, new):
+        return f"{(new - old) / old * 100:+.1f}%" if old else 'n/a'
+
+    print(f"{'行数':>10}  {'场景':<26} {'p50 前':>10} {'p50 后':>10} {'变化':>8}   {'p95 前':>10} {'p95 后':>10} {'变化':>8}")
+    for r in after:
+        old = before.get((r['rows'], r['case']))
+        if old is None:
+            continue
+        print(f"{r['rows']:>10,}  {r['case']:<26} {old['p50_ms']:>10.2f} {r['p50_ms']:>10.2f} "
+              f"{change(old['p50_ms'], r['p50_ms']):>8}   {old['p95_ms']:>10.2f} {r['p95_ms']:>10.2f} "
+              f"{change(old['p95_ms'], r['p95_ms']):>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description='商品查询性能基准')
+    parser.add_argument('--db', action='append', help='要测试的SQLite数据库（可重复指定）')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='未指定 --db 时生成的数据库行数，逗号分隔')
+    parser.add_argument('--cases', default='all', help=f"场景，逗号分隔（可选: {', '.join(CASES)}）")
+    parser.add_argument('--iterations', type=int, default=20, help='每个场景的执行次数')
+    parser.add_argument('--warmup', type=int, default=1, help='预热次数')
+    parser.add_argument('--max-seconds', type=float, default=30.0, help='每个场景的时间上限（至少执行3次）')
+    parser.add_argument('--label', help='写入结果文件的标签，例如 "before-index"')
+    parser.add_argument('-o', '--output', help='结果JSON路径（默认 bench_results/queries-<时间>.json）')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='对比两次结果，不执行测试')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_results(*args.compare)
+        return
+
+    cases = list(CASES) if args.cases == 'all' else [c.strip() for c in args.cases.split(',')]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        print(f"❌ 未知的场景: {', '.join(unknown)}")
+        sys.exit(1)
+
+    databases = args.db or [ensure_database(int(n)) for n in args.sizes.split(',')]
+    results = []
+    for path in databases:
+        print(f"\n📊 {path}")
+        results.extend(bench_database(path, cases, args.iterations, args.warmup, args.max_seconds))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"queries-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    save_results(results, output, args.label)
+    print(f"\n💾 结果已保存到 {output}")
+
+if __name__ == '__main__':
+    main()
@@ -1,137 +1,130 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+"""
+按条件批量清除商品（默认清除所有连接器商品）
 
-import requests
+调用 POST /api/products/bulk-delete，由服务端按 id 区间分块执行UPDATE，
+一次请求处理多达上百万个id；服务端单次没处理完时返回 nextId，这里接着调用直到完成。
+默认把 status 改为 inactive；--hard 改为 deleted。两种方式都保留行并更新 updated_at，
+export_to_sql.py --incremental 和 product_snapshot.py 才能把它们作为删除标记传下去。
+--metrics-jsonl / --metrics-prom 输出请求耗时和实际修改的行数（见 import_metrics）。
 
-def clear_connector_data():
+用法:
+    python3 clear_connector_data.py                         # 软删除分类为“连接器”的全部商品
+    python3 clear_connector_data.py --dry-run               # 只统计会被删除的数量
+    python3 clear_connector_data.py --sku-prefix CONN- --company 信都数字科技（上海）有限公司
+    python3 clear_connector_data.py --min-id 1000 --max-id 20000 --hard
+"""
+
+import argparse
+import time
+
+from d1_client import ApiClient, ApiError
+from import_metrics import ROWS_ACCEPTED, add_metrics_arguments, metrics_from_args
+
+def bulk_delete(api, filters, dry_run=False, hard=False, chunk_size=5000, metrics=None):
+    """按条件批量删除，返回 (匹配数量, 实际删除数量)；metrics 不为空时按服务端修改的行数计入"""
+    payload = {**filters, 'chunkSize': chunk_size, 'mode': 'delete' if hard else 'deactivate'}
+    result = api.post_json("/api/products/bulk-delete", {**payload, 'dryRun': True})
+    if not result.get("success"):
+        raise ApiError(f"批量删除失败: {result.get('error')}")
+    matched = result["data"]["matched"]
+    if dry_run or matched == 0:
+        return matched, 0
+
+    affected = 0
+    started = time.monotonic()
+    while True:
+        result = api.post_json("/api/products/bulk-delete", payload)
+        if not result.get("success"):
+            raise ApiError(f"批量删除失败: {result.get('error')}")
+        data = result["data"]
+        affected += data["affected"]
+        if metrics:
+            metrics.inc(ROWS_ACCEPTED, data["affected"])
+        print(f"   已删除 {affected}/{matched} 个商品 ({time.monotonic() - started:.1f}s)")
+        if data["done"]:
+            return matched, affected
+        payload['minId'] = data["nextId"]
+
+def clear_connector_data(filters=None, dry_run=False, hard=False, metrics=None):
     """清除数据库中所有连接器商品数据"""
-    
-    base_url = "https://3000-i210jj9hxq7tsgvpii0sp-6532622b.e2b.dev"
-    
+
+    filters = filters or {"category": "连接器"}
+    api = ApiClient(metrics=metrics)
+
     print("🔐 步骤1: 登录获取Token...")
-    
-    # 1. 登录获取Token
-    response = requests.post(
-        f"{base_url}/api/auth/login",
-        json={"username": "admin", "password": "admin"}
-    )
-    
-    if response.status_code != 200:
-        print(f"❌ 登录失败: {response.text}")
+
+    # 1. 登录获取Token（有未过期的缓存令牌时直接复用）
+    try:
+        api.login()
+    except ApiError as e:
+        print(f"❌ {e}")
         return False
-    
-    token = response.json()["data"]["token"]
+
     print(f"✅ 登录成功!")
-    
-    print(f"\n📊 步骤2: 检查当前连接器商品数量...")
-    
-    # 2. 检查当前状态
-    headers = {"Authorization": f"Bearer {token}"}
-    
+
+    print(f"\n🗑️  步骤2: 批量{'统计' if dry_run else '删除'}商品，条件: {filters}...")
+
+    # 2. 服务端按条件分块删除
     try:
-        response = requests.get(
-            f"{base_url}/api/products?category=连接器&limit=1",
-            headers=headers
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            if result.get("success") and "pagination" in result:
-                connector_count = result["pagination"]["total"]
-                print(f"✅ 当前连接器商品数量: {connector_count}")
-                
-                if connector_count == 0:
-                    print("ℹ️  没有连接器商品需要清除")
-                    return True
-                    
-            else:
-                print(f"❌ 无法获取商品数据: {result}")
-                return False
-        else:
-            print(f"❌ 获取商品数据失败: {response.status_code}")
-            return False
-            
-    except Exception as e:
-        print(f"❌ 请求异常: {e}")
+        matched, deleted_count = bulk_delete(api, filters, dry_run=dry_run, hard=hard, metrics=metrics)
+    except ApiError as e:
+        print(f"❌ {e}")
         return False
-    
-    print(f"\n🗑️  步骤3: 删除所有连接器商品...")
-    
-    # 3. 获取所有连接器商品ID并删除
+
+    if dry_run:
+        print(f"✅ 符合条件的商品: {matched} 个（试运行，未删除）")
+        return True
+    if matched == 0:
+        print("ℹ️  没有符合条件的商品需要清除")
+        return True
+
+    print(f"\n✅ 清除完成! 总共删除了 {deleted_count} 个商品")
+
+    # 3. 验证清除结果
     try:
-        # 分批获取和删除商品
-        page = 1
-        deleted_count = 0
-        
-        while True:
-            response = requests.get(
-                f"{base_url}/api/products?category=连接器&limit=50&page={page}",
-                headers=headers
-            )
-            
-            if response.status_code != 200:
-                print(f"❌ 获取商品列表失败: {response.status_code}")
-                break
-            
-            result = response.json()
-            if not result.get("success"):
-                print(f"❌ 获取商品列表失败: {result.get('error')}")
-                break
-            
-            products = result.get("data", [])
-            if not products:
-                break  # 没有更多商品了
-            
-            print(f"📋 正在处理第 {page} 页，{len(products)} 个商品...")
-            
-            # 删除这一批商品
-            for product in products:
-                try:
-                    delete_response = requests.delete(
-                        f"{base_url}/api/products/{product['id']}",
-                        headers=headers
-                    )
-                    
-                    if delete_response.status_code == 200:
-                        deleted_count += 1
-                        if deleted_count % 10 == 0:
-                            print(f"   已删除 {deleted_count} 个商品...")
-                    else:
-                        print(f"❌ 删除商品 {product['id']} 失败: {delete_response.status_code}")
-                        
-                except Exception as e:
-                    print(f"❌ 删除商品 {product['id']} 异常: {e}")
-            
-            page += 1
-            
-            # 检查是否还有更多页
-            if "pagination" in result and page > result["pagination"]["totalPages"]:
-                break
-        
-        print(f"\n✅ 清除完成! 总共删除了 {deleted_count} 个连接器商品")
-        
-        # 4. 验证清除结果
-        response = requests.get(
-            f"{base_url}/api/stats",
-            headers=headers
-        )
-        
+        response = api.get("/api/stats")
+
         if response.status_code == 200:
             stats = response.json()["data"]
             print(f"\n📊 清除后数据库状态:")
             print(f"   商品总数: {stats['totalProducts']}")
             print(f"   总库存: {stats['totalStock']}")
             print(f"   总价值: ¥{stats['totalValue']}")
-        
-        return True
-        
-    except Exception as e:
-        print(f"❌ 清除过程异常: {e}")
-        return False
+    except ApiError as e:
+        print(f"⚠️  获取统计信息失败: {e}")
+
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description='按条件批量清除商品')
+    parser.add_argument('--category', help='分类（精确匹配；不指定任何条件时默认为“连接器”）')
+    parser.add_argument('--company', help='公司名称（精确匹配）')
+    parser.add_argument('--sku-prefix', help='SKU前缀')
+    parser.add_argument('--min-id', type=int, help='最小id（含）')
+    parser.add_argument('--max-id', type=int, help='最大id（含）')
+    parser.add_argument('--dry-run', action='store_true', help='只统计数量，不删除')
+    parser.add_argument('--hard', action='store_true',
+                        help='标记为已删除 status=deleted（默认只把status改为inactive）')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    filters = {key: value for key, value in {
+        'category': args.category, 'company': args.company, 'skuPrefix': args.sku_prefix,
+        'minId': args.min_id, 'maxId': args.max_id,
+    }.items() if value is not None}
+
+    metrics = metrics_from_args('clear_connector_data', args)
+    try:
+        success = clear_connector_data(filters or None, dry_run=args.dry_run, hard=args.hard, metrics=metrics)
+    finally:
+        metrics.close()
+    if success and not args.dry_run:
+        print(f"\n🎉 商品清除完成！现在可以重新导入CSV文件了")
+    elif not success:
+        print(f"\n❌ 清除过程中遇到问题，请检查日志")
+    metrics.print_summary()
 
 if __name__ == '__main__':
-    success = clear_connector_data()
-    if success:
-        print(f"\n🎉 连接器商品清除完成！现在可以重新导入CSV文件了")
-    else:
-        print(f"\n❌ 清除过程中遇到问题，请检查日志")
\ No newline at end of file
+    main()
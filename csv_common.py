@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CSV工具共用的表头映射、输入展开、编码检测和价格/库存规范化
+
+csv_transform、transcode_csv、validate_csv 以及各导入脚本都从这里导入，
+相互之间不再依赖。
+"""
+
+import codecs
+import glob
+import os
+import re
+import unicodedata
+
+OUTPUT_FIELDS = ['name', 'company_name', 'price', 'stock', 'sku', 'category', 'description']
+
+# 与 /api/products/import-csv 一致的表头映射
+FIELD_MAPPING = {
+    '商品名称': 'name',
+    '公司名称': 'company_name',
+    '售价': 'price',
+    '库存': 'stock',
+    '分类': 'category',
+    '描述': 'description',
+    'SKU': 'sku',
+}
+
+PRICE_DECIMALS = 6
+SAMPLE_SIZE = 64 * 1024
+
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+_WHITESPACE = re.compile(r'\s+')
+_PRICE = re.compile(r'\+?(\d*)(?:\.(\d*))?')
+_STOCK = re.compile(r'\+?(\d+)(?:\.0*)?')
+
+def normalize_key(text):
+    """规范化名称：全角转半角（NFKC）、合并空白、忽略大小写"""
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFKC', text or '')).strip().casefold()
+
+def expand_inputs(inputs, pattern='*.csv'):
+    """把文件、目录、通配符展开为排好序的CSV文件列表"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            files.extend(glob.glob(os.path.join(item, pattern)))
+        elif any(ch in item for ch in '*?['):
+            files.extend(glob.glob(item))
+        else:
+            files.append(item)
+    return sorted(set(files))
+
+# ---- 编码检测 ----
+
+def _decodes(sample, encoding, final):
+    decoder = codecs.getincrementaldecoder(encoding)(errors='strict')
+    try:
+        decoder.decode(sample, final=final)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+def detect_encoding(path, sample_size=SAMPLE_SIZE):
+    """根据文件开头的字节判断编码，返回 'utf-8' / 'utf-8-sig' / 'utf-16' / 'gb18030'"""
+    with open(path, 'rb') as f:
+        sample = f.read(sample_size)
+        at_eof = not f.read(1)
+
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding
+    # 样本可能在多字节字符中间截断，未到文件末尾时不要求最后一个字符完整
+    if _decodes(sample, 'utf-8', final=at_eof):
+        return 'utf-8'
+    if _decodes(sample, 'gb18030', final=at_eof):
+        return 'gb18030'
+    raise ValueError(f"{path}: 无法识别的编码（既不是UTF-8也不是GBK/GB18030）")
+
+# ---- 价格和库存 ----
+
+def _clean(values):
+    return [unicodedata.normalize('NFKC', v).strip() for v in values]
+
+def normalize_prices(values):
+    """返回 (规范化后的价格字符串列表, 错误原因列表)"""
+    normalized = []
+    reasons = []
+    for v in _clean(values):
+        m = _PRICE.fullmatch(v)
+        if not m or not (m.group(1) or m.group(2)):
+            normalized.append(v)
+            reasons.append(f"价格不能为负数: {v}" if _PRICE.fullmatch(v[1:]) and v[:1] == '-'
+                           else f"价格不是有效数字: {v!r}")
+            continue
+        whole = m.group(1).lstrip('0') or '0'
+        frac = (m.group(2) or '').rstrip('0')
+        if len(frac) > PRICE_DECIMALS:
+            normalized.append(v)
+            reasons.append(f"价格超过{PRICE_DECIMALS}位小数: {v}")
+            continue
+        normalized.append(f"{whole}.{frac}" if frac else whole)
+        reasons.append(None)
+    return normalized, reasons
+
+def normalize_stocks(values):
+    """返回 (规范化后的库存字符串列表, 错误原因列表)"""
+    normalized = []
+    reasons = []
+    for v in _clean(values):
+        m = _STOCK.fullmatch(v)
+        if m:
+            normalized.append(m.group(1).lstrip('0') or '0')
+            reasons.append(None)
+        else:
+            normalized.append(v)
+            reasons.append(f"库存必须是非负整数: {v!r}")
+    return normalized, reasons
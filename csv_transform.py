@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多文件CSV并行转换工具（取代 fix_csv.py / generate_new_csv.py 的单文件处理）
+
+把 name,company_name,price,stock（或中文表头 商品名称,公司名称,售价,库存）的
+原始CSV转换为导入用的 name,company_name,price,stock,sku,category,description。
+输入可以是文件、目录或通配符，每个文件交给进程池中的一个worker处理，
+输出先写临时文件再原子替换，最后汇总行数和速度。
+
+默认的 hash 模式按规范化后的 (name, company_name) 计算确定性SKU：同一商品
+每次转换都得到同一个SKU，重复导入时服务端的 INSERT OR IGNORE 会直接跳过。
+名称和公司都相同的行会得到同一个SKU，只保留第一次导入的那一行。
+
+用法:
+    python3 csv_transform.py 9.16数据/ -o converted/
+    python3 csv_transform.py '9.16数据/*_part_*.csv' --workers 8
+    python3 csv_transform.py 51连接器-9.1-utf8.csv --sku-mode new   # 随机生成全新SKU
+"""
+
+import argparse
+import base64
+import csv
+import hashlib
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from csv_common import (FIELD_MAPPING, OUTPUT_FIELDS, detect_encoding, expand_inputs, normalize_key, normalize_prices,
+                        normalize_stocks)
+from import_metrics import (BATCH_SECONDS, BYTES_READ, BYTES_WRITTEN, ROWS_READ, ROWS_REJECTED, ROWS_WRITTEN,
+                            Histogram, add_metrics_arguments, metrics_from_args)
+
+CHUNK_SIZE = 10000
+
+def content_skus(names, companies):
+    """批量计算确定性SKU：CONN- + blake2b(规范化name, 规范化company) 的前80位（base32）"""
+    blake2b = hashlib.blake2b
+    b32 = base64.b32encode
+    return [
+        'CONN-' + b32(blake2b(f"{normalize_key(n)}\x1f{normalize_key(c)}".encode('utf-8'),
+                              digest_size=10).digest()).decode('ascii')
+        for n, c in zip(names, companies)
+    ]
+
+def fill_content_skus(products):
+    """给没有SKU的商品字典原地补上 content_skus 的确定性SKU，返回补上的数量
+
+    导入脚本在上传前调用：重试已提交的请求或重跑同一条命令时，同一行得到同一个SKU，
+    服务端按SKU唯一索引跳过，而不是再生成一个随机SKU重复插入。
+    """
+    missing = [p for p in products if not (p.get('sku') or '').strip()]
+    if missing:
+        skus = content_skus([p['name'] for p in missing], [p['company_name'] for p in missing])
+        for product, sku in zip(missing, skus):
+            product['sku'] = sku
+    return len(missing)
+
+SKU_MODES = {
+    # fix_csv.py 原有格式：name前8个字符 + 短UUID
+    'conn': lambda name: f"CONN-{name[:8].replace('-', '').replace(' ', '').upper()}-{str(uuid.uuid4())[:8].upper()}",
+    # generate_new_csv.py 原有格式：时间戳 + 短UUID
+    'new': lambda name: f"NEW-CONN-{datetime.now().strftime('%m%d%H%M')}-{str(uuid.uuid4())[:8].upper()}",
+}
+
+def output_path_for(input_path, output_dir=None, suffix='-fixed'):
+    stem, ext = os.path.splitext(os.path.basename(input_path))
+    return os.path.join(output_dir or os.path.dirname(input_path), f"{stem}{suffix}{ext or '.csv'}")
+
+def transform_file(input_path, output_path, sku_mode='hash', category='连接器',
+                   description_template='连接器产品 - {name}', keep_sku=True, encoding=None):
+    """转换单个CSV文件，返回统计信息字典；未指定编码时自动检测（GBK文件直接读取，不需要先转码）"""
+    started = time.monotonic()
+    make_sku = SKU_MODES.get(sku_mode)
+    if make_sku is None and sku_mode != 'hash':
+        raise ValueError(f"未知的SKU模式: {sku_mode}")
+    rows = 0
+    skipped = 0
+    tmp_path = output_path + '.tmp'
+    encoding = encoding or detect_encoding(input_path)
+    if encoding == 'utf-8':
+        encoding = 'utf-8-sig'
+
+    with open(input_path, 'r', encoding=encoding, newline='') as infile, \
+         open(tmp_path, 'w', encoding='utf-8', newline='') as outfile:
+        reader = csv.reader(infile)
+        header = next(reader, None)
+        if header is None:
+            raise ValueError(f"{input_path} 是空文件")
+        fields = [FIELD_MAPPING.get(h.strip(), h.strip()) for h in header]
+        pos = {field: i for i, field in enumerate(fields)}
+        missing = [f for f in ('name', 'company_name', 'price', 'stock') if f not in pos]
+        if missing:
+            raise ValueError(f"{input_path} 缺少必须的列: {', '.join(missing)}")
+
+        writer = csv.writer(outfile)
+        writer.writerow(OUTPUT_FIELDS)
+        i_name, i_company, i_price, i_stock = pos['name'], pos['company_name'], pos['price'], pos['stock']
+        i_sku = pos.get('sku') if keep_sku else None
+        i_category = pos.get('category')
+        i_description = pos.get('description')
+
+        def optional(record, index):
+            return record[index] if index is not None and index < len(record) else ''
+
+        chunk = []
+        batches = Histogram()  # 每个分块（读取、补SKU、写出）的耗时
+        batch_started = time.perf_counter()
+
+        def flush():
+            nonlocal batch_started, rows, skipped
+            if not chunk:
+                return
+            # 整块按列规范化价格和库存，原样写出规范化后的十进制字符串
+            # （float 超过17位有效数字会丢精度，大数还会写成 1.2345678901234568e+16）
+            prices, price_reasons = normalize_prices([row[2] for row in chunk])
+            stocks, stock_reasons = normalize_stocks([row[3] for row in chunk])
+            valid = []
+            for row, price, stock, price_reason, stock_reason in zip(chunk, prices, stocks,
+                                                                      price_reasons, stock_reasons):
+                if price_reason or stock_reason:
+                    continue
+                row[2] = price
+                row[3] = stock
+                valid.append(row)
+            skipped += len(chunk) - len(valid)
+            rows += len(valid)
+
+            missing = [row for row in valid if not row[4]]
+            if missing:
+                if sku_mode == 'hash':
+                    skus = content_skus([row[0] for row in missing], [row[1] for row in missing])
+                else:
+                    skus = [make_sku(row[0]) for row in missing]
+                for row, sku in zip(missing, skus):
+                    row[4] = sku
+            writer.writerows(valid)
+            chunk.clear()
+            batches.observe(time.perf_counter() - batch_started)
+            batch_started = time.perf_counter()
+
+        for record in reader:
+            if not record:
+                continue
+            try:
+                name = record[i_name]
+                company_name = record[i_company]
+                price = record[i_price]
+                stock = record[i_stock]
+            except IndexError:
+                skipped += 1
+                continue
+
+            chunk.append([
+                name,
+                company_name,
+                price,
+                stock,
+                optional(record, i_sku).strip(),
+                optional(record, i_category) or category,
+                optional(record, i_description) or description_template.format(name=name),
+            ])
+            if len(chunk) >= CHUNK_SIZE:
+                flush()
+        flush()
+
+    os.replace(tmp_path, output_path)
+    return {
+        'input': input_path,
+        'output': output_path,
+        'rows': rows,
+        'skipped': skipped,
+        'encoding': encoding,
+        'bytes': os.path.getsize(input_path),
+        'bytes_written': os.path.getsize(output_path),
+        'batch_seconds': batches,
+        'seconds': time.monotonic() - started,
+    }
+
+def record_metrics(metrics, result):
+    """把一个文件的转换结果记入 metrics"""
+    metrics.inc(ROWS_READ, result['rows'] + result['skipped'])
+    metrics.inc(ROWS_REJECTED, result['skipped'], stage='local')
+    metrics.inc(ROWS_WRITTEN, result['rows'])
+    metrics.inc(BYTES_READ, result['bytes'])
+    metrics.inc(BYTES_WRITTEN, result.get('bytes_written', 0))
+    if 'batch_seconds' in result:
+        metrics.merge(BATCH_SECONDS, result['batch_seconds'])
+
+def transform_files(files, output_dir=None, suffix='-fixed', workers=None, metrics=None, **options):
+    """用进程池并行转换多个文件，返回每个文件的统计信息；metrics 不为空时每完成一个文件记入一次"""
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = {
+            pool.submit(transform_file, path, output_path_for(path, output_dir, suffix), **options): path
+            for path in files
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"❌ {path}: {e}")
+                results.append({'input': path, 'error': str(e), 'rows': 0, 'skipped': 0, 'bytes': 0})
+            if metrics:
+                record_metrics(metrics, results[-1])
+    return sorted(results, key=lambda r: r['input'])
+
+def main():
+    parser = argparse.ArgumentParser(description='并行转换导入用CSV文件（补充SKU、分类、描述）')
+    parser.add_argument('inputs', nargs='+', help='CSV文件、目录或通配符')
+    parser.add_argument('-o', '--output-dir', help='输出目录（默认与输入文件相同）')
+    parser.add_argument('--suffix', default='-fixed', help='输出文件名后缀')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='并行进程数')
+    parser.add_argument('--sku-mode', choices=['hash'] + sorted(SKU_MODES), default='hash',
+                        help='缺少SKU时的生成方式：hash 为按名称和公司计算的确定性SKU，conn/new 为随机SKU')
+    parser.add_argument('--category', default='连接器', help='缺少分类时的默认分类')
+    parser.add_argument('--description', default='连接器产品 - {name}', help='缺少描述时的模板')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    files = expand_inputs(args.inputs)
+    if not files:
+        print("❌ 没有找到CSV文件")
+        sys.exit(1)
+
+    print(f"🔧 转换 {len(files)} 个文件，{args.workers} 个进程并行...")
+    started = time.monotonic()
+    metrics = metrics_from_args('csv_transform', args)
+    try:
+        results = transform_files(files, args.output_dir, args.suffix, args.workers, metrics,
+                                  sku_mode=args.sku_mode, category=args.category,
+                                  description_template=args.description)
+    finally:
+        metrics.close()
+    elapsed = time.monotonic() - started
+
+    rows = sum(r['rows'] for r in results)
+    skipped = sum(r['skipped'] for r in results)
+    failed = [r for r in results if 'error' in r]
+    megabytes = sum(r['bytes'] for r in results) / 1e6
+
+    print(f"\n🎉 处理完成! {len(results) - len(failed)}/{len(results)} 个文件成功")
+    print(f"📊 共 {rows} 行，跳过无效行 {skipped} 行，耗时 {elapsed:.2f}s "
+          f"({rows / elapsed if elapsed else 0:,.0f} 行/秒，{megabytes / elapsed if elapsed else 0:.1f} MB/秒)")
+    metrics.print_summary()
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,583 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运维脚本共用的 D1 数据库 / API 客户端
+
+- SqliteBackend: 直接用 sqlite3 打开 .wrangler/state 下的本地 D1 文件，
+  用游标流式读取，返回带原生类型的行（int/float/str）
+- WranglerBackend: 原有的 `npx wrangler d1 execute` 方式，作为回退路径，
+  远程数据库（--remote）也只能走这条路径
+- ApiClient: 访问 Worker API 的 HTTP 客户端，复用 keep-alive 连接池，
+  缓存登录得到的 JWT（401 时自动重新登录），429/5xx 时带抖动退避重试；
+  传入 metrics（import_metrics.Metrics）时记录每个请求的耗时、状态、字节数和重试次数
+- apply_migrations / deferred_indexes: 在本地SQLite文件上执行 migrations/，
+  批量写入期间暂时去掉触发器和二级索引，写完后一次性重建（包括 /api/stats 的汇总表）
+
+所有查询都使用 ? 占位符传参；SQL 文本只在必须交给 wrangler 时才由
+bind_params 渲染成字面量。
+"""
+
+import base64
+import glob
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import time
+from contextlib import contextmanager
+
+from import_metrics import BYTES_RECEIVED, BYTES_SENT, REQUEST_SECONDS, REQUESTS, RETRIES, endpoint_label
+
+PROJECT_DIR = os.environ.get('WEBAPP_DIR', '/home/user/webapp')
+DATABASE_NAME = os.environ.get('D1_DATABASE', 'webapp-production')
+D1_STATE_DIR = os.path.join('.wrangler', 'state', 'v3', 'd1')
+
+API_BASE_URL = os.environ.get('WEBAPP_API_URL', 'https://3000-i210jj9hxq7tsgvpii0sp-6532622b.e2b.dev')
+API_USERNAME = os.environ.get('WEBAPP_USERNAME', 'admin')
+API_PASSWORD = os.environ.get('WEBAPP_PASSWORD', 'admin')
+TOKEN_CACHE_FILE = os.path.expanduser(os.path.join('~', '.cache', 'webapp', 'tokens.json'))
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+PRODUCT_COLUMNS = ['name', 'company_name', 'price', 'stock', 'description', 'category', 'sku', 'status']
+
+def sql_literal(value):
+    """把Python值转换为SQL字面量"""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+def bind_params(sql, params=()):
+    """把 ? 占位符替换为参数字面量（跳过引号内的问号），仅用于只接受SQL文本的wrangler"""
+    params = list(params)
+    out = []
+    quote = None
+    for ch in sql:
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in ("'", '"'):
+            quote = ch
+        elif ch == '?':
+            if not params:
+                raise ValueError("SQL占位符数量多于参数数量")
+            out.append(sql_literal(params.pop(0)))
+            continue
+        out.append(ch)
+    if params:
+        raise ValueError("参数数量多于SQL占位符数量")
+    return ''.join(out)
+
+def build_insert_sql(rows, columns=PRODUCT_COLUMNS, table='products', upsert_key=None,
+                     rows_per_statement=50, defaults=None):
+    """生成多行INSERT语句，每 rows_per_statement 行一条
+
+    upsert_key 指定冲突列时生成 ON CONFLICT ... DO UPDATE，已存在的行原地更新
+    """
+    defaults = defaults or {}
+    column_list = ', '.join(columns)
+    conflict = ""
+    if upsert_key:
+        updates = ', '.join(f"{col} = excluded.{col}" for col in columns if col != upsert_key)
+        conflict = f" ON CONFLICT({upsert_key}) DO UPDATE SET {updates}, updated_at = CURRENT_TIMESTAMP"
+
+    values = [
+        '(' + ', '.join(sql_literal(row.get(col) if row.get(col) is not None else defaults.get(col))
+                        for col in columns) + ')'
+        for row in rows
+    ]
+    statements = []
+    for i in range(0, len(values), rows_per_statement):
+        statements.append(
+            f"INSERT INTO {table} ({column_list}) VALUES {', '.join(values[i:i + rows_per_statement])}{conflict};"
+        )
+    return "\n".join(statements)
+
+def find_local_d1_file(project_dir=PROJECT_DIR):
+    """在 .wrangler/state 下查找包含 products 表的本地 D1 SQLite 文件，取最近修改的一个"""
+    pattern = os.path.join(project_dir, D1_STATE_DIR, '**', '*.sqlite')
+    candidates = []
+
+    for path in glob.glob(pattern, recursive=True):
+        if os.path.basename(path) == 'metadata.sqlite':
+            continue
+        try:
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            try:
+                found = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products'"
+                ).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            continue
+        if found:
+            candidates.append(path)
+
+    if not candidates:
+        return None
+    return max(candidates, key=os.path.getmtime)
+
+def parse_wrangler_output(output):
+    """解析wrangler输出，返回第一条语句的results
+
+    优先按 --json 输出整体解析；旧版本wrangler混有日志时再从文本中定位JSON。
+    """
+    try:
+        data = json.loads(output)
+    except ValueError:
+        data = None
+    if isinstance(data, list):
+        return data[0].get("results", []) if data else []
+    if isinstance(data, dict) and "error" in data:
+        raise RuntimeError(data["error"])
+
+    json_start = output.find('[\n  {\n    "results":')
+    if json_start == -1:
+        return None
+
+    json_part = output[json_start:]
+    json_end = json_part.find('\n]\n')
+    if json_end == -1:
+        return None
+
+    data = json.loads(json_part[:json_end + 2])
+    return data[0]["results"] if data and "results" in data[0] else []
+
+class SqliteBackend:
+    """直接读写本地 D1 SQLite 文件"""
+
+    kind = 'sqlite'
+
+    def __init__(self, path, readonly=True, check_same_thread=True):
+        """check_same_thread=False 时允许在打开它的线程之外使用，调用方需保证同一时间只有一个线程访问"""
+        self.path = path
+        uri = f"file:{path}?mode=ro" if readonly else f"file:{path}"
+        self.conn = sqlite3.connect(uri, uri=True, timeout=30, check_same_thread=check_same_thread)
+        self.conn.row_factory = sqlite3.Row
+
+    def query(self, sql, params=()):
+        """执行查询并返回全部结果（字典列表）"""
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def execute(self, sql, params=()):
+        """执行写入语句并提交，返回影响行数"""
+        with self.conn:
+            return self.conn.execute(sql, params).rowcount
+
+    def iter_products(self, columns, batch_size, start_id=0, end_id=None, where="status = 'active'"):
+        """单个游标按 id 顺序流式读取区间 (start_id, end_id] 内的商品，每次产出一批"""
+        sql = f"SELECT {columns} FROM products WHERE {where} AND id > ?"
+        params = [start_id]
+        if end_id is not None:
+            sql += " AND id <= ?"
+            params.append(end_id)
+        sql += " ORDER BY id"
+
+        cursor = self.conn.execute(sql, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield [dict(row) for row in rows]
+        finally:
+            cursor.close()
+
+    def close(self):
+        self.conn.close()
+
+class WranglerBackend:
+    """通过 npx wrangler d1 execute 访问数据库（每次查询启动一个Node进程）"""
+
+    kind = 'wrangler'
+
+    def __init__(self, database=DATABASE_NAME, remote=False, project_dir=PROJECT_DIR):
+        self.database = database
+        self.remote = remote
+        self.project_dir = project_dir
+
+    def _run(self, args):
+        location = '--remote' if self.remote else '--local'
+        cmd = ['npx', 'wrangler', 'd1', 'execute', self.database, location] + args
+        return subprocess.run(cmd, capture_output=True, text=True, cwd=self.project_dir)
+
+    def query(self, sql, params=()):
+        """执行查询并返回结果，失败时返回None"""
+        result = self._run(['--json', '--command', bind_params(sql, params)])
+        if result.returncode != 0:
+            print(f"查询错误: {result.stderr}")
+            return None
+
+        try:
+            return parse_wrangler_output(result.stdout)
+        except Exception as e:
+            print(f"JSON解析错误: {e}")
+            return None
+
+    def execute_file(self, path):
+        """执行SQL文件，返回wrangler输出，失败时返回None"""
+        result = self._run([f'--file={path}'])
+        if result.returncode != 0:
+            print(f"错误: {result.stderr}")
+            return None
+        return result.stdout
+
+    def iter_products(self, columns, batch_size, start_id=0, end_id=None, where="status = 'active'"):
+        """按 id 游标分批查询区间 (start_id, end_id] 内的商品"""
+        last_id = start_id
+        upper = " AND id <= ?" if end_id is not None else ""
+
+        while True:
+            params = [last_id] + ([end_id] if end_id is not None else []) + [batch_size]
+            rows = self.query(
+                f"SELECT {columns} FROM products WHERE {where} AND id > ?{upper} ORDER BY id LIMIT ?",
+                params
+            )
+            if rows is None:
+                raise RuntimeError(f"查询 id > {last_id} 的数据失败")
+            if not rows:
+                return
+
+            yield rows
+            last_id = rows[-1]["id"]
+
+            if len(rows) < batch_size:
+                return
+
+    def close(self):
+        pass
+
+def open_backend(kind='auto', project_dir=PROJECT_DIR, database=DATABASE_NAME, check_same_thread=True):
+    """打开本地数据库后端：auto 优先直接读SQLite文件，找不到时回退到wrangler"""
+    if kind in ('auto', 'sqlite'):
+        path = find_local_d1_file(project_dir)
+        if path:
+            return SqliteBackend(path, check_same_thread=check_same_thread)
+        if kind == 'sqlite':
+            raise FileNotFoundError(f"在 {os.path.join(project_dir, D1_STATE_DIR)} 下没有找到本地D1数据库文件")
+        print("未找到本地D1 SQLite文件，回退到 wrangler 查询")
+    return WranglerBackend(database=database, project_dir=project_dir)
+
+def _table_columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+# 只适用于旧版远程库的迁移：0002 把旧的 company 列改名为 company_name，
+# 在按 0001 新建的库上执行会失败（status 列已存在、没有 company 列）
+MIGRATION_CONDITIONS = {
+    '0002_fix_remote_schema.sql': lambda conn: 'company' in _table_columns(conn, 'products'),
+}
+
+def apply_migrations(conn, migrations_dir=MIGRATIONS_DIR):
+    """按文件名顺序执行尚未应用的迁移，记录在与wrangler相同的 d1_migrations 表中，返回本次处理的迁移名"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS d1_migrations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
+        )
+    """)
+    applied = {row[0] for row in conn.execute("SELECT name FROM d1_migrations")}
+    done = []
+    for path in sorted(glob.glob(os.path.join(migrations_dir, '*.sql'))):
+        name = os.path.basename(path)
+        if name in applied:
+            continue
+        condition = MIGRATION_CONDITIONS.get(name)
+        if condition is None or condition(conn):
+            with open(path, 'r', encoding='utf-8') as f:
+                conn.executescript(f.read())
+        conn.execute("INSERT INTO d1_migrations (name) VALUES (?)", (name,))
+        conn.commit()
+        done.append(name)
+    return done
+
+# 与 migrations/0005_add_stats_rollups.sql 中的初始化语句相同：从 products 重新计算 /api/stats 的汇总表
+STATS_ROLLUP_REBUILD_SQL = """
+INSERT OR REPLACE INTO stats_totals (id, total_products, total_stock, total_value, total_companies)
+SELECT 1, COUNT(*), COALESCE(SUM(stock), 0), COALESCE(SUM(price * stock), 0), COUNT(DISTINCT company_name)
+FROM products WHERE status = 'active';
+DELETE FROM stats_companies;
+INSERT INTO stats_companies (company_name, product_count)
+SELECT company_name, COUNT(*) FROM products WHERE status = 'active' GROUP BY company_name;
+DELETE FROM stats_categories;
+INSERT INTO stats_categories (category, product_count)
+SELECT category, COUNT(*) FROM products WHERE status = 'active' AND category IS NOT NULL GROUP BY category;
+"""
+
+def has_stats_rollups(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stats_totals'").fetchone() is not None
+
+def rebuild_stats_rollups(conn):
+    """在当前事务中重新计算汇总表（不提交）"""
+    for statement in STATS_ROLLUP_REBUILD_SQL.split(';'):
+        if statement.strip():
+            conn.execute(statement)
+
+# 以 products 为外部内容表的全文索引：默认分词（/api/search）和三元组子串搜索（migrations/0006）
+PRODUCT_FTS_TABLES = ('products_fts', 'products_trigram')
+
+def existing_tables(conn, names):
+    """names 中已经存在的表（保持原顺序）"""
+    found = {row[0] for row in conn.execute(
+        f"SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ({', '.join('?' for _ in names)})", names)}
+    return [name for name in names if name in found]
+
+@contextmanager
+def deferred_indexes(conn, table='products', fts_tables=None):
+    """批量写入期间删除表上的触发器和二级索引，结束后重建索引、一次性重建FTS索引和统计汇总表、恢复触发器
+
+    fts_tables 默认为 products 上已经迁移的全文索引（PRODUCT_FTS_TABLES）。
+    UNIQUE约束自带的索引无法删除，会一直保留（INSERT OR IGNORE 仍然按它去重）。
+    """
+    if fts_tables is None:
+        fts_tables = existing_tables(conn, PRODUCT_FTS_TABLES) if table == 'products' else ()
+    saved = conn.execute(
+        "SELECT type, name, sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+        (table,)
+    ).fetchall()
+    for kind, name, _ in saved:
+        conn.execute(f"DROP {kind.upper()} IF EXISTS {name}")
+    conn.commit()
+    try:
+        yield
+    finally:
+        for kind, _, sql in saved:
+            if kind == 'index':
+                conn.execute(sql)
+        for fts in fts_tables:
+            conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+        if table == 'products' and has_stats_rollups(conn):
+            rebuild_stats_rollups(conn)
+        for kind, _, sql in saved:
+            if kind == 'trigger':
+                conn.execute(sql)
+        conn.commit()
+
+def _token_expiry(token):
+    """读取JWT中的exp字段（不校验签名）"""
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload)).get('exp', 0)
+    except (IndexError, ValueError):
+        return 0
+
+class ApiError(Exception):
+    """API请求在重试后仍然失败"""
+
+    def __init__(self, message, response=None):
+        super().__init__(message)
+        self.response = response
+
+class ApiClient:
+    """Worker API 客户端：连接池复用、JWT缓存、自动重试"""
+
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+
+    def __init__(self, base_url=API_BASE_URL, username=API_USERNAME, password=API_PASSWORD,
+                 pool_size=16, timeout=60, max_retries=5, backoff_base=0.5, backoff_cap=30.0,
+                 token_cache=TOKEN_CACHE_FILE, metrics=None):
+        import requests  # 只有访问API的脚本才需要requests
+        from requests.adapters import HTTPAdapter
+
+        self.base_url = base_url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.token_cache = token_cache
+        self.token = None
+        self.metrics = metrics  # import_metrics.Metrics，记录每个请求的耗时、状态、字节数和重试
+        self._requests = requests
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    # ---- 登录和令牌缓存 ----
+
+    def _cache_key(self):
+        return f"{self.base_url}|{self.username}"
+
+    def _load_cached_token(self):
+        if not self.token_cache:
+            return None
+        try:
+            with open(self.token_cache, 'r', encoding='utf-8') as f:
+                token = json.load(f).get(self._cache_key())
+        except (OSError, ValueError):
+            return None
+        if token and _token_expiry(token) > time.time() + 60:
+            return token
+        return None
+
+    def _save_cached_token(self, token):
+        try:
+            with open(self.token_cache, 'r', encoding='utf-8') as f:
+                tokens = json.load(f)
+        except (OSError, ValueError):
+            tokens = {}
+        tokens[self._cache_key()] = token
+        os.makedirs(os.path.dirname(self.token_cache), exist_ok=True)
+        tmp_path = self.token_cache + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(tokens, f)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, self.token_cache)
+
+    def login(self, force=False):
+        """获取JWT：优先使用未过期的缓存令牌，否则调用 /api/auth/login"""
+        if not force:
+            self.token = self.token or self._load_cached_token()
+            if self.token and _token_expiry(self.token) > time.time() + 60:
+                return self.token
+
+        response = self.request('POST', '/api/auth/login', auth=False,
+                                json={"username": self.username, "password": self.password})
+        if response.status_code != 200:
+            try:
+                error = response.json().get('error')
+            except ValueError:  # 网关错误页等非JSON响应体
+                error = None
+            raise ApiError(f"登录失败 (HTTP {response.status_code}): {error or response.text[:200]}", response)
+        try:
+            result = response.json()
+        except ValueError:
+            raise ApiError(f"登录失败: 响应不是JSON: {response.text[:200]}", response)
+        if not result.get("success"):
+            raise ApiError(f"登录失败: {result.get('error', response.text)}", response)
+
+        self.token = result["data"]["token"]
+        if self.token_cache:
+            self._save_cached_token(self.token)
+        return self.token
+
+    # ---- 请求 ----
+
+    def _backoff(self, attempt, response=None):
+        """全抖动指数退避；服务端给出 Retry-After 时以它为下限"""
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+        time.sleep(delay)
+
+    def _record(self, method, path, started, response=None):
+        """把一次请求记入 metrics；连接错误的 status 记为 error"""
+        endpoint = f"{method} {endpoint_label(path)}"
+        status = 'error' if response is None else str(response.status_code)
+        self.metrics.observe(REQUEST_SECONDS, time.monotonic() - started, endpoint=endpoint)
+        self.metrics.inc(REQUESTS, endpoint=endpoint, status=status)
+        if response is None:
+            return
+        body = response.request.body
+        if isinstance(body, (bytes, str)):  # 生成器请求体（流式上传）的字节数由调用方统计
+            self.metrics.inc(BYTES_SENT, len(body.encode() if isinstance(body, str) else body))
+        self.metrics.inc(BYTES_RECEIVED, len(response.content))
+
+    def request(self, method, path, auth=True, **kwargs):
+        """发送请求，返回 requests.Response
+
+        401 时重新登录一次；429/5xx 和连接错误按退避重试，用尽后抛出 ApiError。
+        data 是生成器（流式上传）时请求体无法重放，不做任何重试，由调用方重新生成后再发
+        """
+        url = path if path.startswith('http') else self.base_url + path
+        kwargs.setdefault('timeout', self.timeout)
+        base_headers = kwargs.pop('headers', None) or {}
+        replayable = not hasattr(kwargs.get('data'), '__next__')
+        max_retries = self.max_retries if replayable else 0
+        refreshed = not replayable
+        attempt = 0
+
+        while True:
+            headers = dict(base_headers)
+            if auth:
+                headers['Authorization'] = f"Bearer {self.login()}"
+
+            started = time.monotonic()
+            try:
+                response = self.session.request(method, url, headers=headers, **kwargs)
+            except (self._requests.ConnectionError, self._requests.Timeout) as e:
+                if self.metrics:
+                    self._record(method, path, started)
+                if attempt >= max_retries:
+                    raise ApiError(f"{method} {path} 请求失败: {e}")
+                self._backoff(attempt)
+                attempt += 1
+                if self.metrics:
+                    self.metrics.inc(RETRIES)
+                continue
+            if self.metrics:
+                self._record(method, path, started, response)
+
+            if response.status_code == 401 and auth and not refreshed:
+                refreshed = True
+                self.token = None
+                self.login(force=True)
+                continue
+
+            if response.status_code in self.RETRY_STATUS and attempt < max_retries:
+                self._backoff(attempt, response)
+                attempt += 1
+                if self.metrics:
+                    self.metrics.inc(RETRIES)
+                continue
+
+            return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request('PUT', path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request('DELETE', path, **kwargs)
+
+    def get_json(self, path, **kwargs):
+        """GET 并返回解析后的JSON"""
+        return self.get(path, **kwargs).json()
+
+    def post_json(self, path, payload, **kwargs):
+        """POST JSON 并返回解析后的JSON"""
+        return self.post(path, json=payload, **kwargs).json()
+
+    def iter_products(self, params=None, page_size=500):
+        """用游标模式逐页遍历 GET /api/products，逐个产出商品字典
+
+        params 是筛选和排序参数（search、category、sortBy 等）。每页从上一页末尾继续读，
+        完整遍历的开销与行数成正比，不会像 page/OFFSET 那样越往后越慢
+        """
+        query = dict(params or {}, limit=page_size, cursor='')
+        while True:
+            response = self.get('/api/products', params=query)
+            try:
+                result = response.json()
+            except ValueError:  # 网关错误页等非JSON响应体
+                result = {}
+            if response.status_code != 200 or not result.get('success'):
+                raise ApiError(f"获取商品列表失败 (HTTP {response.status_code}): "
+                               f"{result.get('error') or response.text[:200]}", response)
+            pagination = result.get('pagination') or {}
+            if 'nextCursor' not in pagination:
+                raise ApiError("服务端不支持游标分页（需要部署新版Worker）", response)
+            yield from result['data']
+            if not pagination['nextCursor']:
+                return
+            query['cursor'] = pagination['nextCursor']
+
+    def close(self):
+        self.session.close()
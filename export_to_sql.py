@@ -1,95 +1,280 @@
 #!/usr/bin/env python3
 """
 简化的数据导出脚本：将开发环境数据导出为SQL文件
+
+默认使用 id 游标（keyset）分页流式导出：每批用 `id > last_id` 定位，
+取到后立即写入磁盘，内存占用不随数据量增长。
+指定 --shards 时按 id 区间切分，用进程池并行导出，每个区间一个分片文件。
+默认直接读取 .wrangler/state 下的本地D1 SQLite文件，找不到时回退到 wrangler 查询。
+--format snapshot 时输出列式快照（见 product_snapshot.py），体积更小、加载更快。
+
+--incremental 时只导出上次运行之后新增或修改的行（按 updated_at + id 水位线），
+status 不是 active 的行作为删除标记（tombstone）一起导出；全量快照加上依次
+生成的增量文件可以用 `product_snapshot.py merge` 合并出最新的全量快照。
+
+--metrics-jsonl / --metrics-prom 输出读取和写出的行数、文件字节数和每批耗时（见 import_metrics）；
+并行导出时每个分片在子进程中记录，分片完成时汇总到主进程。
 """
 
-import subprocess
+import argparse
 import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-def run_wrangler_query(query):
-    """执行wrangler查询并返回结果"""
-    cmd = ['npx', 'wrangler', 'd1', 'execute', 'webapp-production', '--local', '--command', query]
-    result = subprocess.run(cmd, capture_output=True, text=True, cwd='/home/user/webapp')
-    
-    if result.returncode != 0:
-        print(f"查询错误: {result.stderr}")
-        return None
-    
-    try:
-        # 提取JSON部分
-        output = result.stdout
-        json_start = output.find('[\n  {\n    "results":')
-        if json_start == -1:
-            return None
-            
-        json_part = output[json_start:]
-        json_end = json_part.find('\n]\n')
-        if json_end == -1:
-            return None
-            
-        json_str = json_part[:json_end + 2]
-        data = json.loads(json_str)
-        return data[0]["results"] if data and "results" in data[0] else []
-    except Exception as e:
-        print(f"JSON解析错误: {e}")
+from d1_client import PROJECT_DIR, build_insert_sql, open_backend
+from import_metrics import (BATCH_SECONDS, BYTES_WRITTEN, ROWS_READ, ROWS_WRITTEN, Histogram, add_metrics_arguments,
+                            metrics_from_args)
+from product_snapshot import COLUMNS as SNAPSHOT_COLUMNS, SnapshotWriter
+
+OUTPUT_FILE = os.path.join(PROJECT_DIR, 'migration_data.sql')
+SNAPSHOT_FILE = os.path.join(PROJECT_DIR, 'migration_data.psnap')
+WATERMARK_FILE = os.path.join(PROJECT_DIR, 'export_watermark.json')
+EXPORT_COLUMNS = "id, name, company_name, price, stock, description, category, sku, status"
+
+def rows_to_insert_sql(rows):
+    """把一批商品数据转换为INSERT语句（每行一条）"""
+    return build_insert_sql(rows, rows_per_statement=1,
+                            defaults={'price': 0, 'stock': 0, 'status': 'active'})
+
+def _new_stats(output_path):
+    """一个分片的导出统计；batch_seconds 记录每批读取加写出的耗时，随结果从子进程返回"""
+    return {'file': output_path, 'rows': 0, 'bytes': 0, 'batch_seconds': Histogram()}
+
+def export_range(output_path, batch_size, start_id=0, end_id=None, backend_kind='auto', fmt='sql'):
+    """流式导出一个 id 区间到文件，返回统计信息字典（rows、bytes、batch_seconds）"""
+    if fmt == 'snapshot':
+        return export_snapshot_range(output_path, batch_size, start_id, end_id, backend_kind)
+
+    stats = _new_stats(output_path)
+    tmp_path = output_path + '.tmp'
+    backend = open_backend(backend_kind)
+
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        batch_started = time.perf_counter()
+        for batch_data in backend.iter_products(EXPORT_COLUMNS, batch_size, start_id, end_id):
+            f.write(rows_to_insert_sql(batch_data) + '\n')
+            f.flush()
+            stats['rows'] += len(batch_data)
+            stats['batch_seconds'].observe(time.perf_counter() - batch_started)
+            print(f"[{os.path.basename(output_path)}] 已导出 {stats['rows']} 条 (last id={batch_data[-1]['id']})")
+            batch_started = time.perf_counter()
+
+    backend.close()
+    os.replace(tmp_path, output_path)
+    stats['bytes'] = os.path.getsize(output_path)
+    return stats
+
+def export_snapshot_range(output_path, batch_size, start_id=0, end_id=None, backend_kind='auto'):
+    """流式导出一个 id 区间为列式快照，返回统计信息字典"""
+    stats = _new_stats(output_path)
+    backend = open_backend(backend_kind)
+    meta = {'source': getattr(backend, 'path', backend.kind), 'start_id': start_id, 'end_id': end_id}
+
+    with SnapshotWriter(output_path, meta=meta) as writer:
+        batch_started = time.perf_counter()
+        for batch_data in backend.iter_products(', '.join(SNAPSHOT_COLUMNS), batch_size, start_id, end_id):
+            writer.write_rows(batch_data)
+            stats['rows'] += len(batch_data)
+            stats['batch_seconds'].observe(time.perf_counter() - batch_started)
+            print(f"[{os.path.basename(output_path)}] 已导出 {stats['rows']} 条 (last id={batch_data[-1]['id']})")
+            batch_started = time.perf_counter()
+
+    backend.close()
+    stats['bytes'] = os.path.getsize(output_path)
+    return stats
+
+def record_stats(metrics, stats, shard=None):
+    """把一个分片的导出统计记入 metrics"""
+    labels = {'shard': shard} if shard is not None else {}
+    metrics.inc(ROWS_READ, stats['rows'])
+    metrics.inc(ROWS_WRITTEN, stats['rows'], **labels)
+    metrics.inc(BYTES_WRITTEN, stats['bytes'], **labels)
+    metrics.merge(BATCH_SECONDS, stats['batch_seconds'], **labels)
+
+def load_watermark(path=WATERMARK_FILE):
+    """读取上次增量导出的水位线 (updated_at, id)，没有时返回 None"""
+    if not os.path.exists(path):
         return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
 
-def escape_sql_string(s):
-    """转义SQL字符串"""
-    if s is None:
-        return "NULL"
-    return "'" + str(s).replace("'", "''") + "'"
+def save_watermark(watermark, path=WATERMARK_FILE):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(watermark, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
 
-def main():
-    print("开始导出数据...")
-    
-    # 获取总数
-    total_query = "SELECT COUNT(*) as total FROM products WHERE status = 'active'"
-    total_result = run_wrangler_query(total_query)
-    
-    if not total_result:
-        print("无法获取数据总数")
+def iter_changed_rows(backend, batch_size, since_updated_at, since_id, until_updated_at):
+    """按 (updated_at, id) 游标读取水位线之后的变更行（包括非 active 行）
+
+    只读取 updated_at 早于 until_updated_at 的行：updated_at 精确到秒，
+    当前这一秒内还可能有写入，留到下一次导出，避免漏掉同一秒内 id 更小的行。
+    updated_at 为 NULL 的旧数据视为最小值（水位线记为 ''），在首次导出时先按 id 读出。
+    """
+    columns = ', '.join(SNAPSHOT_COLUMNS)
+    last_updated, last_id = since_updated_at, since_id
+
+    # 单独按主键读取 NULL 行，下面的主查询仍然可以走 (updated_at, id) 索引
+    while not last_updated:
+        rows = backend.query(
+            f"SELECT {columns} FROM products WHERE updated_at IS NULL AND id > ? ORDER BY id LIMIT ?",
+            (last_id, batch_size)
+        )
+        if rows is None:
+            raise RuntimeError("读取 updated_at 为空的行失败")
+        if not rows:
+            break
+        yield rows
+        last_id = rows[-1]['id']
+        if len(rows) < batch_size:
+            break
+
+    while True:
+        rows = backend.query(
+            f"SELECT {columns} FROM products "
+            "WHERE (updated_at > ? OR (updated_at = ? AND id > ?)) AND updated_at < ? "
+            "ORDER BY updated_at, id LIMIT ?",
+            (last_updated, last_updated, last_id, until_updated_at, batch_size)
+        )
+        if rows is None:
+            raise RuntimeError(f"读取 updated_at >= {last_updated} 的变更失败")
+        if not rows:
+            return
+
+        yield rows
+        last_updated, last_id = rows[-1]['updated_at'], rows[-1]['id']
+
+        if len(rows) < batch_size:
+            return
+
+def export_incremental(output_dir, batch_size, backend_kind='auto', watermark_path=WATERMARK_FILE):
+    """导出水位线之后的变更为增量快照，成功后推进水位线，返回 (文件路径, 统计信息字典)"""
+    previous = load_watermark(watermark_path) or {'updated_at': '', 'id': 0}
+    backend = open_backend(backend_kind)
+    until = backend.query("SELECT CURRENT_TIMESTAMP AS now")[0]['now']
+
+    output_path = os.path.join(output_dir, f"migration_delta_{time.strftime('%Y%m%d-%H%M%S')}.psnap")
+    meta = {
+        'kind': 'delta',
+        'source': getattr(backend, 'path', backend.kind),
+        'from': previous,
+    }
+    stats = _new_stats(output_path)
+    tombstones = 0
+    current = dict(previous)
+
+    with SnapshotWriter(output_path, meta=meta) as writer:
+        batch_started = time.perf_counter()
+        for rows in iter_changed_rows(backend, batch_size, previous['updated_at'], previous['id'], until):
+            writer.write_rows(rows)
+            stats['rows'] += len(rows)
+            stats['batch_seconds'].observe(time.perf_counter() - batch_started)
+            tombstones += sum(1 for row in rows if row['status'] != 'active')
+            current = {'updated_at': rows[-1]['updated_at'] or '', 'id': rows[-1]['id']}
+            print(f"[{os.path.basename(output_path)}] 已导出 {stats['rows']} 条变更 (删除标记 {tombstones} 条)")
+            batch_started = time.perf_counter()
+
+    backend.close()
+    stats['bytes'] = os.path.getsize(output_path)
+    save_watermark(dict(current, exported_at=until, file=os.path.basename(output_path)), watermark_path)
+    return output_path, stats
+
+def split_id_ranges(min_id, max_id, shards):
+    """把 [min_id, max_id] 切成 shards 个左开右闭区间 (lo, hi]"""
+    span = max_id - min_id + 1
+    step = max(1, -(-span // shards))
+    ranges = []
+    lo = min_id - 1
+    while lo < max_id:
+        hi = min(lo + step, max_id)
+        ranges.append((lo, hi))
+        lo = hi
+    return ranges
+
+def shard_path(output_path, index):
+    """分片文件名：migration_data.part001.sql"""
+    root, ext = os.path.splitext(output_path)
+    return f"{root}.part{index:03d}{ext or '.sql'}"
+
+def export_parallel(output_path, batch_size, shards, workers, backend_kind='auto', fmt='sql', metrics=None):
+    """按 id 区间并行导出，每个区间写一个分片文件，返回导出总条数"""
+    backend = open_backend(backend_kind)
+    bounds = backend.query("SELECT MIN(id) as min_id, MAX(id) as max_id FROM products WHERE status = 'active'")
+    backend.close()
+    if not bounds or bounds[0]["min_id"] is None:
+        print("没有可导出的数据")
+        return 0
+
+    ranges = split_id_ranges(bounds[0]["min_id"], bounds[0]["max_id"], shards)
+    print(f"按 id 切分为 {len(ranges)} 个区间，使用 {workers} 个进程并行导出")
+
+    total = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(export_range, shard_path(output_path, i + 1), batch_size, lo, hi, backend_kind, fmt):
+                (i + 1, lo, hi)
+            for i, (lo, hi) in enumerate(ranges)
+        }
+        for future in as_completed(futures):
+            index, lo, hi = futures[future]
+            stats = future.result()
+            total += stats['rows']
+            if metrics:
+                record_stats(metrics, stats, shard=f"{index:03d}")
+            print(f"区间 ({lo}, {hi}] 完成: {stats['rows']} 条")
+
+    return total
+
+def run_export(args, metrics):
+    """按命令行参数执行全量、并行或增量导出，导出统计记入 metrics"""
+    if args.incremental:
+        print("开始增量导出...")
+        output_dir = args.output or PROJECT_DIR
+        path, stats = export_incremental(output_dir, args.batch_size, args.backend, args.watermark)
+        record_stats(metrics, stats)
+        print(f"增量导出完成！文件保存为: {os.path.basename(path)}，共 {stats['rows']} 条变更")
         return
-    
-    total_count = total_result[0]["total"]
-    print(f"找到 {total_count} 条数据")
-    
-    # 分批导出数据
-    batch_size = 500
-    sql_lines = []
-    
-    for offset in range(0, total_count, batch_size):
-        print(f"导出 {offset + 1} - {min(offset + batch_size, total_count)} 条数据...")
-        
-        query = f"SELECT name, company_name, price, stock, description, category, sku, status FROM products WHERE status = 'active' ORDER BY id LIMIT {batch_size} OFFSET {offset}"
-        
-        batch_data = run_wrangler_query(query)
-        if not batch_data:
-            print(f"导出第 {offset} 批数据失败")
-            continue
-        
-        # 转换为SQL INSERT语句
-        for item in batch_data:
-            name = escape_sql_string(item.get('name'))
-            company_name = escape_sql_string(item.get('company_name'))
-            price = item.get('price', 0)
-            stock = item.get('stock', 0)
-            description = escape_sql_string(item.get('description'))
-            category = escape_sql_string(item.get('category'))
-            sku = escape_sql_string(item.get('sku'))
-            status = escape_sql_string(item.get('status', 'active'))
-            
-            sql_line = f"INSERT INTO products (name, company_name, price, stock, description, category, sku, status) VALUES ({name}, {company_name}, {price}, {stock}, {description}, {category}, {sku}, {status});"
-            sql_lines.append(sql_line)
-    
-    # 写入SQL文件
-    print(f"写入SQL文件，共 {len(sql_lines)} 条INSERT语句...")
-    with open('/home/user/webapp/migration_data.sql', 'w', encoding='utf-8') as f:
-        for line in sql_lines:
-            f.write(line + '\n')
-    
-    print(f"数据导出完成！文件保存为: migration_data.sql")
-    print(f"共导出 {len(sql_lines)} 条数据")
+
+    if not args.output:
+        args.output = SNAPSHOT_FILE if args.format == 'snapshot' else OUTPUT_FILE
+
+    print("开始导出数据...")
+
+    if args.shards > 1:
+        total = export_parallel(args.output, args.batch_size, args.shards, min(args.workers, args.shards),
+                                args.backend, args.format, metrics)
+        print(f"数据导出完成！分片文件保存为: {shard_path(args.output, 1)} ...")
+    else:
+        stats = export_range(args.output, args.batch_size, backend_kind=args.backend, fmt=args.format)
+        record_stats(metrics, stats)
+        total = stats['rows']
+        print(f"数据导出完成！文件保存为: {os.path.basename(args.output)}")
+
+    print(f"共导出 {total} 条数据")
+
+def main():
+    parser = argparse.ArgumentParser(description='导出开发环境商品数据为SQL文件')
+    parser.add_argument('--output', help='输出文件路径（默认 migration_data.sql / migration_data.psnap；--incremental 时为输出目录）')
+    parser.add_argument('--format', choices=['sql', 'snapshot'], default='sql',
+                        help='sql: 每行一条INSERT；snapshot: 列式压缩快照')
+    parser.add_argument('--batch-size', type=int, default=500, help='每批读取条数')
+    parser.add_argument('--shards', type=int, default=1, help='按 id 区间切分的分片数，大于1时并行导出')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4, help='并行导出的进程数')
+    parser.add_argument('--backend', choices=['auto', 'sqlite', 'wrangler'], default='auto',
+                        help='数据来源：直接读本地SQLite文件或通过wrangler查询')
+    parser.add_argument('--incremental', action='store_true',
+                        help='只导出上次增量导出之后变更的行（输出增量快照）')
+    parser.add_argument('--watermark', default=WATERMARK_FILE, help='增量导出水位线文件')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    metrics = metrics_from_args('export_to_sql', args)
+    try:
+        run_export(args, metrics)
+    finally:
+        metrics.close()
+    metrics.print_summary()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
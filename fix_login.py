@@ -1,13 +1,14 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import requests
 import json
 
+from d1_client import ApiClient
+
 def test_login_simple():
     """简单测试登录功能"""
     
-    base_url = "https://3000-i210jj9hxq7tsgvpii0sp-6532622b.e2b.dev"
+    api = ApiClient(timeout=10)
     
     print("🔐 测试登录功能...")
     
@@ -24,14 +25,13 @@ def test_login_simple():
         print(f"用户名: {test_case['username']}, 密码: {test_case['password']}")
         
         try:
-            response = requests.post(
-                f"{base_url}/api/auth/login",
+            response = api.post(
+                "/api/auth/login",
+                auth=False,
                 json={
                     "username": test_case["username"],
                     "password": test_case["password"]
-                },
-                headers={"Content-Type": "application/json"},
-                timeout=10
+                }
             )
             
             print(f"HTTP状态码: {response.status_code}")
@@ -42,8 +42,9 @@ def test_login_simple():
                 
                 if result.get("success"):
                     print("✅ 登录成功!")
-                    if result.get("token"):
-                        print(f"🎫 Token: {result['token'][:50]}...")
+                    token = result.get("data", {}).get("token")
+                    if token:
+                        print(f"🎫 Token: {token[:50]}...")
                 else:
                     print(f"❌ 登录失败: {result.get('error')}")
                     
@@ -2,14 +2,30 @@
 # -*- coding: utf-8 -*-
 """
 大规模商品测试数据生成器
-生成接近2万条商品数据用于测试系统性能
+按批生成列数据并流式写出CSV/SQL，内存占用与总行数无关，可以生成上千万行的性能测试数据。
+相同的随机种子和批大小总是生成完全相同的数据（与并行进程数无关）。
+
+用法:
+    python3 generate_test_data.py                                  # 5000条，CSV和SQL
+    python3 generate_test_data.py --rows 20000000 --format csv --workers 8
+    python3 generate_test_data.py --rows 1000000 --seed 7 --output bench_1m
+    python3 generate_test_data.py --rows 5000000 --format sqlite --db bench_5m.sqlite   # 直接生成可用于测试的数据库
 """
 
-import random
-import json
+import argparse
 import csv
+import io
+import os
+import random
+import sqlite3
+import string
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
+from d1_client import apply_migrations, deferred_indexes, sql_literal
+
 # 商品名称模板
 product_templates = {
     '数码电子': [
@@ -116,140 +132,304 @@ companies = [
     '博世公司', '西门子', '松下电器', '飞利浦公司', '戴森公司', '科沃斯',
 ]
 
-def generate_product_name(category):
-    """根据类别生成商品名称"""
-    if category not in product_templates:
-        return f"{category}商品 {random.randint(1, 1000)}"
-    
-    template = random.choice(product_templates[category])
-    
-    # 替换占位符
-    replacements = {
-        '{model}': random.choice(models),
-        '{color}': random.choice(colors),
-        '{storage}': random.choice(storages),
-        '{size}': random.choice(sizes),
-        '{config}': random.choice(configs),
-        '{capacity}': random.choice(capacities),
-        '{power}': random.choice(powers),
-        '{series}': random.choice(series),
-        '{spec}': random.choice(specs),
-        '{type}': random.choice(['衬衫', 'T恤', '外套', '裤子', '裙子']),
-        '{product}': random.choice(['纯牛奶', '酸奶', '奶茶', '果汁', '矿泉水']),
-        '{stage}': random.choice(['1', '2', '3']),
-        '{count}': str(random.choice([24, 36, 48, 64, 72]))
+CATEGORIES = list(product_templates.keys()) + ['运动户外', '汽车用品', '图书文具', '宠物用品',
+                                               '家居装饰', '办公用品', '厨房用品', '清洁用品',
+                                               '个人护理', '营养保健', '工具五金']
+
+# 各类别的价格区间
+PRICE_RANGES = {
+    '数码电子': (99, 19999),
+    '家用电器': (199, 15999),
+    '服装鞋帽': (49, 2999),
+    '食品饮料': (15, 299),
+    '生活用品': (8, 199),
+    '母婴用品': (29, 599),
+    '运动户外': (99, 1999),
+    '汽车用品': (25, 1999),
+    '图书文具': (5, 299),
+    '宠物用品': (19, 799),
+    '家居装饰': (99, 9999),
+    '办公用品': (29, 2999),
+    '厨房用品': (39, 999),
+    '清洁用品': (12, 89),
+    '个人护理': (25, 1299),
+    '营养保健': (39, 999),
+    '工具五金': (25, 1999)
+}
+
+# SKU前缀
+CATEGORY_CODES = {
+    '数码电子': 'DE',
+    '家用电器': 'JD',
+    '服装鞋帽': 'FZ',
+    '食品饮料': 'SP',
+    '生活用品': 'SH',
+    '母婴用品': 'MY',
+    '运动户外': 'YD',
+    '汽车用品': 'QC',
+    '图书文具': 'TS',
+    '宠物用品': 'CW',
+    '家居装饰': 'JJ',
+    '办公用品': 'BG',
+    '厨房用品': 'CF',
+    '清洁用品': 'QJ',
+    '个人护理': 'HL',
+    '营养保健': 'YY',
+    '工具五金': 'GJ'
+}
+
+# 占位符的取值
+PLACEHOLDER_VALUES = {
+    'model': models,
+    'color': colors,
+    'storage': storages,
+    'size': sizes,
+    'config': configs,
+    'capacity': capacities,
+    'power': powers,
+    'series': series,
+    'spec': specs,
+    'type': ['衬衫', 'T恤', '外套', '裤子', '裙子'],
+    'product': ['纯牛奶', '酸奶', '奶茶', '果汁', '矿泉水'],
+    'stage': ['1', '2', '3'],
+    'count': ['24', '36', '48', '64', '72'],
+}
+
+# {0} 为商品名称，{1} 为类别
+DESCRIPTION_TEMPLATES = [
+    "优质{0}，{1}类目热销产品",
+    "精选{0}，品质保证，用户好评如潮",
+    "全新{0}，采用先进技术，性能卓越",
+    "热销{0}，高性价比选择，值得拥有",
+    "经典{0}，久经市场考验，质量可靠",
+    "时尚{0}，紧跟潮流趋势，彰显品味",
+    "专业{0}，满足专业需求，效果显著",
+    "实用{0}，日常必备，便民利民"
+]
+
+FIELDS = ['name', 'company_name', 'price', 'stock', 'description', 'category', 'sku']
+DEFAULT_BATCH_SIZE = 50000
+SQL_ROWS_PER_STATEMENT = 500
+SQL_INSERT = f"INSERT OR IGNORE INTO products ({', '.join(FIELDS)}) VALUES\n"
+
+def _compile_template(template):
+    """把 {model} 形式的命名占位符改成位置占位符，返回 (模板, 占位符列表)"""
+    fields = [f for _, f, _, _ in string.Formatter().parse(template) if f]
+    positional = template
+    for i, field in enumerate(fields):
+        positional = positional.replace('{' + field + '}', '{' + str(i) + '}', 1)
+    return positional, fields
+
+COMPILED_TEMPLATES = {
+    category: [_compile_template(t) for t in templates]
+    for category, templates in product_templates.items()
+}
+
+def generate_names(rng, categories):
+    """批量生成商品名称：同一模板的行一起格式化，只为模板中出现的占位符抽样"""
+    names = [None] * len(categories)
+    groups = {}
+    for i, category in enumerate(categories):
+        groups.setdefault(category, []).append(i)
+
+    for category, positions in groups.items():
+        templates = COMPILED_TEMPLATES.get(category)
+        if not templates:
+            numbers = rng.choices(range(1, 1001), k=len(positions))
+            for i, number in zip(positions, numbers):
+                names[i] = f"{category}商品 {number}"
+            continue
+
+        by_template = {}
+        for i, t in zip(positions, rng.choices(range(len(templates)), k=len(positions))):
+            by_template.setdefault(t, []).append(i)
+        for t, rows in by_template.items():
+            template, fields = templates[t]
+            if not fields:
+                for i in rows:
+                    names[i] = template
+                continue
+            fmt = template.format
+            columns = [rng.choices(PLACEHOLDER_VALUES[f], k=len(rows)) for f in fields]
+            for i, values in zip(rows, zip(*columns)):
+                names[i] = fmt(*values)
+    return names
+
+def generate_columns(rng, start, count):
+    """生成第 start+1 ~ start+count 条商品数据，按列返回 {字段: 值列表}"""
+    categories = rng.choices(CATEGORIES, k=count)
+    names = generate_names(rng, categories)
+
+    ranges = [PRICE_RANGES.get(c, (10, 999)) for c in categories]
+    prices = [round(lo + (hi - lo) * rng.random(), 2) for lo, hi in ranges]
+    # 80%的商品有正常库存（10~500），20%库存较低或为0（0~9）
+    stocks = [10 + int(u * 613.75) if u < 0.8 else int((u - 0.8) * 50)
+              for u in [rng.random() for _ in range(count)]]
+    descriptions = [DESCRIPTION_TEMPLATES[d].format(n, c)
+                    for d, n, c in zip(rng.choices(range(len(DESCRIPTION_TEMPLATES)), k=count), names, categories)]
+    skus = [f"{CATEGORY_CODES.get(c, 'XX')}-{index:06d}-{suffix}"
+            for index, c, suffix in zip(range(start + 1, start + count + 1), categories,
+                                        rng.choices(range(100, 1000), k=count))]
+
+    return {
+        'name': names,
+        'company_name': rng.choices(companies, k=count),
+        'price': prices,
+        'stock': stocks,
+        'description': descriptions,
+        'category': categories,
+        'sku': skus,
     }
-    
-    name = template
-    for placeholder, value in replacements.items():
-        name = name.replace(placeholder, value)
-    
-    return name
-
-def generate_price(category):
-    """根据类别生成合理的价格"""
-    price_ranges = {
-        '数码电子': (99, 19999),
-        '家用电器': (199, 15999),
-        '服装鞋帽': (49, 2999),
-        '食品饮料': (15, 299),
-        '生活用品': (8, 199),
-        '母婴用品': (29, 599),
-        '运动户外': (99, 1999),
-        '汽车用品': (25, 1999),
-        '图书文具': (5, 299),
-        '宠物用品': (19, 799),
-        '家居装饰': (99, 9999),
-        '办公用品': (29, 2999),
-        '厨房用品': (39, 999),
-        '清洁用品': (12, 89),
-        '个人护理': (25, 1299),
-        '营养保健': (39, 999),
-        '工具五金': (25, 1999)
+
+def batch_rng(seed, start):
+    """每一批使用独立的随机数生成器，保证结果与并行进程数无关"""
+    return random.Random(f"{seed}:{start}")
+
+def render_csv(rows):
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    return buf.getvalue()
+
+def render_sql(rows, rows_per_statement=SQL_ROWS_PER_STATEMENT):
+    parts = []
+    for i in range(0, len(rows), rows_per_statement):
+        values = ",\n".join("(" + ", ".join(map(sql_literal, row)) + ")" for row in rows[i:i + rows_per_statement])
+        parts.append(SQL_INSERT + values + ";\n\n")
+    return ''.join(parts)
+
+RENDERERS = {'csv': render_csv, 'sql': render_sql, 'rows': list}
+
+def render_batch(task):
+    """进程池任务：生成一批数据并渲染为各输出格式的文本"""
+    seed, start, count, formats = task
+    columns = generate_columns(batch_rng(seed, start), start, count)
+    rows = list(zip(*(columns[f] for f in FIELDS)))
+    texts = {fmt: RENDERERS[fmt](rows) for fmt in formats}
+    return count, texts, Counter(columns['category']), Counter(columns['company_name'])
+
+def iter_batches(rows, seed, batch_size=DEFAULT_BATCH_SIZE, formats=('csv',), workers=1):
+    """按顺序产出渲染好的批次；并行时最多有 workers*2 个批次在内存中"""
+    tasks = ((seed, start, min(batch_size, rows - start), tuple(formats))
+             for start in range(0, rows, batch_size))
+    if workers <= 1:
+        yield from map(render_batch, tasks)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(render_batch, task))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def write_dataset(output_prefix, rows, seed, batch_size=DEFAULT_BATCH_SIZE, formats=('csv', 'sql'), workers=1):
+    """流式生成数据并写入 <prefix>.csv / <prefix>.sql，内存占用与总行数无关"""
+    paths = {fmt: f"{output_prefix}.{fmt}" for fmt in formats}
+    files = {fmt: open(path + '.tmp', 'w', encoding='utf-8', newline='') for fmt, path in paths.items()}
+    categories = Counter()
+    company_counts = Counter()
+    written = 0
+    started = time.monotonic()
+
+    try:
+        if 'csv' in files:
+            files['csv'].write(','.join(FIELDS) + '\r\n')
+        if 'sql' in files:
+            files['sql'].write("-- 自动生成的大规模测试数据\n")
+            files['sql'].write(f"-- 生成时间: {datetime.now()}\n")
+            files['sql'].write(f"-- 数据条数: {rows}，随机种子: {seed}，批大小: {batch_size}\n\n")
+
+        for count, texts, batch_categories, batch_companies in iter_batches(rows, seed, batch_size, formats, workers):
+            for fmt, text in texts.items():
+                files[fmt].write(text)
+            categories.update(batch_categories)
+            company_counts.update(batch_companies)
+            written += count
+            elapsed = time.monotonic() - started
+            print(f"已生成 {written:,}/{rows:,} 条数据 ({written / elapsed if elapsed else 0:,.0f} 行/秒)")
+    finally:
+        for f in files.values():
+            f.close()
+
+    for path in paths.values():
+        os.replace(path + '.tmp', path)
+    return {
+        'rows': written,
+        'paths': paths,
+        'categories': categories,
+        'companies': company_counts,
+        'seconds': time.monotonic() - started,
     }
-    
-    min_price, max_price = price_ranges.get(category, (10, 999))
-    return round(random.uniform(min_price, max_price), 2)
-
-def generate_stock():
-    """生成库存数量"""
-    # 80%的商品有正常库存，20%库存较低或为0
-    if random.random() < 0.8:
-        return random.randint(10, 500)
-    else:
-        return random.randint(0, 9)
-
-def generate_sku(category, index):
-    """生成SKU编号"""
-    category_codes = {
-        '数码电子': 'DE',
-        '家用电器': 'JD',
-        '服装鞋帽': 'FZ',
-        '食品饮料': 'SP',
-        '生活用品': 'SH',
-        '母婴用品': 'MY',
-        '运动户外': 'YD',
-        '汽车用品': 'QC',
-        '图书文具': 'TS',
-        '宠物用品': 'CW',
-        '家居装饰': 'JJ',
-        '办公用品': 'BG',
-        '厨房用品': 'CF',
-        '清洁用品': 'QJ',
-        '个人护理': 'HL',
-        '营养保健': 'YY',
-        '工具五金': 'GJ'
+
+# 批量导入时的SQLite设置：不写回滚日志、不fsync、加大页缓存，文件是新建的，中途失败直接删除重来
+BULK_LOAD_PRAGMAS = [
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA locking_mode = EXCLUSIVE",
+    "PRAGMA cache_size = -524288",
+    "PRAGMA temp_store = MEMORY",
+]
+
+def load_sqlite(db_path, rows, seed, batch_size=DEFAULT_BATCH_SIZE, workers=1, transaction_rows=1000000):
+    """新建SQLite数据库：执行 migrations/ 后直接批量写入数据，FTS索引和二级索引在最后一次性构建"""
+    tmp_path = db_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    categories = Counter()
+    company_counts = Counter()
+    written = 0
+    started = time.monotonic()
+
+    conn = sqlite3.connect(tmp_path, isolation_level=None)
+    try:
+        migrations = apply_migrations(conn)
+        print(f"已执行迁移: {', '.join(migrations)}")
+        for pragma in BULK_LOAD_PRAGMAS:
+            conn.execute(pragma)
+
+        sql = f"INSERT OR IGNORE INTO products ({', '.join(FIELDS)}) VALUES ({', '.join('?' for _ in FIELDS)})"
+        with deferred_indexes(conn):
+            conn.execute("BEGIN")
+            pending = 0
+            for count, texts, batch_categories, batch_companies in iter_batches(rows, seed, batch_size, ('rows',), workers):
+                conn.executemany(sql, texts['rows'])
+                categories.update(batch_categories)
+                company_counts.update(batch_companies)
+                written += count
+                pending += count
+                if pending >= transaction_rows:
+                    conn.execute("COMMIT")
+                    conn.execute("BEGIN")
+                    pending = 0
+                elapsed = time.monotonic() - started
+                print(f"已写入 {written:,}/{rows:,} 条数据 ({written / elapsed if elapsed else 0:,.0f} 行/秒)")
+            conn.execute("COMMIT")
+            print("正在重建索引和全文搜索索引...")
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA journal_mode = DELETE")
+    except BaseException:
+        conn.close()
+        os.remove(tmp_path)
+        raise
+    conn.close()
+
+    os.replace(tmp_path, db_path)
+    return {
+        'rows': written,
+        'paths': {'sqlite': db_path},
+        'categories': categories,
+        'companies': company_counts,
+        'seconds': time.monotonic() - started,
     }
-    
-    code = category_codes.get(category, 'XX')
-    return f"{code}-{index:06d}-{random.randint(100, 999)}"
-
-def generate_description(name, category):
-    """生成商品描述"""
-    descriptions = [
-        f"优质{name}，{category}类目热销产品",
-        f"精选{name}，品质保证，用户好评如潮",
-        f"全新{name}，采用先进技术，性能卓越",
-        f"热销{name}，高性价比选择，值得拥有",
-        f"经典{name}，久经市场考验，质量可靠",
-        f"时尚{name}，紧跟潮流趋势，彰显品味",
-        f"专业{name}，满足专业需求，效果显著",
-        f"实用{name}，日常必备，便民利民"
-    ]
-    return random.choice(descriptions)
-
-def generate_massive_data(count=5000):
-    """生成大量测试数据"""
-    categories = list(product_templates.keys()) + ['运动户外', '汽车用品', '图书文具', '宠物用品', 
-                                                  '家居装饰', '办公用品', '厨房用品', '清洁用品', 
-                                                  '个人护理', '营养保健', '工具五金']
-    
+
+def generate_massive_data(count=5000, seed=None, batch_size=DEFAULT_BATCH_SIZE):
+    """生成测试数据并返回商品字典列表（仅用于小数据量，大数据量请用 write_dataset 流式写文件）"""
     products = []
-    
-    for i in range(count):
-        category = random.choice(categories)
-        company = random.choice(companies)
-        name = generate_product_name(category)
-        price = generate_price(category)
-        stock = generate_stock()
-        sku = generate_sku(category, i + 1)
-        description = generate_description(name, category)
-        
-        product = {
-            'name': name,
-            'company_name': company,
-            'price': price,
-            'stock': stock,
-            'description': description,
-            'category': category,
-            'sku': sku
-        }
-        
-        products.append(product)
-        
-        if (i + 1) % 1000 == 0:
-            print(f"已生成 {i + 1} 条数据...")
-    
+    for start in range(0, count, batch_size):
+        columns = generate_columns(batch_rng(seed, start), start, min(batch_size, count - start))
+        products.extend(dict(zip(FIELDS, row)) for row in zip(*(columns[f] for f in FIELDS)))
     return products
 
 def save_as_sql(products, filename):
@@ -258,59 +438,50 @@ def save_as_sql(products, filename):
         f.write("-- 自动生成的大规模测试数据\n")
         f.write(f"-- 生成时间: {datetime.now()}\n")
         f.write(f"-- 数据条数: {len(products)}\n\n")
-        
-        # 分批插入，每500条一批
-        batch_size = 500
-        for i in range(0, len(products), batch_size):
-            batch = products[i:i + batch_size]
-            f.write("INSERT OR IGNORE INTO products (name, company_name, price, stock, description, category, sku) VALUES\n")
-            
-            values = []
-            for product in batch:
-                name = product['name'].replace("'", "''")
-                desc = product['description'].replace("'", "''")
-                value = f"('{name}', '{product['company_name']}', {product['price']}, {product['stock']}, '{desc}', '{product['category']}', '{product['sku']}')"
-                values.append(value)
-            
-            f.write(",\n".join(values) + ";\n\n")
+        f.write(render_sql([tuple(p[field] for field in FIELDS) for p in products]))
 
 def save_as_csv(products, filename):
     """保存为CSV文件"""
     with open(filename, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=['name', 'company_name', 'price', 'stock', 'description', 'category', 'sku'])
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
         writer.writeheader()
         writer.writerows(products)
 
-if __name__ == "__main__":
-    print("开始生成大规模测试数据...")
-    
-    # 生成5000条数据
-    products = generate_massive_data(5000)
-    
-    print(f"成功生成 {len(products)} 条商品数据")
-    
-    # 保存为SQL文件
-    save_as_sql(products, 'massive_test_data.sql')
-    print("已保存为 massive_test_data.sql")
-    
-    # 保存为CSV文件
-    save_as_csv(products, 'massive_test_data.csv')
-    print("已保存为 massive_test_data.csv")
-    
-    # 显示统计信息
-    categories = {}
-    companies = {}
-    for product in products:
-        categories[product['category']] = categories.get(product['category'], 0) + 1
-        companies[product['company_name']] = companies.get(product['company_name'], 0) + 1
-    
+def main():
+    parser = argparse.ArgumentParser(description='大规模商品测试数据生成器（流式写出，可复现）')
+    parser.add_argument('--rows', type=int, default=5000, help='生成的商品条数')
+    parser.add_argument('--seed', default='42', help='随机种子，相同的种子和批大小生成完全相同的数据')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='每批生成的行数')
+    parser.add_argument('--format', choices=['csv', 'sql', 'both', 'sqlite'], default='both',
+                        help='输出格式：sqlite 为直接生成执行过迁移、建好索引的数据库文件')
+    parser.add_argument('--output', default='massive_test_data', help='输出文件名前缀')
+    parser.add_argument('--db', help='sqlite 格式的数据库文件路径（默认 <output>.sqlite）')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='并行进程数')
+    args = parser.parse_args()
+
+    print(f"开始生成大规模测试数据: {args.rows:,} 条，种子 {args.seed}，{args.workers} 个进程并行...")
+    if args.format == 'sqlite':
+        stats = load_sqlite(args.db or f"{args.output}.sqlite", args.rows, args.seed, args.batch_size, args.workers)
+    else:
+        formats = ('csv', 'sql') if args.format == 'both' else (args.format,)
+        stats = write_dataset(args.output, args.rows, args.seed, args.batch_size, formats, args.workers)
+
+    for path in stats['paths'].values():
+        print(f"已保存为 {path}")
+
+    rows = stats['rows']
+    categories = stats['categories']
     print(f"\n统计信息:")
-    print(f"总商品数: {len(products)}")
+    print(f"总商品数: {rows}")
     print(f"分类数量: {len(categories)}")
-    print(f"公司数量: {len(companies)}")
-    print(f"平均每个分类商品数: {len(products) / len(categories):.1f}")
-    print(f"平均每个公司商品数: {len(products) / len(companies):.1f}")
-    
+    print(f"公司数量: {len(stats['companies'])}")
+    print(f"平均每个分类商品数: {rows / len(categories) if categories else 0:.1f}")
+    print(f"平均每个公司商品数: {rows / len(stats['companies']) if stats['companies'] else 0:.1f}")
+    print(f"耗时: {stats['seconds']:.1f}s ({rows / stats['seconds'] * 60 if stats['seconds'] else 0:,.0f} 行/分钟)")
+
     print(f"\n前5个分类:")
-    for category, count in sorted(categories.items(), key=lambda x: x[1], reverse=True)[:5]:
-        print(f"  {category}: {count}条")
\ No newline at end of file
+    for category, count in categories.most_common(5):
+        print(f"  {category}: {count}条")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+导入/导出工具共用的吞吐量和延迟指标
+
+各工具原来只在终端打印进度，另外各自写一份 *_import_stats.json，字段口径互相对不上。
+这里统一记录：
+
+  rows_read      从源文件或本地库读出的行
+  rows_sent      发送给服务端的行（重试不重复计）
+  rows_accepted  服务端确认写入的行
+  rows_rejected  被拒绝的行，stage=local（本地校验）/ server（服务端）
+  rows_skipped   数据库中已存在而跳过的行
+  rows_failed    重试用尽仍未送达的行
+  rows_written   写入本地文件的行（导出、CSV转换）
+  bytes_sent / bytes_received  请求体和响应体字节数
+  bytes_read / bytes_written   读取和写出的本地文件字节数
+  requests       请求数，按 endpoint 和 status 区分
+  retries        重试次数
+  request_seconds  每个请求的耗时直方图，按 endpoint 区分
+  batch_seconds    导出/转换时每批读取加写出的耗时直方图
+
+导出和转换在子进程中处理各个分片，子进程各自用 Histogram 记录批次耗时并随结果返回，
+主进程用 Metrics.merge 汇总。
+
+运行期间每隔 --metrics-interval 秒把快照追加到 JSONL 文件（每行一个JSON），
+并原子地重写 Prometheus textfile（供 node_exporter 的 textfile collector 采集）；
+结束时再写一次最终快照（"final": true），打印行/秒和 p95 延迟。
+两个输出都是可选的，不指定时只在内存中统计，最后打印汇总。
+
+    metrics = Metrics('async_import', jsonl_path='runs.jsonl', prom_path='/var/lib/node_exporter/import.prom')
+    metrics.start()
+    metrics.inc(ROWS_READ, 500)
+    metrics.observe(REQUEST_SECONDS, 0.12, endpoint='/api/products/batch')
+    metrics.close()
+    metrics.print_summary()
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from datetime import datetime, timezone
+
+METRIC_PREFIX = 'webapp_import_'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+ROWS_READ = 'rows_read'
+ROWS_SENT = 'rows_sent'
+ROWS_ACCEPTED = 'rows_accepted'
+ROWS_REJECTED = 'rows_rejected'
+ROWS_SKIPPED = 'rows_skipped'
+ROWS_FAILED = 'rows_failed'
+ROWS_WRITTEN = 'rows_written'
+BYTES_SENT = 'bytes_sent'
+BYTES_RECEIVED = 'bytes_received'
+BYTES_READ = 'bytes_read'
+BYTES_WRITTEN = 'bytes_written'
+REQUESTS = 'requests'
+RETRIES = 'retries'
+REQUEST_SECONDS = 'request_seconds'
+BATCH_SECONDS = 'batch_seconds'
+
+HELP = {
+    ROWS_READ: '从源文件或本地库读出的行数',
+    ROWS_SENT: '发送给服务端的行数（重试不重复计）',
+    ROWS_ACCEPTED: '服务端确认写入的行数',
+    ROWS_REJECTED: '被拒绝的行数（stage=local 本地校验，stage=server 服务端）',
+    ROWS_SKIPPED: '数据库中已存在而跳过的行数',
+    ROWS_FAILED: '重试用尽仍未送达的行数',
+    ROWS_WRITTEN: '写入本地文件的行数',
+    BYTES_SENT: '请求体字节数',
+    BYTES_RECEIVED: '响应体字节数',
+    BYTES_READ: '读取的本地文件字节数',
+    BYTES_WRITTEN: '写出的本地文件字节数',
+    REQUESTS: '请求数',
+    RETRIES: '重试次数',
+    REQUEST_SECONDS: '单个请求的耗时（秒）',
+    BATCH_SECONDS: '每批读取和写出的耗时（秒）',
+}
+
+_ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+def endpoint_label(path):
+    """把请求路径变成低基数的标签：去掉查询串和主机，数字id替换为 :id"""
+    path = re.sub(r'^https?://[^/]+', '', path).split('?', 1)[0]
+    return _ID_SEGMENT.sub('/:id', path) or '/'
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (f'{k}="' + str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+               for k, v in pairs)
+    return '{' + ','.join(escaped) + '}'
+
+class Histogram:
+    """固定桶的累积直方图（与 Prometheus histogram 语义相同）"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一个是 +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other):
+        """把另一个同样分桶的直方图累加进来"""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, q):
+        """在桶内线性插值估算分位数；落在 +Inf 桶时返回最大的有限边界"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': self.sum, 'buckets': dict(zip(map(str, self.buckets), self.counts)),
+                'inf': self.counts[-1], 'p50': self.quantile(0.5), 'p95': self.quantile(0.95)}
+
+class Metrics:
+    """线程安全的计数器和直方图，定期写入 JSONL 和 Prometheus textfile"""
+
+    def __init__(self, tool, jsonl_path=None, prom_path=None, interval=10.0):
+        self.tool = tool
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self.interval = interval
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---- 记录 ----
+
+    def inc(self, name, value=1, **labels):
+        if not value:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def merge(self, name, histogram, **labels):
+        """合并在其他进程中记录的 Histogram"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.histograms.setdefault(key, Histogram()).merge(histogram)
+
+    def total(self, name, **labels):
+        """名称为 name、且包含给定标签的所有计数器之和"""
+        wanted = set(_label_key(labels))
+        with self._lock:
+            return sum(v for (n, key), v in self.counters.items() if n == name and wanted <= set(key))
+
+    def latency(self, name=REQUEST_SECONDS, **labels):
+        """把包含给定标签的直方图合并为一个"""
+        wanted = set(_label_key(labels))
+        merged = Histogram()
+        with self._lock:
+            for (n, key), histogram in self.histograms.items():
+                if n == name and wanted <= set(key):
+                    merged.merge(histogram)
+        return merged
+
+    # ---- 输出 ----
+
+    def snapshot(self, final=False):
+        elapsed = time.monotonic() - self._started
+        with self._lock:
+            counters = [{'name': n, 'labels': dict(key), 'value': v} for (n, key), v in sorted(self.counters.items())]
+            histograms = [{'name': n, 'labels': dict(key), **h.to_dict()}
+                          for (n, key), h in sorted(self.histograms.items())]
+        accepted = sum(c['value'] for c in counters if c['name'] in (ROWS_ACCEPTED, ROWS_WRITTEN))
+        return {
+            'ts': datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+            'tool': self.tool,
+            'run_id': self.run_id,
+            'elapsed': round(elapsed, 3),
+            'final': final,
+            'rows_per_sec': accepted / elapsed if elapsed else 0.0,
+            'counters': counters,
+            'histograms': histograms,
+        }
+
+    def render_prometheus(self):
+        """Prometheus 文本格式；所有指标带 tool 标签，另附运行开始和最后更新时间"""
+        tool = (('tool', self.tool),)
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((k, (list(h.counts), h.count, h.sum)) for k, h in self.histograms.items())
+
+        declared = set()
+        for (name, key), value in counters:
+            metric = f"{METRIC_PREFIX}{name}_total"
+            if metric not in declared:
+                declared.add(metric)
+                lines += [f"# HELP {metric} {HELP.get(name, name)}", f"# TYPE {metric} counter"]
+            lines.append(f"{metric}{_format_labels(tool + key)} {value}")
+        for (name, key), (counts, count, total) in histograms:
+            metric = f"{METRIC_PREFIX}{name}"
+            if metric not in declared:
+                declared.add(metric)
+                lines += [f"# HELP {metric} {HELP.get(name, name)}", f"# TYPE {metric} histogram"]
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS + ('+Inf',), counts):
+                cumulative += n
+                lines.append(f"{metric}_bucket{_format_labels(tool + key, (('le', bound),))} {cumulative}")
+            lines.append(f"{metric}_sum{_format_labels(tool + key)} {total}")
+            lines.append(f"{metric}_count{_format_labels(tool + key)} {count}")
+
+        for metric, value in ((f"{METRIC_PREFIX}run_start_timestamp_seconds", self.started_at),
+                              (f"{METRIC_PREFIX}last_update_timestamp_seconds", time.time())):
+            lines += [f"# TYPE {metric} gauge", f"{metric}{_format_labels(tool)} {value:.3f}"]
+        return '\n'.join(lines) + '\n'
+
+    def flush(self, final=False):
+        """追加一行JSONL快照并重写 textfile（先写 .tmp 再替换，采集端不会读到半个文件）"""
+        with self._write_lock:
+            if self.jsonl_path:
+                with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(self.snapshot(final), ensure_ascii=False) + '\n')
+            if self.prom_path:
+                tmp_path = self.prom_path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(self.render_prometheus())
+                os.replace(tmp_path, self.prom_path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"⚠️  写入指标失败: {e}")
+
+    def start(self):
+        """有输出文件时启动后台线程定期写入，返回自身"""
+        if (self.jsonl_path or self.prom_path) and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='metrics', daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        """停止后台线程并写入最终快照"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.jsonl_path or self.prom_path:
+            self.flush(final=True)
+
+    def summary(self):
+        """rows_per_sec 按最终落地的行计：服务端确认写入的行加上写入本地文件的行"""
+        elapsed = time.monotonic() - self._started
+        latency = self.latency()
+        batches = self.latency(BATCH_SECONDS)
+        landed = self.total(ROWS_ACCEPTED) + self.total(ROWS_WRITTEN)
+        return {
+            'run_id': self.run_id,
+            'elapsed': elapsed,
+            'rows_read': self.total(ROWS_READ),
+            'rows_sent': self.total(ROWS_SENT),
+            'rows_accepted': self.total(ROWS_ACCEPTED),
+            'rows_rejected': self.total(ROWS_REJECTED),
+            'rows_skipped': self.total(ROWS_SKIPPED),
+            'rows_failed': self.total(ROWS_FAILED),
+            'rows_written': self.total(ROWS_WRITTEN),
+            'rows_per_sec': landed / elapsed if elapsed else 0.0,
+            'bytes_sent': self.total(BYTES_SENT),
+            'bytes_read': self.total(BYTES_READ),
+            'bytes_written': self.total(BYTES_WRITTEN),
+            'requests': self.total(REQUESTS),
+            'retries': self.total(RETRIES),
+            'latency_p50': latency.quantile(0.5),
+            'latency_p95': latency.quantile(0.95),
+            'batches': batches.count,
+            'batch_p50': batches.quantile(0.5),
+            'batch_p95': batches.quantile(0.95),
+            'endpoints': {endpoint: {'requests': h.count, 'p50': h.quantile(0.5), 'p95': h.quantile(0.95)}
+                          for endpoint, h in ((e, self.latency(endpoint=e)) for e in self._endpoints())},
+        }
+
+    def _endpoints(self):
+        with self._lock:
+            return sorted({dict(key).get('endpoint') for n, key in self.histograms if n == REQUEST_SECONDS} - {None})
+
+    def print_summary(self):
+        s = self.summary()
+        if s['rows_written'] and not s['rows_sent']:
+            read = f"读取 {s['bytes_read'] / 1024 / 1024:.1f}MB，" if s['bytes_read'] else ''
+            print(f"📈 指标: 读取 {s['rows_read']:,} 行，写出 {s['rows_written']:,} 行 ({s['rows_per_sec']:,.0f} 行/秒)，"
+                  f"拒绝 {s['rows_rejected']:,}，{read}写出 {s['bytes_written'] / 1024 / 1024:.1f}MB")
+        else:
+            print(f"📈 指标: 读取 {s['rows_read']:,} 行，发送 {s['rows_sent']:,} 行，写入 {s['rows_accepted']:,} 行 "
+                  f"({s['rows_per_sec']:,.0f} 行/秒)，拒绝 {s['rows_rejected']:,}，跳过 {s['rows_skipped']:,}，"
+                  f"失败 {s['rows_failed']:,}")
+        if s['requests']:
+            print(f"   请求 {s['requests']:,} 次，重试 {s['retries']:,} 次，发送 {s['bytes_sent'] / 1024 / 1024:.1f}MB")
+        if s['batches']:
+            print(f"   批次 {s['batches']:,} 个，耗时 p50 {s['batch_p50'] * 1000:.0f}ms / p95 {s['batch_p95'] * 1000:.0f}ms")
+        for endpoint, latency in s['endpoints'].items():
+            print(f"   {endpoint}: {latency['requests']:,} 次，"
+                  f"延迟 p50 {latency['p50'] * 1000:.0f}ms / p95 {latency['p95'] * 1000:.0f}ms")
+        if self.jsonl_path:
+            print(f"   指标快照: {self.jsonl_path}（run_id {self.run_id}）")
+
+def add_metrics_arguments(parser):
+    """给命令行工具加上指标输出参数（默认值可以用环境变量设置）"""
+    group = parser.add_argument_group('指标')
+    group.add_argument('--metrics-jsonl', default=os.environ.get('IMPORT_METRICS_JSONL'),
+                       help='运行期间追加指标快照的JSONL文件（环境变量 IMPORT_METRICS_JSONL）')
+    group.add_argument('--metrics-prom', default=os.environ.get('IMPORT_METRICS_PROM'),
+                       help='Prometheus textfile 路径（环境变量 IMPORT_METRICS_PROM）')
+    group.add_argument('--metrics-interval', type=float, default=10.0, help='写入指标的间隔（秒）')
+
+def metrics_from_args(tool, args):
+    """按 add_metrics_arguments 的参数创建并启动 Metrics"""
+    return Metrics(tool, args.metrics_jsonl, args.metrics_prom, args.metrics_interval).start()
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+导入和查询接口的异步压测工具
+
+用 asyncio + keep-alive 连接池（async_http.py）模拟多个并发用户，按配置的流量比例
+回放列表、LIKE搜索、FTS搜索、统计、批量导入和CSV导入请求，报告吞吐量、
+各接口的 p50/p95/p99 延迟直方图和错误分布。--concurrency 给出多个值时依次压测，
+并指出吞吐量不再随并发增长的饱和点。
+
+默认压测本地替身API（mock_api_server.py）：--serve 会在后台启动它并在结束时关闭，
+不会碰到生产环境。替身库中迁移创建的默认管理员密码是 admin123。
+
+用法:
+    python3 load_test.py --serve loadtest.sqlite --rows 200000 --password admin123
+    python3 load_test.py --base-url http://127.0.0.1:8787 --password admin123 \\
+        --mix batch=1 --batch-size 500 --concurrency 1,2,4,8,16,32 --duration 20
+    python3 load_test.py --serve loadtest.sqlite --mix list=40,search=30,fts=20,stats=10 -o results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+
+from async_http import AsyncHttpClient, HttpError
+from d1_client import API_PASSWORD, API_USERNAME
+from generate_test_data import FIELDS, generate_columns
+
+DEFAULT_MIX = 'list=40,search=20,fts=15,stats=5,batch=15,csv=5'
+SEARCH_TERMS = ['iPhone', '小米', '美的', 'Nike', '连接器', '华为', '牛奶', 'DE-0001', '不存在的商品']
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000]
+
+class LatencyHistogram:
+    """按对数桶统计延迟，同时保留原始值用于计算分位数"""
+
+    def __init__(self):
+        self.values = []
+
+    def record(self, ms):
+        self.values.append(ms)
+
+    def percentile(self, pct):
+        if not self.values:
+            return 0.0
+        ordered = sorted(self.values)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+    def buckets(self):
+        counts = Counter()
+        for ms in self.values:
+            for bound in BUCKETS_MS:
+                if ms <= bound:
+                    counts[bound] += 1
+                    break
+            else:
+                counts[float('inf')] += 1
+        return counts
+
+    def render(self, width=40):
+        counts = self.buckets()
+        if not counts:
+            return ''
+        peak = max(counts.values())
+        lines = []
+        for bound in BUCKETS_MS + [float('inf')]:
+            if counts[bound]:
+                label = f"≤{bound:g}ms" if bound != float('inf') else f">{BUCKETS_MS[-1]}ms"
+                bar = '█' * max(1, round(counts[bound] / peak * width))
+                lines.append(f"    {label:>9} {counts[bound]:>8} {bar}")
+        return '\n'.join(lines)
+
+class LoadStats:
+    def __init__(self):
+        self.latency = defaultdict(LatencyHistogram)
+        self.statuses = defaultdict(Counter)
+        self.rows = Counter()
+        self.errors = Counter()
+        self.seconds = 0.0
+
+    def record(self, op, status, ms, rows=0):
+        self.latency[op].record(ms)
+        self.statuses[op][status] += 1
+        self.rows[op] += rows
+
+    def total_requests(self):
+        return sum(len(h.values) for h in self.latency.values())
+
+class LoadGenerator:
+    def __init__(self, client, mix, batch_size=200, seed=None):
+        self.client = client
+        self.ops = list(mix)
+        self.weights = [mix[op] for op in self.ops]
+        self.batch_size = batch_size
+        self.run_id = uuid.uuid4().hex[:8].upper()
+        self.seq = 0
+        self.seed = seed
+
+    def make_products(self, rng, count):
+        """生成一批测试商品，SKU带本次运行的标识，保证不会与已有数据冲突"""
+        columns = generate_columns(rng, 0, count)
+        products = []
+        for row in zip(*(columns[f] for f in FIELDS)):
+            product = dict(zip(FIELDS, row))
+            self.seq += 1
+            product['sku'] = f"LT-{self.run_id}-{self.seq:010d}"
+            products.append(product)
+        return products
+
+    async def op_list(self, rng):
+        return await self.client.get('/api/products', params={'page': rng.randint(1, 50), 'limit': 20}), 0
+
+    async def op_search(self, rng):
+        return await self.client.get('/api/products', params={'search': rng.choice(SEARCH_TERMS), 'limit': 20}), 0
+
+    async def op_fts(self, rng):
+        return await self.client.get('/api/search', params={'q': rng.choice(SEARCH_TERMS[:-2]), 'limit': 20}), 0
+
+    async def op_stats(self, rng):
+        return await self.client.get('/api/stats'), 0
+
+    async def op_batch(self, rng):
+        products = self.make_products(rng, self.batch_size)
+        return await self.client.post('/api/products/batch', json_body={'products': products}), len(products)
+
+    async def op_csv(self, rng):
+        products = self.make_products(rng, self.batch_size)
+        fields = ['name', 'company_name', 'price', 'stock', 'sku', 'category']
+        lines = [','.join(fields)] + [','.join(str(p[f]).replace(',', ' ') for f in fields) for p in products]
+        return await self.client.post('/api/products/import-csv', json_body={'csvData': '\n'.join(lines)}), len(products)
+
+    async def worker(self, worker_id, deadline, stats, max_requests):
+        rng = random.Random(f"{self.seed}:{worker_id}") if self.seed is not None else random.Random()
+        while time.monotonic() < deadline and (max_requests is None or stats.total_requests() < max_requests):
+            op = rng.choices(self.ops, self.weights)[0]
+            started = time.perf_counter()
+            try:
+                response, rows = await getattr(self, f'op_{op}')(rng)
+            except HttpError as e:
+                stats.record(op, 'conn-error', (time.perf_counter() - started) * 1000)
+                stats.errors[str(e)[:120]] += 1
+                continue
+            elapsed = (time.perf_counter() - started) * 1000
+            ok_rows = 0
+            if response.status == 200 and rows:
+                try:
+                    ok_rows = response.json()['data']['successCount']
+                except (ValueError, KeyError, TypeError):
+                    ok_rows = 0
+            stats.record(op, response.status, elapsed, ok_rows)
+
+    async def run(self, concurrency, duration, max_requests=None):
+        stats = LoadStats()
+        deadline = time.monotonic() + duration
+        started = time.perf_counter()
+        await asyncio.gather(*(self.worker(i, deadline, stats, max_requests) for i in range(concurrency)))
+        stats.seconds = time.perf_counter() - started
+        return stats
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if not hasattr(LoadGenerator, f'op_{name}'):
+            raise ValueError(f"未知的请求类型: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def summarize(stats, concurrency):
+    total = stats.total_requests()
+    ok = sum(n for op in stats.statuses.values() for status, n in op.items() if status == 200)
+    summary = {
+        'concurrency': concurrency,
+        'seconds': round(stats.seconds, 3),
+        'requests': total,
+        'ok': ok,
+        'rps': round(total / stats.seconds, 1) if stats.seconds else 0,
+        'rows_imported': sum(stats.rows.values()),
+        'rows_per_sec': round(sum(stats.rows.values()) / stats.seconds, 1) if stats.seconds else 0,
+        'ops': {},
+        'errors': dict(stats.errors.most_common(10)),
+    }
+    for op, hist in sorted(stats.latency.items()):
+        summary['ops'][op] = {
+            'requests': len(hist.values),
+            'p50_ms': round(hist.percentile(50), 2),
+            'p95_ms': round(hist.percentile(95), 2),
+            'p99_ms': round(hist.percentile(99), 2),
+            'max_ms': round(max(hist.values), 2),
+            'statuses': {str(k): v for k, v in stats.statuses[op].items()},
+            'buckets': {('inf' if k == float('inf') else str(k)): v for k, v in sorted(hist.buckets().items())},
+        }
+    return summary
+
+def print_summary(summary, stats):
+    print(f"\n📊 并发 {summary['concurrency']}: {summary['requests']} 个请求 / {summary['seconds']:.1f}s = "
+          f"{summary['rps']:.1f} 请求/秒，成功 {summary['ok']}，导入 {summary['rows_imported']} 行 "
+          f"({summary['rows_per_sec']:.1f} 行/秒)")
+    for op, info in summary['ops'].items():
+        statuses = ', '.join(f"{k}×{v}" for k, v in info['statuses'].items())
+        print(f"  {op:<8} {info['requests']:>7} 次  p50 {info['p50_ms']:>9.1f}ms  p95 {info['p95_ms']:>9.1f}ms  "
+              f"p99 {info['p99_ms']:>9.1f}ms  [{statuses}]")
+        print(stats.latency[op].render())
+    for error, count in summary['errors'].items():
+        print(f"  ⚠️  {count}× {error}")
+
+def find_saturation(summaries, key='rps', threshold=0.1):
+    """吞吐量增幅第一次低于 threshold 时的并发数（之前的那一档就是饱和点）"""
+    for previous, current in zip(summaries, summaries[1:]):
+        if previous[key] and (current[key] - previous[key]) / previous[key] < threshold:
+            return previous['concurrency']
+    return None
+
+def start_standin(db_path, rows, latency_ms=0, extra_args=()):
+    """在后台启动 mock_api_server.py，返回 (进程, base_url)"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mock_api_server.py')
+    cmd = [sys.executable, script, '--db', db_path, '--port', str(port), '--rows', str(rows),
+           '--latency-ms', str(latency_ms), *extra_args]
+    process = subprocess.Popen(cmd)
+    deadline = time.monotonic() + 3600
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"替身API启动失败，退出码 {process.returncode}")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("等待替身API启动超时")
+
+async def run_load_test(args, base_url):
+    client = AsyncHttpClient(base_url, max_connections=max(args.concurrency) + 4, timeout=args.timeout)
+    try:
+        response = await client.post('/api/auth/login', json_body={'username': args.username, 'password': args.password})
+        result = response.json()
+        if response.status != 200 or not result.get('success'):
+            raise RuntimeError(f"登录失败: {result.get('error')}")
+        client.headers['Authorization'] = f"Bearer {result['data']['token']}"
+
+        generator = LoadGenerator(client, parse_mix(args.mix), args.batch_size, args.seed)
+        summaries = []
+        for concurrency in args.concurrency:
+            stats = await generator.run(concurrency, args.duration, args.requests)
+            summary = summarize(stats, concurrency)
+            print_summary(summary, stats)
+            summaries.append(summary)
+        return summaries
+    finally:
+        await client.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='导入和查询接口的异步压测')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8787', help='API地址')
+    parser.add_argument('--serve', metavar='DB', help='在后台启动替身API（mock_api_server.py）并压测它')
+    parser.add_argument('--rows', type=int, default=0, help='--serve 的数据库不存在时预先生成的行数')
+    parser.add_argument('--server-latency-ms', type=float, default=0, help='--serve 时替身API附加的延迟')
+    parser.add_argument('--username', default=API_USERNAME)
+    parser.add_argument('--password', default=API_PASSWORD)
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='流量比例，例如 list=40,search=20,batch=10')
+    parser.add_argument('--concurrency', default='8', help='并发用户数，逗号分隔时依次压测')
+    parser.add_argument('--duration', type=float, default=10, help='每一档并发的压测时长（秒）')
+    parser.add_argument('--requests', type=int, help='每一档最多发送的请求数')
+    parser.add_argument('--batch-size', type=int, default=200, help='批量导入/CSV导入每个请求的行数')
+    parser.add_argument('--timeout', type=float, default=120, help='单个请求超时（秒）')
+    parser.add_argument('--seed', help='随机种子（相同种子回放相同的请求序列）')
+    parser.add_argument('-o', '--output', help='结果保存为JSON')
+    args = parser.parse_args()
+    args.concurrency = [int(c) for c in args.concurrency.split(',')]
+
+    process = None
+    base_url = args.base_url
+    if args.serve:
+        process, base_url = start_standin(args.serve, args.rows, args.server_latency_ms)
+    try:
+        print(f"🚀 压测 {base_url}，流量比例 {args.mix}，并发 {args.concurrency}，每档 {args.duration}s")
+        summaries = asyncio.run(run_load_test(args, base_url))
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    if len(summaries) > 1:
+        key = 'rows_per_sec' if all(s['rows_imported'] for s in summaries) else 'rps'
+        print(f"\n{'并发':>6} {'请求/秒':>10} {'行/秒':>10}")
+        for s in summaries:
+            print(f"{s['concurrency']:>6} {s['rps']:>10.1f} {s['rows_per_sec']:>10.1f}")
+        saturation = find_saturation(summaries, key)
+        if saturation:
+            print(f"📈 并发超过 {saturation} 后吞吐量增长不足10%，接近饱和")
+
+    if args.output:
+        tmp_path = args.output + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'base_url': base_url, 'mix': args.mix, 'results': summaries}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, args.output)
+        print(f"💾 结果已保存到 {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -1,124 +1,368 @@
 #!/usr/bin/env python3
 """
 数据迁移脚本：将开发环境的5000+商品数据迁移到生产环境
+
+本地数据默认直接从 .wrangler/state 下的D1 SQLite文件流式读取，
+找不到时回退到 wrangler 查询；写入生产环境仍通过 wrangler --remote。
+
+导出和上传以生产者/消费者流水线方式运行：本地导出线程提前把批次放进
+有界队列，多个上传线程同时向远程数据库写入。每批的行数和同时在途的
+上传数根据实测延迟和错误率自动调整。
+
+每个成功的批次对应的 id 区间都会写入检查点文件。中断后用 --resume 重新运行，
+只会发送检查点之外的数据；默认按 sku 做 upsert，重复发送的行不会产生重复数据。
+
+--metrics-jsonl / --metrics-prom 输出读取、发送、写入的行数，SQL字节数，
+每次 wrangler 执行的耗时直方图和重试次数（见 import_metrics）。
 """
 
-import subprocess
+import argparse
 import json
+import os
+import queue
+import sys
+import threading
 import time
 
-def run_command(cmd):
-    """执行命令并返回结果"""
-    print(f"执行: {cmd}")
-    try:
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True, cwd='/home/user/webapp')
-        if result.returncode != 0:
-            print(f"错误: {result.stderr}")
-            return None
-        return result.stdout
-    except Exception as e:
-        print(f"执行错误: {e}")
-        return None
-
-def export_batch(offset, limit):
-    """导出一批数据"""
-    cmd = f'npx wrangler d1 execute webapp-production --local --command="SELECT name, company_name, price, stock, description, category, sku, status FROM products WHERE status = \'active\' ORDER BY id LIMIT {limit} OFFSET {offset};"'
-    return run_command(cmd)
-
-def create_insert_sql(data_list):
-    """创建插入SQL语句"""
-    if not data_list:
-        return ""
-    
-    sql_values = []
-    for item in data_list:
-        # 处理可能包含单引号的字段
-        name = item['name'].replace("'", "''") if item['name'] else ""
-        company_name = item['company_name'].replace("'", "''") if item['company_name'] else ""
-        description = item['description'].replace("'", "''") if item['description'] else ""
-        category = item['category'].replace("'", "''") if item['category'] else ""
-        sku = item['sku'].replace("'", "''") if item['sku'] else ""
-        status = item['status'] if item['status'] else "active"
-        
-        sql_value = f"('{name}', '{company_name}', {item['price']}, {item['stock']}, '{description}', '{category}', '{sku}', '{status}')"
-        sql_values.append(sql_value)
-    
-    sql = f"INSERT INTO products (name, company_name, price, stock, description, category, sku, status) VALUES {', '.join(sql_values)};"
-    return sql
-
-def import_batch_to_remote(sql):
-    """将SQL导入到远程数据库"""
-    # 创建临时SQL文件
-    with open('/home/user/webapp/temp_batch.sql', 'w', encoding='utf-8') as f:
+from d1_client import PROJECT_DIR, WranglerBackend, build_insert_sql, open_backend
+from import_metrics import (BYTES_SENT, REQUEST_SECONDS, REQUESTS, RETRIES, ROWS_ACCEPTED, ROWS_FAILED, ROWS_READ,
+                            ROWS_SENT, ROWS_SKIPPED, Metrics, add_metrics_arguments, metrics_from_args)
+
+EXPORT_COLUMNS = "id, name, company_name, price, stock, description, category, sku, status"
+ROWS_PER_STATEMENT = 50  # 单条INSERT语句的行数，避免超过D1的语句长度限制
+CHECKPOINT_FILE = os.path.join(PROJECT_DIR, 'migrate_checkpoint.json')
+REMOTE_ENDPOINT = 'wrangler d1 execute'
+
+ROW_DEFAULTS = {'name': '', 'company_name': '', 'description': '', 'category': '', 'status': 'active'}
+
+def create_insert_sql(data_list, rows_per_statement=ROWS_PER_STATEMENT, upsert=True):
+    """创建插入SQL语句（每 rows_per_statement 行一条INSERT）
+
+    upsert=True 时按 sku 冲突更新已有行；没有 sku 的行写入 NULL，不参与去重
+    """
+    rows = [dict(item, sku=item.get('sku') or None) for item in data_list]
+    return build_insert_sql(rows, upsert_key='sku' if upsert else None,
+                            rows_per_statement=rows_per_statement, defaults=ROW_DEFAULTS)
+
+def import_batch_to_remote(remote, sql, seq):
+    """将SQL导入到远程数据库（每个批次使用独立的临时文件）"""
+    temp_name = f'temp_batch_{seq}.sql'
+    temp_file = os.path.join(PROJECT_DIR, temp_name)
+    with open(temp_file, 'w', encoding='utf-8') as f:
         f.write(sql)
-    
-    cmd = 'npx wrangler d1 execute webapp-production --remote --file=./temp_batch.sql'
-    return run_command(cmd)
+
+    try:
+        return remote.execute_file(f'./{temp_name}')
+    finally:
+        os.remove(temp_file)
+
+class Checkpoint:
+    """已迁移 id 区间的持久化记录
+
+    completed 保存合并后的左开右闭区间 (lo, hi]；watermark 之前的 id 全部迁移完成。
+    批次可能乱序完成，所以 watermark 之后还可能有零散的已完成区间。
+    """
+
+    def __init__(self, path=CHECKPOINT_FILE, source=None):
+        self.path = path
+        self.source = source
+        self.base = 0
+        self.completed = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=CHECKPOINT_FILE):
+        checkpoint = cls(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        checkpoint.source = data.get('source')
+        checkpoint.base = data.get('base', 0)
+        checkpoint.completed = [tuple(r) for r in data.get('completed', [])]
+        return checkpoint
+
+    @property
+    def watermark(self):
+        """从起点开始连续完成的最大 id"""
+        if self.completed and self.completed[0][0] <= self.base:
+            return self.completed[0][1]
+        return self.base
+
+    def covers(self, row_id):
+        return any(lo < row_id <= hi for lo, hi in self.completed)
+
+    def mark_done(self, lo, hi):
+        """记录 (lo, hi] 已迁移，合并相邻区间后原子写盘"""
+        with self._lock:
+            ranges = sorted(self.completed + [(lo, hi)])
+            merged = [ranges[0]]
+            for start, end in ranges[1:]:
+                if start <= merged[-1][1]:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+                else:
+                    merged.append((start, end))
+            self.completed = merged
+            self.save()
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'source': self.source,
+                'base': self.base,
+                'watermark': self.watermark,
+                'completed': self.completed,
+                'updated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            }, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+class AdaptiveTuner:
+    """根据上传延迟和错误率调整批大小和并发数
+
+    成功且延迟低于目标时，批大小按比例增大，连续成功若干次后并发数加一；
+    延迟超标时批大小缩小；出错时批大小和并发数都减半。
+    """
+
+    def __init__(self, batch_size=100, concurrency=2, max_concurrency=8,
+                 min_batch=20, max_batch=2000, target_latency=5.0):
+        self.batch_size = batch_size
+        self.concurrency = min(concurrency, max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.target_latency = target_latency
+        self.successes = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self._streak = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency, ok):
+        """记录一次上传结果并调整参数"""
+        with self._lock:
+            if not ok:
+                self.errors += 1
+                self._streak = 0
+                self.batch_size = max(self.min_batch, self.batch_size // 2)
+                self.concurrency = max(1, self.concurrency // 2)
+                return
+
+            self.successes += 1
+            self.total_latency += latency
+            if latency > self.target_latency:
+                self._streak = 0
+                self.batch_size = max(self.min_batch, int(self.batch_size * 0.8))
+                return
+
+            self._streak += 1
+            self.batch_size = min(self.max_batch, int(self.batch_size * 1.25) + 1)
+            if self._streak >= self.concurrency and self.concurrency < self.max_concurrency:
+                self.concurrency += 1
+                self._streak = 0
+
+    @property
+    def error_rate(self):
+        attempts = self.successes + self.errors
+        return self.errors / attempts if attempts else 0.0
+
+class MigrationPipeline:
+    """本地导出线程 + 多个远程上传线程"""
+
+    def __init__(self, local, remote, tuner, checkpoint, queue_size=8, max_retries=3, upsert=True, metrics=None):
+        self.local = local
+        self.remote = remote
+        self.tuner = tuner
+        self.checkpoint = checkpoint
+        self.upsert = upsert
+        self.metrics = metrics or Metrics('migrate_data')
+        self.batches = queue.Queue(maxsize=queue_size)
+        self.max_retries = max_retries
+        self.stop = threading.Event()
+        self.migrated = 0
+        self.failed_batch = None
+        self.export_error = None
+        self._active = 0
+        self._slots = threading.Condition()
+        self._lock = threading.Lock()
+
+    def produce(self):
+        """从检查点之后读取本地数据流，按当前批大小切分后放入有界队列
+
+        每个批次带上它覆盖的 id 区间 (lo, hi]；已在检查点中的行直接跳过。
+        """
+        seq = 0
+        pending = []
+        lo = cursor = self.checkpoint.watermark
+        try:
+            for rows in self.local.iter_products(EXPORT_COLUMNS, 500, start_id=lo):
+                self.metrics.inc(ROWS_READ, len(rows))
+                for row in rows:
+                    cursor = row['id']
+                    if not self.checkpoint.covers(cursor):
+                        pending.append(row)
+                    else:
+                        self.metrics.inc(ROWS_SKIPPED)
+                    if len(pending) >= self.tuner.batch_size:
+                        seq += 1
+                        self._put((seq, lo, cursor, pending))
+                        lo, pending = cursor, []
+                if self.stop.is_set():
+                    return
+            if pending:
+                seq += 1
+                self._put((seq, lo, cursor, pending))
+        except Exception as e:
+            print(f"导出本地数据出错: {e}")
+            self.export_error = e
+            self.stop.set()
+        finally:
+            for _ in range(self.tuner.max_concurrency):
+                self._put(None)
+
+    def _put(self, item):
+        while not self.stop.is_set():
+            try:
+                self.batches.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _acquire_slot(self):
+        with self._slots:
+            while self._active >= self.tuner.concurrency:
+                self._slots.wait()
+            self._active += 1
+
+    def _release_slot(self):
+        with self._slots:
+            self._active -= 1
+            self._slots.notify_all()
+
+    def consume(self):
+        """从队列取批次上传，失败时按退避重试"""
+        while not self.stop.is_set():
+            try:
+                item = self.batches.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if item is None:
+                return
+
+            seq, lo, hi, data_list = item
+            sql = create_insert_sql(data_list, upsert=self.upsert)
+            sql_bytes = len(sql.encode('utf-8'))
+            self.metrics.inc(ROWS_SENT, len(data_list))
+            for attempt in range(1, self.max_retries + 1):
+                self._acquire_slot()
+                started = time.monotonic()
+                try:
+                    result = import_batch_to_remote(self.remote, sql, seq)
+                finally:
+                    self._release_slot()
+                latency = time.monotonic() - started
+                ok = bool(result and "success" in result)
+                self.tuner.record(latency, ok)
+                self.metrics.observe(REQUEST_SECONDS, latency, endpoint=REMOTE_ENDPOINT)
+                self.metrics.inc(REQUESTS, endpoint=REMOTE_ENDPOINT, status='ok' if ok else 'error')
+                self.metrics.inc(BYTES_SENT, sql_bytes)
+
+                if ok:
+                    self.checkpoint.mark_done(lo, hi)
+                    self.metrics.inc(ROWS_ACCEPTED, len(data_list))
+                    with self._lock:
+                        self.migrated += len(data_list)
+                        total = self.migrated
+                    print(f"批次 {seq}: 成功导入 {len(data_list)} 条，耗时 {latency:.1f}s，累计 {total} 条 "
+                          f"(批大小 {self.tuner.batch_size}, 并发 {self.tuner.concurrency})")
+                    break
+
+                print(f"批次 {seq}: 第 {attempt} 次导入失败")
+                if attempt < self.max_retries:
+                    self.metrics.inc(RETRIES)
+                    time.sleep(min(2 ** attempt, 30))
+            else:
+                print(f"批次 {seq} 重试 {self.max_retries} 次仍失败，停止迁移")
+                self.metrics.inc(ROWS_FAILED, len(data_list))
+                self.failed_batch = seq
+                self.stop.set()
+                return
+
+    def run(self):
+        producer = threading.Thread(target=self.produce, name='exporter', daemon=True)
+        uploaders = [
+            threading.Thread(target=self.consume, name=f'uploader-{i}', daemon=True)
+            for i in range(self.tuner.max_concurrency)
+        ]
+        producer.start()
+        for t in uploaders:
+            t.start()
+        for t in uploaders:
+            t.join()
+        self.stop.set()
+        producer.join()
+        return self.migrated
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='将开发环境商品数据迁移到生产环境')
+    parser.add_argument('--backend', choices=['auto', 'sqlite', 'wrangler'], default='auto',
+                        help='本地数据来源：直接读本地SQLite文件或通过wrangler查询')
+    parser.add_argument('--batch-size', type=int, default=100, help='初始批大小，运行中自动调整')
+    parser.add_argument('--workers', type=int, default=6, help='最大并发上传数')
+    parser.add_argument('--target-latency', type=float, default=5.0, help='单批上传的目标耗时（秒）')
+    parser.add_argument('--resume', action='store_true', help='从检查点继续，只发送尚未迁移的数据')
+    parser.add_argument('--checkpoint', default=CHECKPOINT_FILE, help='检查点文件路径')
+    parser.add_argument('--insert-only', action='store_true',
+                        help='使用普通INSERT而不是按sku的upsert（重复运行会产生冲突）')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
     print("开始数据迁移...")
-    
-    batch_size = 100  # 每批处理100条数据
-    total_migrated = 0
-    offset = 0
-    
-    while True:
-        print(f"\n正在导出第 {offset + 1} - {offset + batch_size} 条数据...")
-        
-        # 导出一批数据
-        result = export_batch(offset, batch_size)
-        if not result:
-            print("导出失败，停止迁移")
-            break
-        
-        try:
-            # 解析JSON结果
-            data = json.loads(result.split('[\n  {\n    "results":')[1].split('    "success": true,')[0])
-            data = data.strip().rstrip(',')
-            if data == '[]':
-                print("没有更多数据，迁移完成")
-                break
-                
-            # 解析数据
-            data_list = json.loads(data)
-            if not data_list:
-                print("没有更多数据，迁移完成")
-                break
-            
-            # 创建插入SQL
-            sql = create_insert_sql(data_list)
-            if not sql:
-                print("SQL创建失败")
-                break
-            
-            print(f"导入 {len(data_list)} 条数据到生产环境...")
-            
-            # 导入到远程数据库
-            import_result = import_batch_to_remote(sql)
-            if import_result and "success" in import_result:
-                total_migrated += len(data_list)
-                print(f"成功导入 {len(data_list)} 条，累计 {total_migrated} 条")
-            else:
-                print("导入失败，停止迁移")
-                break
-            
-            offset += batch_size
-            
-            # 等待一下避免请求过于频繁
-            time.sleep(1)
-            
-            # 如果数据少于batch_size，说明已经到最后一批
-            if len(data_list) < batch_size:
-                print("已到达最后一批，迁移完成")
-                break
-                
-        except Exception as e:
-            print(f"处理数据时出错: {e}")
-            print(f"原始结果: {result[:500]}...")
-            break
-    
-    print(f"\n数据迁移完成！总计迁移了 {total_migrated} 条数据")
+
+    # 本地库在主线程打开，之后只由导出线程读取（main 等所有线程结束后才关闭）
+    local = open_backend(args.backend, check_same_thread=False)
+    source = getattr(local, 'path', local.kind)
+
+    if args.resume and os.path.exists(args.checkpoint):
+        checkpoint = Checkpoint.load(args.checkpoint)
+        if checkpoint.source != source:
+            print(f"⚠️ 检查点来源 {checkpoint.source} 与当前数据源 {source} 不一致")
+        print(f"从检查点继续: id <= {checkpoint.watermark} 已完成，另有 {len(checkpoint.completed)} 个已完成区间")
+    else:
+        if os.path.exists(args.checkpoint):
+            print(f"⚠️ 覆盖已有检查点 {args.checkpoint}，如需续传请使用 --resume")
+        checkpoint = Checkpoint(args.checkpoint, source=source)
+        checkpoint.save()
+
+    remote = WranglerBackend(remote=True)
+    tuner = AdaptiveTuner(batch_size=args.batch_size, max_concurrency=args.workers,
+                          target_latency=args.target_latency)
+    metrics = metrics_from_args('migrate_data', args)
+    pipeline = MigrationPipeline(local, remote, tuner, checkpoint, queue_size=args.workers * 2,
+                                 upsert=not args.insert_only, metrics=metrics)
+    print(f"本地数据来源: {local.kind}，最大并发上传: {args.workers}")
+
+    started = time.monotonic()
+    try:
+        total_migrated = pipeline.run()
+    finally:
+        local.close()
+        metrics.close()
+    elapsed = time.monotonic() - started
+
+    failed = pipeline.failed_batch is not None or pipeline.export_error is not None
+    if not failed:
+        print("没有更多数据，迁移完成")
+    else:
+        if pipeline.export_error is not None:
+            print(f"❌ 导出本地数据失败: {pipeline.export_error}")
+        print(f"检查点已保存到 {args.checkpoint}，修复问题后使用 --resume 继续")
+    print(f"\n数据迁移{'未完成' if failed else '完成'}！总计迁移了 {total_migrated} 条数据，耗时 {elapsed:.1f}s "
+          f"({total_migrated / elapsed if elapsed else 0:.0f} 条/秒，错误率 {tuner.error_rate:.1%})")
+    metrics.print_summary()
+    if failed:
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
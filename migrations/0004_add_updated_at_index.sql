@@ -0,0 +1,2 @@
+-- 增量导出按 (updated_at, id) 游标读取变更行，需要对应的复合索引
+CREATE INDEX IF NOT EXISTS idx_products_updated_at_id ON products(updated_at, id);
@@ -0,0 +1,97 @@
+-- /api/stats 的汇总表：由 products 上的触发器增量维护，读取统计不再扫描整张商品表
+-- 只统计 status = 'active' 的商品，与原来的五个聚合查询口径相同
+
+-- 全局汇总（只有 id = 1 一行）
+CREATE TABLE IF NOT EXISTS stats_totals (
+  id INTEGER PRIMARY KEY CHECK (id = 1),
+  total_products INTEGER NOT NULL DEFAULT 0,   -- 商品总数
+  total_stock INTEGER NOT NULL DEFAULT 0,      -- 总库存
+  total_value REAL NOT NULL DEFAULT 0,         -- 总价值 SUM(price * stock)
+  total_companies INTEGER NOT NULL DEFAULT 0   -- 公司数量（= stats_companies 的行数）
+);
+
+-- 每个公司的商品数，数量减到0时删除该行
+CREATE TABLE IF NOT EXISTS stats_companies (
+  company_name TEXT PRIMARY KEY,
+  product_count INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+-- 每个分类的商品数，数量减到0时删除该行
+CREATE TABLE IF NOT EXISTS stats_categories (
+  category TEXT PRIMARY KEY,
+  product_count INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_stats_categories_count ON stats_categories(product_count);
+
+-- 用现有数据初始化（stats_rollup.py rebuild 执行同样的语句）
+INSERT OR REPLACE INTO stats_totals (id, total_products, total_stock, total_value, total_companies)
+SELECT 1, COUNT(*), COALESCE(SUM(stock), 0), COALESCE(SUM(price * stock), 0), COUNT(DISTINCT company_name)
+FROM products WHERE status = 'active';
+
+DELETE FROM stats_companies;
+INSERT INTO stats_companies (company_name, product_count)
+SELECT company_name, COUNT(*) FROM products WHERE status = 'active' GROUP BY company_name;
+
+DELETE FROM stats_categories;
+INSERT INTO stats_categories (category, product_count)
+SELECT category, COUNT(*) FROM products WHERE status = 'active' AND category IS NOT NULL GROUP BY category;
+
+-- 触发器：新增有效商品时累加
+CREATE TRIGGER IF NOT EXISTS products_stats_insert AFTER INSERT ON products WHEN new.status = 'active' BEGIN
+  UPDATE stats_totals SET
+    total_products = total_products + 1,
+    total_stock = total_stock + new.stock,
+    total_value = total_value + new.price * new.stock,
+    total_companies = total_companies + NOT EXISTS (SELECT 1 FROM stats_companies WHERE company_name = new.company_name)
+  WHERE id = 1;
+  INSERT INTO stats_companies (company_name, product_count) VALUES (new.company_name, 1)
+    ON CONFLICT(company_name) DO UPDATE SET product_count = product_count + 1;
+  INSERT INTO stats_categories (category, product_count) SELECT new.category, 1 WHERE new.category IS NOT NULL
+    ON CONFLICT(category) DO UPDATE SET product_count = product_count + 1;
+END;
+
+-- 触发器：删除有效商品时扣减
+CREATE TRIGGER IF NOT EXISTS products_stats_delete AFTER DELETE ON products WHEN old.status = 'active' BEGIN
+  UPDATE stats_totals SET
+    total_products = total_products - 1,
+    total_stock = total_stock - old.stock,
+    total_value = total_value - old.price * old.stock
+  WHERE id = 1;
+  UPDATE stats_companies SET product_count = product_count - 1 WHERE company_name = old.company_name;
+  UPDATE stats_totals SET total_companies = total_companies - 1
+  WHERE id = 1 AND EXISTS (SELECT 1 FROM stats_companies WHERE company_name = old.company_name AND product_count <= 0);
+  DELETE FROM stats_companies WHERE company_name = old.company_name AND product_count <= 0;
+  UPDATE stats_categories SET product_count = product_count - 1 WHERE category = old.category;
+  DELETE FROM stats_categories WHERE category = old.category AND product_count <= 0;
+END;
+
+-- 触发器：更新统计相关字段（含软删除）时，先扣掉旧值再加上新值
+CREATE TRIGGER IF NOT EXISTS products_stats_update_old AFTER UPDATE OF status, price, stock, company_name, category ON products
+WHEN old.status = 'active' BEGIN
+  UPDATE stats_totals SET
+    total_products = total_products - 1,
+    total_stock = total_stock - old.stock,
+    total_value = total_value - old.price * old.stock
+  WHERE id = 1;
+  UPDATE stats_companies SET product_count = product_count - 1 WHERE company_name = old.company_name;
+  UPDATE stats_totals SET total_companies = total_companies - 1
+  WHERE id = 1 AND EXISTS (SELECT 1 FROM stats_companies WHERE company_name = old.company_name AND product_count <= 0);
+  DELETE FROM stats_companies WHERE company_name = old.company_name AND product_count <= 0;
+  UPDATE stats_categories SET product_count = product_count - 1 WHERE category = old.category;
+  DELETE FROM stats_categories WHERE category = old.category AND product_count <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS products_stats_update_new AFTER UPDATE OF status, price, stock, company_name, category ON products
+WHEN new.status = 'active' BEGIN
+  UPDATE stats_totals SET
+    total_products = total_products + 1,
+    total_stock = total_stock + new.stock,
+    total_value = total_value + new.price * new.stock,
+    total_companies = total_companies + NOT EXISTS (SELECT 1 FROM stats_companies WHERE company_name = new.company_name)
+  WHERE id = 1;
+  INSERT INTO stats_companies (company_name, product_count) VALUES (new.company_name, 1)
+    ON CONFLICT(company_name) DO UPDATE SET product_count = product_count + 1;
+  INSERT INTO stats_categories (category, product_count) SELECT new.category, 1 WHERE new.category IS NOT NULL
+    ON CONFLICT(category) DO UPDATE SET product_count = product_count + 1;
+END;
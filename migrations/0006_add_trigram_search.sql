@@ -0,0 +1,37 @@
+-- /api/products 子串搜索的三元组（trigram）全文索引
+-- 默认分词器按空格和标点切词，连续的中文和 5023510201 这样的纯数字料号整体成为一个词，
+-- 搜索其中一段匹配不到，所以列表搜索一直用 LIKE '%x%' 全表扫描。
+-- trigram 分词器把文本切成每3个字符一组，任意3个字符以上的子串都能用索引查找（不区分大小写）。
+-- 索引 /api/products?search= 搜索的全部五个字段，searchFields=all 也能走索引。
+
+CREATE VIRTUAL TABLE IF NOT EXISTS products_trigram USING fts5(
+  name,
+  company_name,
+  description,
+  category,
+  sku,
+  content='products',
+  content_rowid='id',
+  tokenize='trigram'
+);
+
+-- 用现有数据建立索引（数据量很大时也可以用 search_index.py backfill 分段补建）
+INSERT INTO products_trigram(products_trigram) VALUES ('rebuild');
+
+-- 触发器：外部内容表需要用 'delete' 命令带上旧值删除索引项
+CREATE TRIGGER IF NOT EXISTS products_trigram_insert AFTER INSERT ON products BEGIN
+  INSERT INTO products_trigram(rowid, name, company_name, description, category, sku)
+  VALUES (new.id, new.name, new.company_name, new.description, new.category, new.sku);
+END;
+
+CREATE TRIGGER IF NOT EXISTS products_trigram_delete AFTER DELETE ON products BEGIN
+  INSERT INTO products_trigram(products_trigram, rowid, name, company_name, description, category, sku)
+  VALUES ('delete', old.id, old.name, old.company_name, old.description, old.category, old.sku);
+END;
+
+CREATE TRIGGER IF NOT EXISTS products_trigram_update AFTER UPDATE OF name, company_name, description, category, sku ON products BEGIN
+  INSERT INTO products_trigram(products_trigram, rowid, name, company_name, description, category, sku)
+  VALUES ('delete', old.id, old.name, old.company_name, old.description, old.category, old.sku);
+  INSERT INTO products_trigram(rowid, name, company_name, description, category, sku)
+  VALUES (new.id, new.name, new.company_name, new.description, new.category, new.sku);
+END;
@@ -0,0 +1,746 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地替身API服务器（用于离线压测和脚本联调）
+
+用 ThreadingHTTPServer 实现 Worker 中导入和查询相关的接口，数据存放在本地 SQLite
+文件中（启动时执行 migrations/，与 D1 使用同一套表结构、索引和FTS触发器）：
+
+    POST   /api/auth/login           登录，签发与Worker相同格式的 HS256 JWT
+    GET    /api/products             列表 / LIKE 搜索 / 筛选（SQL与 src/index.tsx 相同）
+    GET    /api/products/skus        按id游标分页导出SKU
+    GET    /api/products/:id         单个商品
+    DELETE /api/products/:id         软删除
+    POST   /api/products/bulk-delete 按条件分块批量删除（需要管理员）
+    POST   /api/products/batch       批量导入（集合式：json_each 多行 INSERT OR IGNORE ... RETURNING，与Worker一致）
+    POST   /api/products/import-csv  CSV文本导入（要求UTF-8，乱码替换表不在这里实现）
+    POST   /api/products/import-ndjson  NDJSON流式导入（支持chunked请求体和 Content-Encoding: gzip）
+    GET    /api/search               FTS5 bm25 搜索
+    GET    /api/stats                统计（读取触发器维护的汇总表）
+
+响应格式、状态码和错误信息与Worker保持一致。写操作用一把全局锁串行执行，
+和 D1 单写者的行为相同。--latency-ms 可以给每个请求加上固定延迟来模拟网络往返，
+--error-rate 按比例随机返回503，用来验证客户端的重试逻辑。--import-mode row 切回改造前的
+逐行导入，配合 --d1-latency-ms（每次D1查询的往返延迟）对比两种写入方式。
+
+用法:
+    python3 mock_api_server.py --db loadtest.sqlite --port 8787
+    python3 mock_api_server.py --db loadtest.sqlite --rows 200000    # 数据库不存在时先生成20万行测试数据
+    WEBAPP_API_URL=http://127.0.0.1:8787 WEBAPP_PASSWORD=admin123 python3 test_import_fixed.py
+"""
+
+import argparse
+import base64
+import csv
+import hashlib
+import hmac
+import io
+import json
+import os
+import random
+import re
+import sqlite3
+import string
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from bench_queries import (STATS_QUERIES, STATS_SCAN_QUERIES, build_cursor_query, build_products_count,
+                           build_products_filter, build_products_queries, build_search_queries, decode_cursor,
+                           encode_cursor, products_sort)
+from d1_client import apply_migrations
+
+JWT_SECRET = os.environ.get('JWT_SECRET', 'your-jwt-secret-key-2025')
+TOKEN_EXPIRY = 24 * 60 * 60
+COUNT_CACHE_TTL = 60            # 带筛选条件的总数缓存秒数
+COUNT_CACHE_MAX_ENTRIES = 200
+
+FIELD_MAPPING = {
+    '商品名称': 'name', '公司名称': 'company_name', '售价': 'price', '库存': 'stock',
+    '分类': 'category', '描述': 'description', 'SKU': 'sku',
+    'name': 'name', 'company_name': 'company_name', 'price': 'price', 'stock': 'stock',
+    'category': 'category', 'description': 'description', 'sku': 'sku',
+}
+
+class HttpError(Exception):
+    def __init__(self, status, error, data=None):
+        super().__init__(error)
+        self.status = status
+        self.error = error
+        self.data = data
+
+# ---- JWT（HS256，与 hono/jwt 的 sign/verify 兼容） ----
+
+def _b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+def _b64url_decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+def sign_jwt(payload, secret=JWT_SECRET):
+    header = _b64url(json.dumps({'alg': 'HS256', 'typ': 'JWT'}, separators=(',', ':')).encode())
+    body = _b64url(json.dumps(payload, separators=(',', ':')).encode())
+    signature = hmac.new(secret.encode(), f"{header}.{body}".encode(), hashlib.sha256).digest()
+    return f"{header}.{body}.{_b64url(signature)}"
+
+def verify_jwt(token, secret=JWT_SECRET):
+    """校验签名和过期时间，返回payload；无效时抛出 ValueError"""
+    try:
+        header, body, signature = token.split('.')
+    except ValueError:
+        raise ValueError('令牌格式错误')
+    expected = hmac.new(secret.encode(), f"{header}.{body}".encode(), hashlib.sha256).digest()
+    if not hmac.compare_digest(expected, _b64url_decode(signature)):
+        raise ValueError('签名无效')
+    payload = json.loads(_b64url_decode(body))
+    if payload.get('exp') and payload['exp'] < time.time():
+        raise ValueError('令牌已过期')
+    return payload
+
+def generate_unique_sku(name, index):
+    """与Worker中 generateUniqueSKU 相同的格式"""
+    timestamp = str(int(time.time() * 1000))[-6:]
+    prefix = re.sub(r'[^a-zA-Z0-9]', '', name or '')[:8].upper()
+    suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+    return f"CONN-{prefix or 'PROD'}-{timestamp}-{suffix}"
+
+# ---- 路由 ----
+
+ROUTES = []
+
+def route(method, pattern, auth=True, write=False, admin=False, stream=False):
+    """stream=True 的处理函数收到的 body 是请求体的行迭代器，自己负责加锁和提交"""
+    def register(handler):
+        ROUTES.append((method, re.compile(f"^{pattern}$"), auth or admin, write, admin, stream, handler))
+        return handler
+    return register
+
+@route('POST', '/api/auth/login', auth=False, write=True)
+def login(api, query, body):
+    username = body.get('username')
+    password = body.get('password')
+    if not username or not password:
+        raise HttpError(400, '用户名和密码不能为空')
+
+    user = api.db.execute("SELECT * FROM users WHERE username = ? AND status = 'active'", (username,)).fetchone()
+    if not user:
+        raise HttpError(401, '用户名或密码错误')
+    stored = user['password_hash']
+    if stored and len(stored) == 64:
+        valid = hashlib.sha256((password + 'salt-2025').encode()).hexdigest() == stored
+    else:
+        valid = password == stored
+    if not valid:
+        api.db.execute("UPDATE users SET failed_login_attempts = failed_login_attempts + 1, "
+                       "updated_at = CURRENT_TIMESTAMP WHERE id = ?", (user['id'],))
+        raise HttpError(401, '用户名或密码错误')
+
+    api.db.execute("UPDATE users SET failed_login_attempts = 0, account_locked_until = NULL, "
+                   "last_login = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP WHERE id = ?", (user['id'],))
+    now = int(time.time())
+    token = sign_jwt({'userId': user['id'], 'username': user['username'], 'email': user['email'],
+                      'role': user['role'], 'iat': now, 'exp': now + TOKEN_EXPIRY})
+    return {'success': True, 'data': {'token': token, 'user': {
+        'id': user['id'], 'username': user['username'], 'email': user['email'],
+        'role': user['role'], 'last_login': user['last_login']}}}
+
+def count_products(api, where, args, use_cache):
+    """与 src/index.tsx 的 countProducts 相同：无筛选读汇总行，有筛选时 COUNT(*) 并缓存 COUNT_CACHE_TTL 秒"""
+    count_sql, count_args = build_products_count(where, args)
+    if not count_args:
+        try:
+            row = api.db.execute(count_sql).fetchone()
+        except sqlite3.OperationalError:
+            row = None  # 汇总表还没有迁移
+        if row:
+            return row[0]
+        count_sql = f"SELECT COUNT(*) as total FROM products {where}"
+
+    key = (where, tuple(args))
+    now = time.monotonic()
+    cached = api.server.count_cache.get(key)
+    if use_cache and cached and cached[1] > now:
+        return cached[0]
+    total = api.db.execute(count_sql, count_args).fetchone()[0]
+    if args:
+        cache = api.server.count_cache
+        cache.pop(key, None)
+        if len(cache) >= COUNT_CACHE_MAX_ENTRIES:
+            cache.pop(next(iter(cache)), None)
+        cache[key] = (total, now + COUNT_CACHE_TTL)
+    return total
+
+@route('GET', '/api/products')
+def list_products(api, query, body):
+    trigram = not api.server.trigram_missing
+    try:
+        return query_products(api, query, trigram)
+    except sqlite3.OperationalError as e:
+        if not trigram or 'products_trigram' not in str(e):
+            raise
+        api.server.trigram_missing = True  # 三元组索引还没有迁移：之后的请求都用 LIKE
+        return query_products(api, query, trigram=False)
+
+def query_products(api, query, trigram):
+    where, args = build_products_filter(query, trigram)
+    if 'cursor' in query:
+        return list_products_cursor(api, query, where, args, trigram)
+
+    page = int(query.get('page') or 1)
+    limit = int(query.get('limit') or 20)
+    # 第一页总是重新计数，后面的页复用缓存的总数
+    total = count_products(api, where, args, use_cache=page > 1)
+    data_sql, data_args = build_products_queries(query, trigram)[1]
+    rows = api.db.execute(data_sql, data_args).fetchall()
+    return {'success': True, 'data': [dict(r) for r in rows],
+            'pagination': {'page': page, 'limit': limit, 'total': total, 'totalPages': -(-total // limit)}}
+
+def list_products_cursor(api, query, where, args, trigram):
+    sort_by, sort_order = products_sort(query)
+    cursor = None
+    if query['cursor']:
+        cursor = decode_cursor(query['cursor'])
+        if cursor is None or cursor.get('s') != sort_by or cursor.get('o') != sort_order:
+            raise HttpError(400, '无效的游标（排序方式需与上一页一致）')
+    data_sql, data_args = build_cursor_query(query, cursor, trigram)
+    limit = data_args[-1] - 1
+    rows = [dict(r) for r in api.db.execute(data_sql, data_args).fetchall()]
+    has_more = len(rows) > limit
+    del rows[limit:]
+    next_cursor = encode_cursor(sort_by, sort_order, rows[-1][sort_by], rows[-1]['id']) if has_more else None
+    include_total = query.get('includeTotal') in ('1', 'true')
+    return {'success': True, 'data': rows, 'pagination': {
+        'limit': limit, 'hasMore': has_more, 'nextCursor': next_cursor,
+        'total': count_products(api, where, args, use_cache=True) if include_total else None}}
+
+@route('GET', '/api/products/skus')
+def list_skus(api, query, body):
+    after_id = int(query.get('afterId') or 0)
+    limit = min(int(query.get('limit') or 5000), 10000)
+    rows = api.db.execute("SELECT id, sku FROM products WHERE id > ? AND sku IS NOT NULL ORDER BY id LIMIT ?",
+                          (after_id, limit)).fetchall()
+    return {'success': True, 'data': {'skus': [r['sku'] for r in rows],
+                                      'lastId': rows[-1]['id'] if rows else after_id,
+                                      'hasMore': len(rows) == limit}}
+
+@route('GET', r'/api/products/(\d+)')
+def get_product(api, query, body, product_id):
+    row = api.db.execute("SELECT * FROM products WHERE id = ? AND status = 'active'", (product_id,)).fetchone()
+    if not row:
+        raise HttpError(404, '商品不存在')
+    return {'success': True, 'data': dict(row)}
+
+@route('DELETE', r'/api/products/(\d+)', write=True)
+def delete_product(api, query, body, product_id):
+    changes = api.db.execute("UPDATE products SET status = 'inactive', updated_at = CURRENT_TIMESTAMP "
+                             "WHERE id = ? AND status = 'active'", (product_id,)).rowcount
+    if changes == 0:
+        raise HttpError(404, '商品不存在')
+    return {'success': True, 'message': '商品已删除'}
+
+@route('POST', '/api/products/bulk-delete', write=True, admin=True)
+def bulk_delete(api, query, body):
+    category = body.get('category') or ''
+    company = body.get('company') or ''
+    sku_prefix = body.get('skuPrefix') or ''
+    min_id = int(body.get('minId') or 0)
+    max_id = int(body['maxId']) if body.get('maxId') is not None else None
+    dry_run = body.get('dryRun') is True
+    hard_delete = body.get('mode') == 'delete'
+    chunk_size = min(max(int(body.get('chunkSize') or 5000), 100), 20000)
+    max_chunks = min(max(int(body.get('maxChunks') or 200), 1), 500)
+
+    if not (category or company or sku_prefix or min_id or max_id is not None):
+        raise HttpError(400, '至少需要指定一个筛选条件（category、company、skuPrefix 或 id 范围）')
+
+    where = "status = 'active'"
+    params = []
+    if category:
+        where += " AND category = ?"
+        params.append(category)
+    if company:
+        where += " AND company_name = ?"
+        params.append(company)
+    if sku_prefix:
+        where += " AND substr(sku, 1, ?) = ?"
+        params += [len(sku_prefix), sku_prefix]
+
+    range_sql = f"SELECT MIN(id), MAX(id), COUNT(*) FROM products WHERE {where} AND id >= ?"
+    range_params = params + [min_id]
+    if max_id is not None:
+        range_sql += " AND id <= ?"
+        range_params.append(max_id)
+    lo, hi, matched = api.db.execute(range_sql, range_params).fetchone()
+    if dry_run or not matched:
+        return {'success': True, 'data': {'matched': matched, 'affected': 0, 'dryRun': dry_run,
+                                          'done': True, 'nextId': None}}
+
+    # 与 Worker 相同，mode=delete 也只写删除标记（status='deleted'），增量导出才能看到这些行
+    statement = f"UPDATE products SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id >= ? AND id < ? AND {where}"
+    new_status = 'deleted' if hard_delete else 'inactive'
+    affected = 0
+    for _ in range(max_chunks):
+        if lo > hi:
+            break
+        affected += api.db.execute(statement, [new_status, lo, min(lo + chunk_size, hi + 1)] + params).rowcount
+        lo += chunk_size
+
+    done = lo > hi
+    return {'success': True, 'data': {'matched': matched, 'affected': affected, 'dryRun': False,
+                                      'done': done, 'nextId': None if done else lo}}
+
+def import_products(db, products, regenerate_duplicate_sku=False, line_numbers=None, d1_latency=0):
+    """逐行导入（Worker 的 CSV 导入和改造前的批量导入），返回 (成功数, 失败数, 错误列表)
+
+    每行先查SKU再插入，d1_latency 模拟每次查询的 D1 往返
+    """
+    success_count = 0
+    errors = []
+    for i, product in enumerate(products):
+        line = line_numbers[i] if line_numbers else i + 1
+        if not product.get('name') or not product.get('company_name') \
+                or product.get('price') is None or product.get('stock') is None:
+            errors.append(f"第{line}行: 商品名称、公司名称、价格和库存为必填字段")
+            continue
+        if not product.get('sku'):
+            product['sku'] = generate_unique_sku(product['name'], i)
+        product['category'] = product.get('category') or '连接器'
+        product['description'] = product.get('description') or f"连接器产品 - {product['name']}"
+
+        time.sleep(d1_latency)
+        existing = db.execute("SELECT id FROM products WHERE sku = ? AND status = 'active'",
+                              (product['sku'],)).fetchone()
+        if existing:
+            if not regenerate_duplicate_sku:
+                errors.append(f"第{line}行: SKU {product['sku']} 已存在，跳过导入")
+                continue
+            product['sku'] = generate_unique_sku(product['name'], int(time.time() * 1000) + i)
+
+        try:
+            time.sleep(d1_latency)
+            changes = db.execute(
+                f"INSERT {'' if regenerate_duplicate_sku else 'OR IGNORE '}INTO products "
+                "(name, company_name, price, stock, description, category, sku, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)",
+                (product['name'], product['company_name'], product['price'], product['stock'],
+                 product['description'], product['category'], product['sku'], product.get('status') or 'active')
+            ).rowcount
+        except sqlite3.Error as e:
+            errors.append(f"第{line}行: {e}")
+            continue
+        if changes == 0:
+            errors.append(f"第{line}行: SKU {product['sku']} 插入失败，可能存在冲突")
+            continue
+        success_count += 1
+    return success_count, len(errors), errors
+
+IMPORT_ROWS_PER_STATEMENT = 1000
+IMPORT_INSERT_SQL = (
+    "INSERT OR IGNORE INTO products "
+    "(name, company_name, price, stock, description, category, sku, status, created_at, updated_at) "
+    "SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]'), json_extract(value, '$[2]'), "
+    "json_extract(value, '$[3]'), json_extract(value, '$[4]'), json_extract(value, '$[5]'), "
+    "json_extract(value, '$[6]'), json_extract(value, '$[7]'), CURRENT_TIMESTAMP, CURRENT_TIMESTAMP "
+    "FROM json_each(?) RETURNING sku"
+)
+
+def import_products_set(db, products, line_numbers=None, d1_latency=0):
+    """与Worker的 importProducts 相同的集合式导入：每1000行一条查询加一条多行插入，
+    整个请求只有一次 D1 往返，错误信息与逐行导入一致"""
+    row_errors = [None] * len(products)
+    line_of = (lambda i: line_numbers[i]) if line_numbers else (lambda i: i + 1)
+    pending = []
+    batch_skus = set()
+    for i, product in enumerate(products):
+        if not product.get('name') or not product.get('company_name') \
+                or product.get('price') is None or product.get('stock') is None:
+            row_errors[i] = f"第{line_of(i)}行: 商品名称、公司名称、价格和库存为必填字段"
+            continue
+        if not product.get('sku'):
+            product['sku'] = generate_unique_sku(product['name'], i)
+        product['category'] = product.get('category') or '连接器'
+        product['description'] = product.get('description') or f"连接器产品 - {product['name']}"
+        if product['sku'] in batch_skus:
+            row_errors[i] = f"第{line_of(i)}行: SKU {product['sku']} 已存在，跳过导入"
+            continue
+        batch_skus.add(product['sku'])
+        pending.append(i)
+
+    time.sleep(d1_latency)
+    existing = set()
+    inserted = set()
+    for start in range(0, len(pending), IMPORT_ROWS_PER_STATEMENT):
+        chunk = [products[i] for i in pending[start:start + IMPORT_ROWS_PER_STATEMENT]]
+        existing.update(row[0] for row in db.execute(
+            "SELECT sku FROM products WHERE status = 'active' AND sku IN (SELECT value FROM json_each(?))",
+            (json.dumps([p['sku'] for p in chunk], ensure_ascii=False),)))
+        values = [[p['name'], p['company_name'], p['price'], p['stock'], p['description'] or '',
+                   p['category'] or '', p['sku'], p.get('status') or 'active'] for p in chunk]
+        inserted.update(row[0] for row in db.execute(IMPORT_INSERT_SQL, (json.dumps(values, ensure_ascii=False),)))
+
+    for i in pending:
+        sku = products[i]['sku']
+        if sku not in inserted:
+            row_errors[i] = f"第{line_of(i)}行: SKU {sku} " + ("已存在，跳过导入" if sku in existing else "插入失败，可能存在冲突")
+    errors = [e for e in row_errors if e is not None]
+    return len(products) - len(errors), len(errors), errors
+
+def import_rows(api, products, line_numbers=None):
+    """批量导入和NDJSON导入使用的写入路径（--import-mode 选择逐行或集合式）"""
+    if api.server.import_mode == 'row':
+        return import_products(api.db, products, line_numbers=line_numbers, d1_latency=api.server.d1_latency)
+    return import_products_set(api.db, products, line_numbers, api.server.d1_latency)
+
+@route('POST', '/api/products/batch', write=True)
+def batch_import(api, query, body):
+    products = body.get('products')
+    if not isinstance(products, list) or not products:
+        raise HttpError(400, '商品数据格式错误')
+    success_count, error_count, errors = import_rows(api, products)
+    return {'success': True, 'data': {'total': len(products), 'successCount': success_count,
+                                      'errorCount': error_count, 'errors': errors}}
+
+@route('POST', '/api/products/import-csv', write=True)
+def import_csv(api, query, body):
+    csv_data = body.get('csvData')
+    if not csv_data or not isinstance(csv_data, str):
+        raise HttpError(400, 'CSV数据格式错误')
+    lines = csv_data.strip().split('\n')
+    if len(lines) < 2:
+        raise HttpError(400, 'CSV文件至少需要包含表头和一行数据')
+
+    headers = [FIELD_MAPPING.get(h.strip(), h.strip()) for h in next(csv.reader([lines[0]]))]
+    missing = [f for f in ('name', 'company_name', 'price', 'stock') if f not in headers]
+    if missing:
+        raise HttpError(400, f"CSV文件缺少必须的列: {', '.join(missing)}。"
+                             f"支持的标题格式: 商品名称,公司名称,售价,库存 或 name,company_name,price,stock")
+
+    products = []
+    for values in csv.reader(io.StringIO('\n'.join(lines[1:]))):
+        product = {}
+        for field, value in zip(headers, values):
+            value = value.strip()
+            if field == 'price':
+                try:
+                    product[field] = float(value)
+                except ValueError:
+                    product[field] = 0
+            elif field == 'stock':
+                try:
+                    product[field] = int(value)
+                except ValueError:
+                    product[field] = 0
+            else:
+                product[field] = value
+        products.append(product)
+
+    success_count, error_count, errors = import_products(api.db, products, regenerate_duplicate_sku=True,
+                                                         d1_latency=api.server.d1_latency)
+    return {'success': True, 'data': {'total': len(products), 'successCount': success_count,
+                                      'errorCount': error_count, 'errors': errors[:10]}}
+
+NDJSON_FLUSH_ROWS = 100
+NDJSON_MAX_ERRORS = 100
+
+@route('POST', '/api/products/import-ndjson', stream=True)
+def import_ndjson(api, query, lines):
+    """与Worker相同：每 NDJSON_FLUSH_ROWS 行在写锁内导入并提交一次"""
+    total = success_count = error_count = 0
+    errors = []
+    products = []
+    line_numbers = []
+
+    def flush():
+        nonlocal success_count, error_count
+        if not products:
+            return
+        with api.server.write_lock:
+            api.db.execute("BEGIN IMMEDIATE")
+            try:
+                ok, failed, batch_errors = import_rows(api, products, line_numbers)
+                api.db.execute("COMMIT")
+            except BaseException:
+                api.db.execute("ROLLBACK")
+                raise
+        success_count += ok
+        error_count += failed
+        errors.extend(batch_errors[:NDJSON_MAX_ERRORS - len(errors)])
+        products.clear()
+        line_numbers.clear()
+
+    try:
+        for line_number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            total += 1
+            try:
+                product = json.loads(line)
+            except ValueError:
+                product = None
+            if not isinstance(product, dict):
+                error_count += 1
+                if len(errors) < NDJSON_MAX_ERRORS:
+                    errors.append(f"第{line_number}行: 不是有效的JSON对象")
+                continue
+            products.append(product)
+            line_numbers.append(line_number)
+            if len(products) >= NDJSON_FLUSH_ROWS:
+                flush()
+        flush()
+    except (zlib.error, ValueError, sqlite3.Error) as e:
+        data = {'total': total, 'successCount': success_count, 'errorCount': error_count, 'errors': errors}
+        raise HttpError(500, f"流式导入失败: {e}", data)
+    return {'success': True, 'data': {'total': total, 'successCount': success_count,
+                                      'errorCount': error_count, 'errors': errors}}
+
+@route('GET', '/api/search')
+def search(api, query, body):
+    q = query.get('q') or ''
+    if not q.strip():
+        raise HttpError(400, '搜索关键词不能为空')
+    search_fields = query.get('searchFields') or 'all'
+    [(sql, args)] = build_search_queries(q, search_fields, int(query.get('limit') or 20))
+    try:
+        rows = api.db.execute(sql, args).fetchall()
+    except sqlite3.OperationalError:
+        raise HttpError(500, '搜索失败')
+    return {'success': True, 'data': [dict(r) for r in rows], 'query': q,
+            'searchFields': search_fields, 'ftsQuery': args[0]}
+
+@route('GET', '/api/stats')
+def stats(api, query, body):
+    """与Worker相同：读取触发器维护的汇总表，汇总表不存在时回退到五个聚合查询"""
+    db = api.db
+    try:
+        (totals_sql, _), (categories_sql, _) = STATS_QUERIES
+        totals = db.execute(totals_sql).fetchone()
+        if totals is not None:
+            return {'success': True, 'data': {
+                'totalProducts': totals['total_products'] or 0,
+                'totalStock': totals['total_stock'] or 0,
+                'totalValue': totals['total_value'] or 0,
+                'totalCompanies': totals['total_companies'] or 0,
+                'topCategories': [dict(r) for r in db.execute(categories_sql)],
+            }}
+    except sqlite3.OperationalError:
+        pass
+
+    count, stock, value, companies, categories = STATS_SCAN_QUERIES
+    return {'success': True, 'data': {
+        'totalProducts': db.execute(count[0]).fetchone()[0] or 0,
+        'totalStock': db.execute(stock[0]).fetchone()[0] or 0,
+        'totalValue': db.execute(value[0]).fetchone()[0] or 0,
+        'totalCompanies': db.execute(companies[0]).fetchone()[0] or 0,
+        'topCategories': [dict(r) for r in db.execute(categories[0])],
+    }}
+
+# ---- HTTP ----
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'webapp-standin/1.0'
+    # 响应头和响应体分两次写出；keep-alive 连接上 Nagle 加延迟确认会让之后每个请求多等约40ms
+    disable_nagle_algorithm = True
+
+    @property
+    def db(self):
+        """每个连接（线程）一个SQLite连接，连接结束时关闭"""
+        if getattr(self, '_db', None) is None:
+            self._db = sqlite3.connect(self.server.db_path, timeout=30, isolation_level=None,
+                                       check_same_thread=False)
+            self._db.row_factory = sqlite3.Row
+        return self._db
+
+    def finish(self):
+        super().finish()
+        if getattr(self, '_db', None) is not None:
+            self._db.close()
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(data)))
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def iter_body(self, block_size=65536):
+        """逐块读取请求体（Content-Length 或 chunked），Content-Encoding: gzip 时边读边解压"""
+        decompressor = zlib.decompressobj(wbits=31) \
+            if 'gzip' in (self.headers.get('Content-Encoding') or '').lower() else None
+
+        def raw_blocks():
+            if 'chunked' in (self.headers.get('Transfer-Encoding') or '').lower():
+                while True:
+                    size = int(self.rfile.readline().split(b';')[0].strip() or b'0', 16)
+                    if size == 0:
+                        while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                            pass
+                        return
+                    yield self.rfile.read(size)
+                    self.rfile.readline()
+            else:
+                remaining = int(self.headers.get('Content-Length') or 0)
+                while remaining > 0:
+                    block = self.rfile.read(min(block_size, remaining))
+                    if not block:
+                        return
+                    remaining -= len(block)
+                    yield block
+
+        for block in raw_blocks():
+            yield decompressor.decompress(block) if decompressor else block
+        if decompressor:
+            yield decompressor.flush()
+
+    def iter_lines(self):
+        """请求体按行迭代（bytes，不含换行符）"""
+        pending = b''
+        for block in self.iter_body():
+            lines = (pending + block).split(b'\n')
+            pending = lines.pop()
+            yield from lines
+        if pending:
+            yield pending
+
+    def dispatch(self, method):
+        url = urlsplit(self.path)
+        matched = [(r, m) for r in ROUTES for m in [r[1].match(url.path)] if m]
+        found = next(((r, m) for r, m in matched if r[0] == method), None)
+        streaming = found is not None and found[0][5]
+        # 流式路由的请求体由处理函数边读边处理；提前返回时没读完，只能关闭连接
+        raw = b'' if streaming else self.read_body()
+        if streaming:
+            self.close_connection = True
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.error_rate and random.random() < self.server.error_rate:
+            return self.send_json(503, {'success': False, 'error': '服务暂时不可用（模拟故障）'})
+
+        if found is not None:
+            (route_method, pattern, auth, write, admin, stream, handler), m = found
+            try:
+                if auth:
+                    header = self.headers.get('Authorization') or ''
+                    if not header.startswith('Bearer '):
+                        raise HttpError(401, '未授权访问')
+                    try:
+                        user = verify_jwt(header[7:])
+                    except ValueError:
+                        raise HttpError(401, '令牌无效或已过期')
+                    if admin and user.get('role') != 'admin':
+                        raise HttpError(403, '需要管理员权限')
+                query = dict(parse_qsl(url.query, keep_blank_values=True))  # cursor= 表示游标模式的第一页
+                if stream:
+                    return self.send_json(200, handler(self, query, self.iter_lines(), *m.groups()))
+                try:
+                    body = json.loads(raw) if raw else {}
+                except ValueError:
+                    raise HttpError(400, '请求体不是有效的JSON')
+                if write:
+                    with self.server.write_lock:
+                        self.db.execute("BEGIN IMMEDIATE")
+                        try:
+                            result = handler(self, query, body, *m.groups())
+                            self.db.execute("COMMIT")
+                        except BaseException:
+                            self.db.execute("ROLLBACK")
+                            raise
+                else:
+                    result = handler(self, query, body, *m.groups())
+                return self.send_json(200, result)
+            except HttpError as e:
+                payload = {'success': False, 'error': e.error}
+                if e.data is not None:
+                    payload['data'] = e.data
+                return self.send_json(e.status, payload)
+            except Exception as e:
+                self.log_error("handler error on %s %s: %r", method, url.path, e)
+                return self.send_json(500, {'success': False, 'error': f'服务器内部错误: {e}'})
+
+        self.send_json(405 if matched else 404, {'success': False, 'error': 'Not Found'})
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_PUT(self):
+        self.dispatch('PUT')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, db_path, latency_ms=0, error_rate=0.0, verbose=False,
+                 import_mode='set', d1_latency_ms=0):
+        super().__init__(address, ApiHandler)
+        self.db_path = db_path
+        self.latency = latency_ms / 1000
+        self.error_rate = error_rate
+        self.import_mode = import_mode
+        self.d1_latency = d1_latency_ms / 1000
+        self.verbose = verbose
+        self.write_lock = threading.Lock()
+        self.count_cache = {}
+        self.trigram_missing = False
+
+def prepare_database(db_path, rows=0, seed='standin'):
+    """数据库不存在且指定了行数时先批量生成测试数据；然后执行尚未应用的迁移并切换到WAL模式"""
+    if rows and not os.path.exists(db_path):
+        from generate_test_data import load_sqlite
+        load_sqlite(db_path, rows, seed)
+    conn = sqlite3.connect(db_path)
+    try:
+        applied = apply_migrations(conn)
+        conn.execute("PRAGMA journal_mode = WAL")
+    finally:
+        conn.close()
+    return applied
+
+def main():
+    parser = argparse.ArgumentParser(description='本地替身API服务器（SQLite）')
+    parser.add_argument('--db', default='standin.sqlite', help='SQLite数据库文件')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8787)
+    parser.add_argument('--rows', type=int, default=0, help='数据库不存在时预先生成的测试数据行数')
+    parser.add_argument('--latency-ms', type=float, default=0, help='每个请求附加的延迟（模拟网络往返）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='随机返回503的比例')
+    parser.add_argument('--import-mode', choices=['set', 'row'], default='set',
+                        help='批量导入的写入方式：set=集合式（当前Worker），row=逐行查询加插入（改造前）')
+    parser.add_argument('--d1-latency-ms', type=float, default=0,
+                        help='导入时每次D1查询往返附加的延迟（逐行导入每行两次，集合式每个请求一次）')
+    parser.add_argument('--verbose', action='store_true', help='打印每个请求')
+    args = parser.parse_args()
+
+    applied = prepare_database(args.db, args.rows)
+    if applied:
+        print(f"已执行迁移: {', '.join(applied)}")
+    server = ApiServer((args.host, args.port), args.db, args.latency_ms, args.error_rate, args.verbose,
+                       args.import_mode, args.d1_latency_ms)
+    print(f"🚀 替身API已启动: http://{args.host}:{server.server_port}  数据库: {args.db}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
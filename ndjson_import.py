@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+gzip 压缩的 NDJSON 流式导入（POST /api/products/import-ndjson）
+
+test_import.py 把整个CSV读进内存再包成 {"csvData": ...} 发送：JSON转义让请求体变大，
+客户端和Worker都要在内存中持有完整请求体。这里逐行读CSV，每行转换为一个JSON对象，
+边压缩边以 chunked 方式上传，客户端内存占用与文件大小无关；Worker 边解压边解析，
+每100行写入一次。
+
+价格和库存在本地按块校验（规则与 validate_csv.py 相同），无效行不上传；
+跨行的重复检查需要读完整个文件，流式模式不做，重复SKU由服务端拒绝。
+没有SKU的行在压缩前补上按名称和公司计算的确定性SKU（csv_transform.content_skus），
+名称和公司都相同的行只导入第一行。
+请求失败时重新读文件整体重传：中途失败前已提交的行和重跑时已导入的行，
+都会因为SKU相同被服务端跳过，不会重复插入。
+服务端错误信息中的行号是NDJSON中的行号（不含表头和本地校验拒绝的行）。
+--metrics-jsonl / --metrics-prom 输出行数、压缩后字节数、请求延迟和重传次数（见 import_metrics）。
+
+用法:
+    python3 ndjson_import.py 'converted/*_part_*.csv'
+    python3 ndjson_import.py part_001.csv --level 9
+    python3 ndjson_import.py part_001.csv --dry-run      # 只比较压缩前后和 csvData 方式的大小，不上传
+"""
+
+import argparse
+import csv
+import json
+import random
+import resource
+import time
+import zlib
+
+from csv_common import FIELD_MAPPING, detect_encoding, expand_inputs, normalize_prices, normalize_stocks
+from csv_transform import fill_content_skus
+from d1_client import ApiClient, ApiError
+from import_metrics import (BYTES_SENT, RETRIES, ROWS_ACCEPTED, ROWS_FAILED, ROWS_READ, ROWS_REJECTED, ROWS_SENT,
+                            add_metrics_arguments, metrics_from_args)
+
+BLOCK_SIZE = 64 * 1024
+READ_BATCH = 1000
+RETRY_STATUS = ApiClient.RETRY_STATUS
+
+def iter_products(path, rejected, encoding=None):
+    """逐行读取CSV、按块校验并转换为商品字典；未通过校验的行记入 rejected 列表 (行号, 原因)"""
+    encoding = encoding or detect_encoding(path)
+    if encoding == 'utf-8':
+        encoding = 'utf-8-sig'
+    with open(path, 'r', encoding=encoding, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            raise ValueError(f"{path} 是空文件")
+        fields = [FIELD_MAPPING.get(h.strip(), h.strip()) for h in header]
+        missing = [f for f in ('name', 'company_name', 'price', 'stock') if f not in fields]
+        if missing:
+            raise ValueError(f"{path} 缺少必须的列: {', '.join(missing)}")
+
+        batch = []
+        for record in reader:
+            if not record or not any(record):
+                continue
+            batch.append((reader.line_num, {field: value.strip() for field, value in zip(fields, record)
+                                            if value.strip()}))
+            if len(batch) >= READ_BATCH:
+                yield from _convert_batch(batch, rejected)
+                batch = []
+        yield from _convert_batch(batch, rejected)
+
+def _convert_batch(batch, rejected):
+    """按列校验一批行并补上确定性SKU，返回通过校验的商品字典"""
+    prices, price_reasons = normalize_prices([row.get('price', '') for _, row in batch])
+    stocks, stock_reasons = normalize_stocks([row.get('stock', '') for _, row in batch])
+    products = []
+    for (line, row), price, stock, price_reason, stock_reason in zip(batch, prices, stocks,
+                                                                      price_reasons, stock_reasons):
+        reasons = [r for r in (
+            None if row.get('name') else '商品名称为空',
+            None if row.get('company_name') else '公司名称为空',
+            price_reason, stock_reason) if r]
+        if reasons:
+            rejected.append((line, '; '.join(reasons)))
+            continue
+        row['price'] = float(price)
+        row['stock'] = int(stock)
+        products.append(row)
+    fill_content_skus(products)
+    return products
+
+def gzip_ndjson(products, stats, level=6, block_size=BLOCK_SIZE):
+    """把商品逐行编码为NDJSON并gzip压缩，按块产出；stats 中累计行数和压缩前后的字节数"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    pending = []
+    pending_size = 0
+    for product in products:
+        line = json.dumps(product, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+        pending.append(line)
+        pending_size += len(line)
+        stats['rows'] += 1
+        if pending_size >= block_size:
+            stats['raw_bytes'] += pending_size
+            block = compressor.compress(b''.join(pending))
+            pending, pending_size = [], 0
+            if block:
+                stats['gzip_bytes'] += len(block)
+                yield block
+    stats['raw_bytes'] += pending_size
+    block = compressor.compress(b''.join(pending)) + compressor.flush()
+    stats['gzip_bytes'] += len(block)
+    yield block
+
+def _new_stats(path):
+    return {'file': path, 'rows': 0, 'rejected': 0, 'raw_bytes': 0, 'gzip_bytes': 0}
+
+def upload_file(api, path, level=6, max_attempts=5, timeout=600, metrics=None):
+    """流式上传一个文件，失败时退避后整体重传；返回统计信息字典
+
+    metrics 不为空时记入行数和压缩后的字节数（请求耗时和状态由 ApiClient 记录）
+    """
+    started = time.monotonic()
+    for attempt in range(max_attempts):
+        stats = _new_stats(path)
+        rejected = []
+        body = gzip_ndjson(iter_products(path, rejected), stats, level)
+        try:
+            response = api.post('/api/products/import-ndjson', data=body, timeout=timeout, headers={
+                'Content-Type': 'application/x-ndjson', 'Content-Encoding': 'gzip'})
+            error = None if response.status_code not in RETRY_STATUS else f"HTTP {response.status_code}"
+        except ApiError as e:
+            response, error = None, str(e)
+        if metrics:
+            # 流式请求体的大小 ApiClient 拿不到，按实际产出的压缩块计
+            metrics.inc(BYTES_SENT, stats['gzip_bytes'])
+        if error is None or attempt == max_attempts - 1:
+            break
+        print(f"⚠️  {path}: {error}，第{attempt + 1}次重传")
+        if metrics:
+            metrics.inc(RETRIES)
+        time.sleep(random.uniform(0, min(30.0, 2 ** attempt)))
+
+    stats['rejected'] = len(rejected)
+    stats['rejected_lines'] = rejected[:20]
+    stats['seconds'] = time.monotonic() - started
+    try:
+        result = response.json() if response is not None else None
+    except ValueError:  # 网关错误页等非JSON响应体
+        result = None
+    if response is None:
+        stats['error'] = error
+    elif response.status_code != 200 or result is None:
+        stats['error'] = f"HTTP {response.status_code}: {(result or {}).get('error') or response.text[:200]}"
+    else:
+        if not result.get('success'):
+            stats['error'] = result.get('error')
+        data = result.get('data') or {}
+        stats.update(success=data.get('successCount', 0), errors=data.get('errorCount', 0),
+                     messages=data.get('errors', [])[:20])
+    if metrics:
+        metrics.inc(ROWS_READ, stats['rows'] + stats['rejected'])
+        metrics.inc(ROWS_REJECTED, stats['rejected'], stage='local')
+        metrics.inc(ROWS_SENT, stats['rows'])
+        metrics.inc(ROWS_ACCEPTED, stats.get('success', 0))
+        metrics.inc(ROWS_REJECTED, stats.get('errors', 0), stage='server')
+        if 'success' not in stats:
+            metrics.inc(ROWS_FAILED, stats['rows'])
+    return stats
+
+def measure_file(path, level=6):
+    """不上传，只统计NDJSON压缩前后和原来 csvData 方式的请求体大小"""
+    stats = _new_stats(path)
+    rejected = []
+    for _ in gzip_ndjson(iter_products(path, rejected), stats, level):
+        pass
+    stats['rejected'] = len(rejected)
+    encoding = detect_encoding(path)
+    with open(path, 'r', encoding='utf-8-sig' if encoding == 'utf-8' else encoding) as f:
+        stats['csvdata_bytes'] = len(json.dumps({'csvData': f.read()}).encode('utf-8'))
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description='gzip压缩的NDJSON流式导入')
+    parser.add_argument('inputs', nargs='+', help='CSV文件、目录或通配符')
+    parser.add_argument('--level', type=int, default=6, help='gzip压缩级别 1-9')
+    parser.add_argument('--max-attempts', type=int, default=5, help='每个文件最多上传几次')
+    parser.add_argument('--timeout', type=float, default=600, help='单个文件的上传超时（秒）')
+    parser.add_argument('--dry-run', action='store_true', help='只统计大小，不上传')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    files = expand_inputs(args.inputs)
+    if not files:
+        print("❌ 没有找到CSV文件")
+        return
+
+    metrics = None if args.dry_run else metrics_from_args('ndjson_import', args)
+    api = None if args.dry_run else ApiClient(metrics=metrics)
+    totals = {'rows': 0, 'success': 0, 'raw_bytes': 0, 'gzip_bytes': 0, 'csvdata_bytes': 0}
+    started = time.monotonic()
+    for path in files:
+        try:
+            stats = measure_file(path, args.level) if args.dry_run else upload_file(
+                api, path, args.level, args.max_attempts, args.timeout, metrics)
+        except (OSError, ValueError) as e:
+            print(f"❌ {path}: {e}")
+            continue
+        for key in totals:
+            totals[key] += stats.get(key, 0)
+
+        sizes = f"NDJSON {stats['raw_bytes'] / 1024:.0f}KB → gzip {stats['gzip_bytes'] / 1024:.0f}KB"
+        if args.dry_run:
+            print(f"📄 {path}: {stats['rows']} 行（校验拒绝 {stats['rejected']}），{sizes}，"
+                  f"csvData 方式 {stats['csvdata_bytes'] / 1024:.0f}KB")
+        elif stats.get('error'):
+            print(f"❌ {path}: {stats['error']}（{sizes}）")
+        else:
+            print(f"✅ {path}: 上传 {stats['rows']} 行，导入 {stats['success']}，服务端拒绝 {stats['errors']}，"
+                  f"校验拒绝 {stats['rejected']}，{sizes}，{stats['seconds']:.1f}s")
+            for message in stats['messages'][:3]:
+                print(f"   ⚠️  {message}")
+
+    elapsed = time.monotonic() - started
+    ratio = totals['gzip_bytes'] / totals['raw_bytes'] if totals['raw_bytes'] else 0
+    print(f"\n📊 {len(files)} 个文件，{totals['rows']} 行，gzip 后 {totals['gzip_bytes'] / 1024 / 1024:.1f}MB "
+          f"(压缩率 {ratio:.1%})，用时 {elapsed:.1f}s，"
+          f"峰值内存 {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f}MB")
+    if args.dry_run and totals['csvdata_bytes']:
+        print(f"   csvData 方式共 {totals['csvdata_bytes'] / 1024 / 1024:.1f}MB，"
+              f"请求体减少 {1 - totals['gzip_bytes'] / totals['csvdata_bytes']:.1%}")
+    elif not args.dry_run:
+        print(f"   导入 {totals['success']} 行")
+        api.close()
+        metrics.close()
+        metrics.print_summary()
+
+if __name__ == '__main__':
+    main()
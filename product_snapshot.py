@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+商品数据列式快照格式（.psnap）
+
+文件由若干行组（row group）组成，每个行组按列存储：
+- id: 差分编码的 int64 数组
+- price: 按6位小数换算成整数（微元）的 int64 数组，不经过浮点误差
+- stock: int64 数组
+- company_name / category / status 等重复度高的文本列: 字典编码（字典 + 编号数组）
+- name / sku / description 等文本列: 长度数组 + UTF-8 拼接的字符串块
+每个列块单独 zlib 压缩。
+
+文件结构:
+    MAGIC
+    [uint32 头部长度][头部JSON][列块...]   # 每个行组一段
+    uint32 0                               # 结束标记
+
+用法:
+    python3 product_snapshot.py info migration_data.psnap
+    python3 product_snapshot.py restore migration_data.psnap --db products.sqlite
+    python3 product_snapshot.py merge --base full.psnap delta1.psnap delta2.psnap -o new_full.psnap
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import struct
+import sys
+import zlib
+from array import array
+from decimal import Decimal
+
+MAGIC = b'PSNAP1\n'
+PRICE_SCALE = 10 ** 6  # 价格精度：6位小数
+DEFAULT_ROW_GROUP_SIZE = 65536
+
+COLUMNS = ['id', 'name', 'company_name', 'price', 'stock', 'description', 'category', 'sku', 'status',
+           'created_at', 'updated_at']
+INT_COLUMNS = {'id', 'stock'}
+
+def _pack_array(values, typecode):
+    arr = array(typecode, values)
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr.tobytes()
+
+def _unpack_array(data, typecode):
+    arr = array(typecode)
+    arr.frombytes(data)
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr
+
+def _encode_strings(values):
+    """长度数组（-1 表示NULL）+ UTF-8 拼接"""
+    encoded = [v.encode('utf-8') if v is not None else None for v in values]
+    lengths = _pack_array([len(b) if b is not None else -1 for b in encoded], 'i')
+    return struct.pack('<I', len(values)) + lengths + b''.join(b for b in encoded if b)
+
+def _decode_strings(data):
+    count = struct.unpack_from('<I', data)[0]
+    lengths = _unpack_array(data[4:4 + 4 * count], 'i')
+    pos = 4 + 4 * count
+    values = []
+    for length in lengths:
+        if length < 0:
+            values.append(None)
+        else:
+            values.append(data[pos:pos + length].decode('utf-8'))
+            pos += length
+    return values
+
+def price_to_micros(price):
+    """价格转换为整数微元（保留6位小数）"""
+    if price is None:
+        return 0
+    return int((Decimal(str(price)) * PRICE_SCALE).to_integral_value())
+
+def _encode_column(name, values):
+    """返回 (编码方式, 原始字节)"""
+    if name == 'id':
+        deltas = [values[0]] + [b - a for a, b in zip(values, values[1:])] if values else []
+        return 'delta-i64', _pack_array(deltas, 'q')
+    if name in INT_COLUMNS:
+        return 'i64', _pack_array([v or 0 for v in values], 'q')
+    if name == 'price':
+        return 'micros-i64', _pack_array([price_to_micros(v) for v in values], 'q')
+
+    # 文本列：重复度高时用字典编码
+    dictionary = {}
+    codes = [dictionary.setdefault(v, len(dictionary)) for v in values]
+    if len(dictionary) <= max(1, len(values) // 2):
+        typecode = 'H' if len(dictionary) < 65536 else 'I'
+        words = _encode_strings(list(dictionary))
+        return f'dict-{typecode}', struct.pack('<I', len(words)) + words + _pack_array(codes, typecode)
+    return 'strings', _encode_strings(values)
+
+def _decode_column(encoding, data):
+    if encoding == 'delta-i64':
+        values = []
+        total = 0
+        for delta in _unpack_array(data, 'q'):
+            total += delta
+            values.append(total)
+        return values
+    if encoding == 'i64':
+        return _unpack_array(data, 'q').tolist()
+    if encoding == 'micros-i64':
+        return [m / PRICE_SCALE for m in _unpack_array(data, 'q')]
+    if encoding.startswith('dict-'):
+        words_len = struct.unpack_from('<I', data)[0]
+        words = _decode_strings(data[4:4 + words_len])
+        return [words[c] for c in _unpack_array(data[4 + words_len:], encoding[5:])]
+    if encoding == 'strings':
+        return _decode_strings(data)
+    raise ValueError(f"未知的列编码: {encoding}")
+
+class SnapshotWriter:
+    """流式写入快照：攒满一个行组就编码落盘，内存只保留一个行组"""
+
+    def __init__(self, path, columns=COLUMNS, row_group_size=DEFAULT_ROW_GROUP_SIZE, meta=None):
+        self.path = path
+        self.columns = list(columns)
+        self.row_group_size = row_group_size
+        self.rows_written = 0
+        self._pending = []
+        self._tmp_path = path + '.tmp'
+        self._file = open(self._tmp_path, 'wb')
+        header = json.dumps({'columns': self.columns, 'meta': meta or {}}, ensure_ascii=False).encode('utf-8')
+        self._file.write(MAGIC + struct.pack('<I', len(header)) + header)
+
+    def write_rows(self, rows):
+        for row in rows:
+            self._pending.append(row)
+            if len(self._pending) >= self.row_group_size:
+                self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        blocks = []
+        column_info = []
+        for name in self.columns:
+            encoding, raw = _encode_column(name, [row.get(name) for row in self._pending])
+            block = zlib.compress(raw, 6)
+            blocks.append(block)
+            column_info.append({'name': name, 'encoding': encoding, 'length': len(block)})
+
+        header = json.dumps({'rows': len(self._pending), 'columns': column_info}).encode('utf-8')
+        self._file.write(struct.pack('<I', len(header)) + header)
+        for block in blocks:
+            self._file.write(block)
+        self.rows_written += len(self._pending)
+        self._pending = []
+
+    def close(self):
+        self._flush()
+        self._file.write(struct.pack('<I', 0))
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            os.remove(self._tmp_path)
+
+def read_header(f):
+    """读取文件头，返回 {'columns': [...], 'meta': {...}}"""
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("不是商品快照文件")
+    length = struct.unpack('<I', f.read(4))[0]
+    return json.loads(f.read(length))
+
+def iter_row_groups(path, columns=None):
+    """逐个行组读取，返回 {列名: 值列表}；columns 指定时只解码这些列"""
+    with open(path, 'rb') as f:
+        read_header(f)
+        while True:
+            length = struct.unpack('<I', f.read(4))[0]
+            if length == 0:
+                return
+            group = json.loads(f.read(length))
+            result = {}
+            for info in group['columns']:
+                block = f.read(info['length'])
+                if columns is None or info['name'] in columns:
+                    result[info['name']] = _decode_column(info['encoding'], zlib.decompress(block))
+            yield result
+
+def iter_rows(path):
+    """逐行读取快照，返回字典"""
+    for group in iter_row_groups(path):
+        names = list(group)
+        for values in zip(*(group[name] for name in names)):
+            yield dict(zip(names, values))
+
+def snapshot_info(path):
+    with open(path, 'rb') as f:
+        header = read_header(f)
+    rows = sum(len(group['id']) for group in iter_row_groups(path, columns={'id'}))
+    return {'path': path, 'bytes': os.path.getsize(path), 'rows': rows, **header}
+
+def restore_to_sqlite(path, db_path, table='products', batch_size=50000):
+    """把快照批量写入SQLite表（单个事务），返回写入行数"""
+    with open(path, 'rb') as f:
+        columns = read_header(f)['columns']
+
+    conn = sqlite3.connect(db_path)
+    # 批量恢复：关闭逐次fsync、加大页缓存，整个恢复在一个事务里完成
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -262144")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    placeholders = ', '.join('?' for _ in columns)
+    sql = f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+    restored = 0
+    try:
+        with conn:
+            for group in iter_row_groups(path):
+                rows = list(zip(*(group[name] for name in columns)))
+                for i in range(0, len(rows), batch_size):
+                    conn.executemany(sql, rows[i:i + batch_size])
+                restored += len(rows)
+    finally:
+        conn.close()
+    return restored
+
+def merge_snapshots(base_path, delta_paths, output_path):
+    """把增量快照依次应用到全量快照上，生成新的全量快照（只保留 active 行）
+
+    增量中的行按 id 覆盖全量中的行，status 不是 active 的行视为删除。
+    增量按生成顺序传入，后面的覆盖前面的；base_path 为 None 时从空表开始。
+    """
+    changes = {}
+    for delta_path in delta_paths:
+        for row in iter_rows(delta_path):
+            changes[row['id']] = row
+
+    kept = 0
+    removed = 0
+    meta = {'kind': 'full', 'base': base_path and os.path.basename(base_path),
+            'deltas': [os.path.basename(p) for p in delta_paths]}
+    with SnapshotWriter(output_path, meta=meta) as writer:
+        if base_path:
+            for group in iter_row_groups(base_path):
+                names = list(group)
+                id_pos = names.index('id')
+                rows = []
+                for values in zip(*(group[name] for name in names)):
+                    row = changes.pop(values[id_pos], None) or dict(zip(names, values))
+                    if row.get('status', 'active') == 'active':
+                        rows.append(row)
+                    else:
+                        removed += 1
+                writer.write_rows(rows)
+                kept += len(rows)
+
+        rows = [changes[row_id] for row_id in sorted(changes) if changes[row_id]['status'] == 'active']
+        writer.write_rows(rows)
+        kept += len(rows)
+
+    return kept, removed
+
+def to_numpy(path):
+    """把数值列读成NumPy数组，文本维度列读成 (编号数组, 字典) 供分析使用"""
+    import numpy as np
+
+    ids, micros, stocks = [], [], []
+    dims = {'company_name': {}, 'category': {}}
+    dim_codes = {name: [] for name in dims}
+    for group in iter_row_groups(path, columns={'id', 'price', 'stock', 'company_name', 'category'}):
+        ids.append(np.asarray(group['id'], dtype=np.int64))
+        micros.append(np.rint(np.asarray(group['price'], dtype=np.float64) * PRICE_SCALE).astype(np.int64))
+        stocks.append(np.asarray(group['stock'], dtype=np.int64))
+        for name, dictionary in dims.items():
+            dim_codes[name].append(np.fromiter(
+                (dictionary.setdefault(v, len(dictionary)) for v in group[name]),
+                dtype=np.int32, count=len(group[name])))
+
+    def concat(parts, dtype):
+        return np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+
+    result = {
+        'id': concat(ids, np.int64),
+        'price_micros': concat(micros, np.int64),
+        'stock': concat(stocks, np.int64),
+    }
+    result['price'] = result['price_micros'] / PRICE_SCALE
+    for name, dictionary in dims.items():
+        result[name] = (concat(dim_codes[name], np.int32), list(dictionary))
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='商品列式快照工具')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    info = sub.add_parser('info', help='查看快照信息')
+    info.add_argument('path')
+
+    restore = sub.add_parser('restore', help='把快照写入SQLite数据库')
+    restore.add_argument('path')
+    restore.add_argument('--db', required=True, help='目标SQLite文件（需已建好products表）')
+    restore.add_argument('--table', default='products')
+
+    merge = sub.add_parser('merge', help='把增量快照合并到全量快照')
+    merge.add_argument('deltas', nargs='+', help='按生成顺序排列的增量快照')
+    merge.add_argument('--base', help='全量快照（不指定时从空表开始）')
+    merge.add_argument('-o', '--output', required=True)
+
+    args = parser.parse_args()
+    if args.command == 'info':
+        print(json.dumps(snapshot_info(args.path), ensure_ascii=False, indent=2))
+    elif args.command == 'restore':
+        count = restore_to_sqlite(args.path, args.db, args.table)
+        print(f"✅ 已写入 {count} 条数据到 {args.db}")
+    elif args.command == 'merge':
+        kept, removed = merge_snapshots(args.base, args.deltas, args.output)
+        print(f"✅ 合并完成: {kept} 条有效数据，删除 {removed} 条，输出 {args.output}")
+
+if __name__ == '__main__':
+    main()
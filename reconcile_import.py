@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+源CSV与数据库的逐行对账
+
+*_import_stats.json 只记录了Node导入脚本的计数（9.16 那次 totalRecords 639971、importedRecords 27014，
+成功文件数还多于处理文件数），看不出哪些行真正进了数据库。这个工具逐行流式读取全部分片CSV，
+再按 id 游标导出数据库中的商品，两边都把 (名称, 公司, 价格, 库存) 规范化后取64位哈希，
+用分区哈希连接比较：
+
+  1. 每一行按哈希写入 N 个分区文件之一（源：哈希+文件编号+行号；数据库：哈希+id）
+  2. 逐个分区把数据库一侧装进字典，再扫描源一侧，内存只与单个分区的大小有关
+
+名称和公司按 validate_csv 的去重规则规范化（全角转半角、合并空白、忽略大小写），
+价格按6位小数比较。价格、库存或必填字段无效的行不会被导入，单独计为“无效”。
+同一个键在源文件中出现多次时只要求数据库中至少有一行。
+
+输出:
+  - 每个文件的 行数/无效/已入库/缺失/重复 报告（-o 保存为JSON）
+  - --missing-csv: 只包含缺失行的CSV（价格、库存已规范化），可以直接交给导入工具
+  - --extras-ids: 数据库中有、所有源文件都没有的商品id，每行一个
+
+用法:
+    python3 reconcile_import.py '9.16数据/*_part_*.csv' --missing-csv missing.csv -o reconcile.json
+    python3 reconcile_import.py converted/ --db standin.sqlite --extras-ids extras.txt
+    python3 reconcile_import.py converted/ --api                  # 通过 /api/products 游标分页导出
+    python3 reconcile_import.py converted/ --remote --partitions 256
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import shutil
+import struct
+import tempfile
+import time
+from decimal import Decimal, InvalidOperation
+
+from csv_common import (FIELD_MAPPING, OUTPUT_FIELDS, PRICE_DECIMALS, detect_encoding, expand_inputs, normalize_key,
+                        normalize_prices, normalize_stocks)
+from d1_client import ApiClient
+from stats_rollup import open_target
+
+SOURCE_RECORD = struct.Struct('<QII')  # 哈希, 文件编号, 行号
+DB_RECORD = struct.Struct('<Qq')       # 哈希, 商品id
+PRICE_QUANTUM = Decimal(1).scaleb(-PRICE_DECIMALS)
+EXPORT_BATCH = 5000
+MAX_SAMPLES = 20
+
+def price_key(value):
+    """价格的规范形式：按6位小数取整后去掉末尾的0（CSV中的字符串和数据库中的REAL得到相同结果）"""
+    try:
+        text = format(Decimal(str(value)).quantize(PRICE_QUANTUM), 'f')
+    except InvalidOperation:
+        return str(value)
+    return text.rstrip('0').rstrip('.') if '.' in text else text
+
+def row_hash(name, company, price, stock):
+    key = f"{normalize_key(name)}\x1f{normalize_key(company)}\x1f{price_key(price)}\x1f{int(stock)}"
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+
+def iter_source_rows(path, encoding=None):
+    """逐行读取CSV，产出 (行号, 字段字典, 无效原因或None)；价格、库存已规范化"""
+    encoding = encoding or detect_encoding(path)
+    if encoding == 'utf-8':
+        encoding = 'utf-8-sig'
+    with open(path, 'r', encoding=encoding, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            raise ValueError(f"{path} 是空文件")
+        fields = [FIELD_MAPPING.get(h.strip(), h.strip()) for h in header]
+        missing = [f for f in ('name', 'company_name', 'price', 'stock') if f not in fields]
+        if missing:
+            raise ValueError(f"{path} 缺少必须的列: {', '.join(missing)}")
+
+        for record in reader:
+            if not record or not any(record):
+                continue
+            row = {field: value.strip() for field, value in zip(fields, record)}
+            (row['price'],), (price_reason,) = normalize_prices([row.get('price', '')])
+            (row['stock'],), (stock_reason,) = normalize_stocks([row.get('stock', '')])
+            reasons = [r for r in (
+                None if row.get('name') else '商品名称为空',
+                None if row.get('company_name') else '公司名称为空',
+                price_reason, stock_reason) if r]
+            yield reader.line_num, row, '; '.join(reasons) or None
+
+def iter_database_rows(args):
+    """按 id 游标导出数据库中的有效商品，逐批产出字典列表"""
+    columns = 'id, name, company_name, price, stock'
+    if args.api:
+        api = ApiClient()
+        batch = []
+        try:
+            for product in api.iter_products({'sortBy': 'id', 'sortOrder': 'ASC'}, page_size=1000):
+                batch.append(product)
+                if len(batch) >= EXPORT_BATCH:
+                    yield batch
+                    batch = []
+        finally:
+            api.close()
+        if batch:
+            yield batch
+        return
+    backend = open_target(args, writable=False)
+    try:
+        yield from backend.iter_products(columns, EXPORT_BATCH)
+    finally:
+        backend.close()
+
+class Partitions:
+    """按哈希分到 count 个临时文件，每个文件由定长记录组成"""
+
+    def __init__(self, directory, prefix, record, count):
+        self.record = record
+        self.count = count
+        self.paths = [os.path.join(directory, f"{prefix}-{i:04d}.bin") for i in range(count)]
+        self.files = [open(path, 'wb', buffering=256 * 1024) for path in self.paths]
+
+    def add(self, row_hash, *values):
+        self.files[row_hash % self.count].write(self.record.pack(row_hash, *values))
+
+    def close(self):
+        for f in self.files:
+            f.close()
+
+    def read(self, index):
+        with open(self.paths[index], 'rb') as f:
+            return list(self.record.iter_unpack(f.read()))
+
+def scatter_sources(files, partitions):
+    """第一遍：读全部源文件，返回每个文件的统计信息"""
+    reports = []
+    for index, path in enumerate(files):
+        report = {'file': path, 'rows': 0, 'invalid': 0, 'matched': 0, 'missing': 0, 'duplicates': 0}
+        try:
+            for line, row, reason in iter_source_rows(path):
+                report['rows'] += 1
+                if reason:
+                    report['invalid'] += 1
+                    continue
+                partitions.add(row_hash(row['name'], row['company_name'], row['price'], row['stock']), index, line)
+        except (OSError, ValueError) as e:
+            report['error'] = str(e)
+            print(f"❌ {path}: {e}")
+        reports.append(report)
+    return reports
+
+def scatter_database(args, partitions):
+    """第一遍：导出数据库，返回行数"""
+    rows = 0
+    started = time.monotonic()
+    for batch in iter_database_rows(args):
+        for product in batch:
+            partitions.add(row_hash(product['name'], product['company_name'], product['price'], product['stock']),
+                           product['id'])
+        rows += len(batch)
+        if rows % (EXPORT_BATCH * 40) < len(batch):
+            print(f"   已导出 {rows:,} 行 ({rows / max(time.monotonic() - started, 1e-6):,.0f} 行/秒)")
+    return rows
+
+def join_partitions(sources, database, reports, extras_file=None):
+    """第二遍：逐个分区比较，更新每个文件的统计，返回 (缺失行 {文件编号: 行号集合}, 汇总)"""
+    missing = {}
+    summary = {'db_matched': 0, 'extras': 0, 'db_duplicate_rows': 0, 'extra_samples': [], 'duplicate_samples': []}
+    for index in range(sources.count):
+        db_ids = {}
+        for key, product_id in database.read(index):
+            if key not in db_ids:
+                db_ids[key] = product_id
+                continue
+            # 同一个键在数据库中出现多次，通常是同一行被重复导入
+            summary['db_duplicate_rows'] += 1
+            if len(summary['duplicate_samples']) < MAX_SAMPLES:
+                summary['duplicate_samples'].append(product_id)
+
+        seen = set()
+        for key, file_index, line in sources.read(index):
+            report = reports[file_index]
+            if key in seen:
+                report['duplicates'] += 1
+                continue
+            seen.add(key)
+            if key in db_ids:
+                report['matched'] += 1
+            else:
+                report['missing'] += 1
+                missing.setdefault(file_index, set()).add(line)
+
+        summary['db_matched'] += len(seen & db_ids.keys())
+        for key, product_id in db_ids.items():
+            if key not in seen:
+                summary['extras'] += 1
+                if len(summary['extra_samples']) < MAX_SAMPLES:
+                    summary['extra_samples'].append(product_id)
+                if extras_file:
+                    extras_file.write(f"{product_id}\n")
+    return missing, summary
+
+def write_missing_csv(files, missing, output_path):
+    """第三遍：只重读有缺失行的文件，把缺失行写成可以直接导入的CSV，返回写入行数"""
+    written = 0
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(OUTPUT_FIELDS)
+        for file_index in sorted(missing):
+            lines = missing[file_index]
+            for line, row, reason in iter_source_rows(files[file_index]):
+                if line in lines and not reason:
+                    writer.writerow([row.get(field, '') for field in OUTPUT_FIELDS])
+                    written += 1
+    os.replace(tmp_path, output_path)
+    return written
+
+def reconcile(args, files):
+    """返回 (每个文件的报告列表, 汇总字典)"""
+    work_dir = tempfile.mkdtemp(prefix='reconcile-', dir=args.temp_dir)
+    try:
+        sources = Partitions(work_dir, 'src', SOURCE_RECORD, args.partitions)
+        database = Partitions(work_dir, 'db', DB_RECORD, args.partitions)
+        try:
+            print(f"📂 读取 {len(files)} 个源文件...")
+            reports = scatter_sources(files, sources)
+            print("🗄️  导出数据库中的商品...")
+            db_rows = scatter_database(args, database)
+        finally:
+            sources.close()
+            database.close()
+
+        print(f"🔗 按 {args.partitions} 个分区比较...")
+        extras_file = open(args.extras_ids + '.tmp', 'w', encoding='utf-8') if args.extras_ids else None
+        try:
+            missing, summary = join_partitions(sources, database, reports, extras_file)
+        finally:
+            if extras_file:
+                extras_file.close()
+        if args.extras_ids:
+            os.replace(args.extras_ids + '.tmp', args.extras_ids)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    summary['db_rows'] = db_rows
+    for key in ('rows', 'invalid', 'matched', 'missing', 'duplicates'):
+        summary[key] = sum(r[key] for r in reports)
+    if args.missing_csv:
+        summary['missing_csv_rows'] = write_missing_csv(files, missing, args.missing_csv)
+    return reports, summary
+
+def main():
+    parser = argparse.ArgumentParser(description='源CSV与数据库逐行对账，找出缺失和多余的商品')
+    parser.add_argument('inputs', nargs='+', help='CSV文件、目录或通配符')
+    parser.add_argument('--db', help='SQLite数据库文件（默认使用本地D1文件）')
+    parser.add_argument('--remote', action='store_true', help='通过 wrangler 导出远程数据库')
+    parser.add_argument('--api', action='store_true', help='通过 /api/products 游标分页导出（WEBAPP_API_URL 等环境变量）')
+    parser.add_argument('--partitions', type=int, default=64, help='分区数，每个分区单独装入内存比较')
+    parser.add_argument('--temp-dir', help='分区临时文件目录（默认系统临时目录）')
+    parser.add_argument('--missing-csv', help='缺失行写入的CSV文件')
+    parser.add_argument('--extras-ids', help='数据库多出的商品id写入的文件')
+    parser.add_argument('-o', '--output', help='报告保存为JSON')
+    args = parser.parse_args()
+
+    files = expand_inputs(args.inputs)
+    if not files:
+        print("❌ 没有找到CSV文件")
+        return
+
+    started = time.monotonic()
+    reports, summary = reconcile(args, files)
+
+    for r in reports:
+        if r.get('error'):
+            continue
+        icon = '✅' if r['missing'] == 0 else '⚠️ '
+        print(f"{icon} {r['file']}: {r['rows']} 行，已入库 {r['matched']}，缺失 {r['missing']}，"
+              f"无效 {r['invalid']}，重复 {r['duplicates']}")
+
+    print(f"\n📊 {len(files)} 个文件，{summary['rows']:,} 行：已入库 {summary['matched']:,}，缺失 {summary['missing']:,}，"
+          f"无效 {summary['invalid']:,}，源文件中重复 {summary['duplicates']:,}")
+    print(f"   数据库 {summary['db_rows']:,} 行：对应源文件 {summary['db_matched']:,} 个键，"
+          f"源文件中没有的 {summary['extras']:,} 行，同键重复 {summary['db_duplicate_rows']:,} 行")
+    if summary['extra_samples']:
+        print(f"   多出的商品id示例: {', '.join(map(str, summary['extra_samples'][:10]))}")
+    if summary['duplicate_samples']:
+        print(f"   重复导入的商品id示例: {', '.join(map(str, summary['duplicate_samples'][:10]))}")
+    if args.missing_csv:
+        print(f"📝 缺失的 {summary['missing_csv_rows']:,} 行已写入 {args.missing_csv}")
+    if args.extras_ids:
+        print(f"📝 多出的商品id已写入 {args.extras_ids}")
+    print(f"⏱️  用时 {time.monotonic() - started:.1f}s")
+
+    if args.output:
+        tmp_path = args.output + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'files': reports}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, args.output)
+        print(f"💾 报告已保存到 {args.output}")
+
+if __name__ == '__main__':
+    main()
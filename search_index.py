@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+/api/products 子串搜索的三元组全文索引（products_trigram，见 migrations/0006）的校验、重建和分段补建
+
+索引由 products 上的触发器维护。verify 先做FTS5自带的完整性检查（对照 products 内容），再从商品中随机取若干子串
+（中文名称、公司名、SKU料号的一段），分别按三元组索引和原来的 LIKE 条件计数，两者应完全相同。
+rebuild 用一条 'rebuild' 语句从 products 重建整个索引；数据量很大、单条语句在远程库上
+超时的情况下用 backfill 先清空索引，再按 id 区间分段写入。
+
+重建或补建期间如果同时有写入，变更可能漏掉或重复，建议在导入间隙执行。
+
+用法:
+    python3 search_index.py verify                            # 本地D1 SQLite文件
+    python3 search_index.py rebuild --db standin.sqlite       # 指定SQLite文件（替身API、基准数据库）
+    python3 search_index.py backfill --remote --chunk-size 20000
+    python3 search_index.py verify --remote --samples 10
+"""
+
+import argparse
+import random
+import sqlite3
+import sys
+import time
+
+from bench_queries import TRIGRAM_MIN_CHARS, build_products_count, build_products_filter
+from d1_client import SqliteBackend
+from stats_rollup import open_target
+
+INDEX_TABLE = 'products_trigram'
+INDEX_COLUMNS = 'name, company_name, description, category, sku'
+SAMPLE_FIELDS = ['name', 'company_name', 'sku']
+MAX_LISTED = 10
+
+def _execute(backend, sql, params=()):
+    """执行写入语句；wrangler 失败时抛出异常"""
+    if isinstance(backend, SqliteBackend):
+        backend.execute(sql, params)
+    elif backend.query(sql, params) is None:
+        raise RuntimeError(f"执行失败: {' '.join(sql.split())[:80]}")
+
+def _count(backend, params, trigram):
+    where, args = build_products_filter(params, trigram)
+    count_sql, count_args = build_products_count(where, args)
+    rows = backend.query(count_sql, count_args)
+    if rows is None:
+        raise RuntimeError("计数查询失败")
+    return rows[0]['total']
+
+def sample_terms(backend, samples, seed=None):
+    """从随机商品的名称、公司名和SKU中截取3~6个字符的子串，返回 [(字段, 子串)]"""
+    rng = random.Random(seed)
+    max_id = backend.query("SELECT MAX(id) as max_id FROM products")[0]['max_id'] or 0
+    terms = []
+    for _ in range(samples * 5):
+        if len(terms) >= samples or not max_id:
+            break
+        rows = backend.query(f"SELECT {', '.join(SAMPLE_FIELDS)} FROM products WHERE id >= ? AND status = 'active' "
+                             "ORDER BY id LIMIT 1", (rng.randint(1, max_id),))
+        if not rows:
+            continue
+        field = rng.choice(SAMPLE_FIELDS)
+        text = rows[0][field] or ''
+        if '%' in text or '_' in text or len(text) < TRIGRAM_MIN_CHARS:
+            continue
+        length = rng.randint(TRIGRAM_MIN_CHARS, min(6, len(text)))
+        start = rng.randint(0, len(text) - length)
+        terms.append((field, text[start:start + length]))
+    return terms
+
+def verify(backend, samples=20, seed=None):
+    """返回问题描述列表（空列表表示索引正确）"""
+    problems = []
+    try:
+        # rank = 1 时还会逐行对照 products 的内容，缺失或多余的索引项都会报错
+        _execute(backend, f"INSERT INTO {INDEX_TABLE}({INDEX_TABLE}, rank) VALUES ('integrity-check', 1)")
+    except (sqlite3.DatabaseError, RuntimeError) as e:
+        problems.append(f"FTS5 完整性检查失败，索引与 products 不一致: {e}")
+
+    for field, term in sample_terms(backend, samples, seed):
+        for params in ({'search': term}, {'search': term, 'searchFields': field}):
+            indexed, scanned = _count(backend, params, True), _count(backend, params, False)
+            if indexed != scanned:
+                problems.append(f"搜索 {term!r}（{params.get('searchFields', 'all')}）: 索引 {indexed} 行，LIKE {scanned} 行")
+    return problems
+
+def rebuild(backend):
+    """一条语句从 products 重建整个索引"""
+    _execute(backend, f"INSERT INTO {INDEX_TABLE}({INDEX_TABLE}) VALUES ('rebuild')")
+
+def backfill(backend, chunk_size=50000):
+    """清空索引后按 id 区间分段写入，返回写入的行数"""
+    max_id = backend.query("SELECT MAX(id) as max_id FROM products")[0]['max_id'] or 0
+    _execute(backend, f"INSERT INTO {INDEX_TABLE}({INDEX_TABLE}) VALUES ('delete-all')")
+    started = time.monotonic()
+    for start in range(0, max_id, chunk_size):
+        _execute(backend, f"""
+            INSERT INTO {INDEX_TABLE}(rowid, {INDEX_COLUMNS})
+            SELECT id, {INDEX_COLUMNS} FROM products WHERE id > ? AND id <= ?
+        """, (start, start + chunk_size))
+        done = min(start + chunk_size, max_id)
+        print(f"   已补建到 id {done:,}/{max_id:,} ({done / max(time.monotonic() - started, 1e-6):,.0f} id/秒)")
+    return max_id
+
+def main():
+    parser = argparse.ArgumentParser(description='三元组全文索引的校验、重建和分段补建')
+    parser.add_argument('command', choices=['verify', 'rebuild', 'backfill'])
+    parser.add_argument('--db', help='SQLite数据库文件（默认使用本地D1文件）')
+    parser.add_argument('--remote', action='store_true', help='通过 wrangler 访问远程数据库')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='backfill 每段的 id 区间大小')
+    parser.add_argument('--samples', type=int, default=20, help='verify 抽查的搜索词数量')
+    parser.add_argument('--seed', help='抽查用的随机种子')
+    args = parser.parse_args()
+
+    # FTS5 的 integrity-check 以 INSERT 命令的形式执行，只读连接上无法运行
+    backend = open_target(args, writable=True)
+    try:
+        started = time.monotonic()
+        if args.command == 'rebuild':
+            print("🔄 从 products 重建三元组索引...")
+            rebuild(backend)
+            print(f"   用时 {time.monotonic() - started:.1f}s")
+        elif args.command == 'backfill':
+            print(f"🔄 分段补建三元组索引（每段 {args.chunk_size:,} 个id）...")
+            backfill(backend, args.chunk_size)
+            print(f"   用时 {time.monotonic() - started:.1f}s")
+        problems = verify(backend, args.samples, args.seed)
+    finally:
+        backend.close()
+
+    if not problems:
+        print(f"✅ 三元组索引完整，抽查 {args.samples} 个搜索词与 LIKE 结果一致")
+        return
+    print(f"⚠️  发现 {len(problems)} 处问题:")
+    for problem in problems[:MAX_LISTED]:
+        print(f"   {problem}")
+    if len(problems) > MAX_LISTED:
+        print(f"   ……共 {len(problems)} 处")
+    print("   可以运行 python3 search_index.py rebuild 重建索引")
+    sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+客户端SKU存在性过滤
+
+把数据库中已有的SKU下载为一个紧凑的有序数组（每个SKU一个64位哈希，
+60万个SKU约5MB），缓存到本地并按 id 增量刷新。导入前先在本地查一遍，
+确定已存在的行直接丢弃，只把可能是新数据的行发送到 /api/products/batch。
+
+64位哈希冲突的概率约为 N²/2⁶⁴，可以忽略；SKU 被原地修改的情况不会被增量
+刷新捕获，必要时用 --rebuild 重新下载。
+
+用法:
+    python3 sku_filter.py refresh            # 从API增量刷新缓存
+    python3 sku_filter.py refresh --local    # 从本地D1 SQLite文件构建
+    python3 sku_filter.py check part_001.csv # 统计CSV中已存在的SKU数量
+"""
+
+import argparse
+import csv
+import hashlib
+import heapq
+import json
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+from d1_client import API_BASE_URL, ApiClient, ApiError, open_backend
+
+CACHE_DIR = os.path.expanduser(os.path.join('~', '.cache', 'webapp'))
+MAGIC = b'SKUIDX1\n'
+
+def sku_hash(sku):
+    """SKU的64位哈希"""
+    return int.from_bytes(hashlib.blake2b(sku.encode('utf-8'), digest_size=8).digest(), 'little')
+
+def default_cache_path(source=API_BASE_URL):
+    key = hashlib.blake2b(source.encode('utf-8'), digest_size=6).hexdigest()
+    return os.path.join(CACHE_DIR, f'sku_index_{key}.bin')
+
+class SkuIndex:
+    """已存在SKU的有序哈希数组"""
+
+    def __init__(self, source=API_BASE_URL, hashes=None, last_id=0):
+        self.source = source
+        self.hashes = hashes if hashes is not None else array('Q')
+        self.last_id = last_id
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __contains__(self, sku):
+        if not sku:
+            return False
+        h = sku_hash(sku)
+        i = bisect_left(self.hashes, h)
+        return i < len(self.hashes) and self.hashes[i] == h
+
+    def add_many(self, skus):
+        """合并一批新SKU（保持有序、去重）"""
+        self._merge(array('Q', (sku_hash(s) for s in skus if s)))
+
+    def _merge(self, new):
+        """把未排序的哈希数组一次性合并进来：整体排序去重，而不是每页归并一遍全量数组"""
+        if not new:
+            return
+        new = sorted(set(new))
+        merged = array('Q')
+        previous = None
+        for h in heapq.merge(self.hashes, new):
+            if h != previous:
+                merged.append(h)
+                previous = h
+        self.hashes = merged
+
+    def filter_new(self, products):
+        """返回 (可能是新数据的行, 确定已存在而跳过的行数)；没有SKU的行总是保留"""
+        kept = [p for p in products if p.get('sku') not in self]
+        return kept, len(products) - len(kept)
+
+    # ---- 刷新 ----
+
+    def refresh_from_api(self, api, page_size=5000):
+        """从 /api/products/skus 增量下载 last_id 之后的SKU，返回新增数量"""
+        pending = array('Q')
+        try:
+            while True:
+                result = api.get_json('/api/products/skus', params={'afterId': self.last_id, 'limit': page_size})
+                if not result.get('success'):
+                    raise ApiError(f"获取SKU列表失败: {result.get('error')}")
+                data = result['data']
+                pending.extend(sku_hash(s) for s in data['skus'] if s)
+                self.last_id = data['lastId']
+                if not data['hasMore']:
+                    return len(pending)
+        finally:
+            # 各页先收集起来，最后合并一次；中途出错时已下载的部分也要与 last_id 保持一致
+            self._merge(pending)
+
+    def refresh_from_backend(self, backend, batch_size=20000):
+        """从本地数据库增量读取 last_id 之后的SKU，返回新增数量"""
+        pending = array('Q')
+        try:
+            for rows in backend.iter_products('id, sku', batch_size, start_id=self.last_id, where='sku IS NOT NULL'):
+                pending.extend(sku_hash(row['sku']) for row in rows if row['sku'])
+                self.last_id = rows[-1]['id']
+        finally:
+            self._merge(pending)
+        return len(pending)
+
+    # ---- 持久化 ----
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        header = json.dumps({'source': self.source, 'last_id': self.last_id, 'count': len(self.hashes)}).encode('utf-8')
+        data = array('Q', self.hashes)
+        if sys.byteorder == 'big':
+            data.byteswap()
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC + struct.pack('<I', len(header)) + header)
+            f.write(data.tobytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} 不是SKU索引文件")
+            length = struct.unpack('<I', f.read(4))[0]
+            header = json.loads(f.read(length))
+            hashes = array('Q')
+            hashes.frombytes(f.read())
+        if sys.byteorder == 'big':
+            hashes.byteswap()
+        return cls(header['source'], hashes, header['last_id'])
+
+def load_sku_index(api=None, backend=None, cache_path=None, rebuild=False):
+    """加载缓存的SKU索引并增量刷新，刷新后写回缓存"""
+    source = getattr(backend, 'path', None) or (api.base_url if api else API_BASE_URL)
+    cache_path = cache_path or default_cache_path(source)
+
+    index = None
+    if not rebuild and os.path.exists(cache_path):
+        try:
+            index = SkuIndex.load(cache_path)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ SKU缓存无法读取，重新构建: {e}")
+    if index is None or index.source != source:
+        index = SkuIndex(source)
+
+    if backend is not None:
+        added = index.refresh_from_backend(backend)
+    else:
+        added = index.refresh_from_api(api or ApiClient())
+    index.save(cache_path)
+    print(f"🔎 SKU索引: 共 {len(index)} 个，本次新增 {added} 个 (last id={index.last_id})")
+    return index
+
+def main():
+    parser = argparse.ArgumentParser(description='客户端SKU存在性过滤')
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name in ('refresh', 'check'):
+        p = sub.add_parser(name)
+        p.add_argument('--local', action='store_true', help='从本地D1 SQLite文件读取SKU')
+        p.add_argument('--rebuild', action='store_true', help='忽略缓存重新下载')
+        p.add_argument('--cache', help='缓存文件路径')
+        if name == 'check':
+            p.add_argument('csv_files', nargs='+')
+    args = parser.parse_args()
+
+    backend = open_backend('sqlite') if args.local else None
+    index = load_sku_index(backend=backend, cache_path=args.cache, rebuild=args.rebuild)
+
+    if args.command == 'check':
+        for path in args.csv_files:
+            with open(path, 'r', encoding='utf-8', newline='') as f:
+                rows = list(csv.DictReader(f))
+            _, skipped = index.filter_new(rows)
+            print(f"{path}: {len(rows)} 行，已存在 {skipped} 行，需要导入 {len(rows) - skipped} 行")
+
+if __name__ == '__main__':
+    main()
@@ -681,7 +681,88 @@ app.post('/api/auth/logout', (c) => {
 })
 
 // 分页查询商品 - 支持多字段搜索
-app.get('/api/products', async (c) => {
+// 游标分页：游标是 base64url 编码的JSON，记录排序字段、方向和上一页最后一行的排序值与id
+const PRODUCTS_SORT_FIELDS = ['id', 'name', 'company_name', 'price', 'stock', 'created_at'];
+const CURSOR_MAX_LIMIT = 1000;
+
+// 带筛选条件的总数缓存：在同一个Worker实例的请求之间共享，过期或超出条数后重新计数
+const COUNT_CACHE_TTL_MS = 60 * 1000;
+const COUNT_CACHE_MAX_ENTRIES = 200;
+const countCache = new Map<string, { total: number; expires: number }>();
+
+interface ProductCursor {
+  s: string;   // 排序字段
+  o: string;   // ASC / DESC
+  v: any;      // 上一页最后一行的排序值
+  id: number;  // 上一页最后一行的id
+}
+
+function encodeCursor(cursor: ProductCursor): string {
+  let binary = '';
+  new TextEncoder().encode(JSON.stringify(cursor)).forEach(byte => { binary += String.fromCharCode(byte); });
+  return btoa(binary).replace(/\+/g, '-').replace(/\//g, '_').replace(/=+$/, '');
+}
+
+function decodeCursor(token: string): ProductCursor | null {
+  try {
+    const base64 = token.replace(/-/g, '+').replace(/_/g, '/');
+    const binary = atob(base64 + '='.repeat((4 - base64.length % 4) % 4));
+    const cursor = JSON.parse(new TextDecoder().decode(Uint8Array.from(binary, ch => ch.charCodeAt(0))));
+    return cursor && Number.isInteger(cursor.id) ? cursor : null;
+  } catch (error) {
+    return null;
+  }
+}
+
+// 商品总数：没有筛选条件时读 stats_totals 汇总行（migrations/0005）；
+// 有筛选条件时 COUNT(*)，结果缓存 COUNT_CACHE_TTL_MS，useCache 为 false 时重新计数并刷新缓存
+async function countProducts(env: Bindings, whereClause: string, params: any[], useCache: boolean): Promise<number> {
+  if (params.length === 0) {
+    try {
+      const rollup: any = await env.DB.prepare('SELECT total_products FROM stats_totals WHERE id = 1').first();
+      if (rollup) {
+        return rollup.total_products || 0;
+      }
+    } catch (error) {
+      // 汇总表还没有迁移时回退到直接计数
+      console.error('Read product count rollup error:', error);
+    }
+  }
+
+  const key = `${whereClause}|${JSON.stringify(params)}`;
+  const now = Date.now();
+  const cached = countCache.get(key);
+  if (useCache && cached && cached.expires > now) {
+    return cached.total;
+  }
+
+  const countResult: any = await env.DB.prepare(`SELECT COUNT(*) as total FROM products ${whereClause}`)
+    .bind(...params).first();
+  const total = countResult?.total || 0;
+  if (params.length > 0) {
+    countCache.delete(key);
+    if (countCache.size >= COUNT_CACHE_MAX_ENTRIES) {
+      countCache.delete(countCache.keys().next().value);
+    }
+    countCache.set(key, { total, expires: now + COUNT_CACHE_TTL_MS });
+  }
+  return total;
+}
+
+// 三元组全文索引（migrations/0006）：3个字符以上、不含 LIKE 通配符的搜索词先用它找出候选行，
+// 再用原来的 LIKE 条件复核，结果与直接 LIKE 相同；索引还没有迁移时记下并回退到 LIKE
+const TRIGRAM_MIN_CHARS = 3;
+let trigramIndexMissing = false;
+
+function trigramMatchQuery(search: string, fields: string[] | null): string | null {
+  if (trigramIndexMissing || [...search].length < TRIGRAM_MIN_CHARS || /[%_]/.test(search)) {
+    return null;
+  }
+  const phrase = `"${search.replace(/"/g, '""')}"`;
+  return fields ? `{${fields.join(' ')}} : ${phrase}` : phrase;
+}
+
+async function listProducts(c: any): Promise<Response> {
   const { env } = c;
   
   // 获取查询参数
@@ -697,6 +778,7 @@ app.get('/api/products', async (c) => {
   const sortOrder = c.req.query('sortOrder') || 'DESC';
   
   const offset = (page - 1) * limit;
+  let usedTrigram = false;
   
   try {
     let whereClause = "WHERE status = 'active'";
@@ -710,23 +792,35 @@ app.get('/api/products', async (c) => {
       
       if (searchFields === 'all') {
         // 搜索所有字段
+        const matchQuery = trigramMatchQuery(search, null);
+        if (matchQuery) {
+          whereClause += " AND id IN (SELECT rowid FROM products_trigram WHERE products_trigram MATCH ?)";
+          params.push(matchQuery);
+          usedTrigram = true;
+        }
         whereClause += " AND (name LIKE ? OR company_name LIKE ? OR description LIKE ? OR category LIKE ? OR sku LIKE ?)";
         params.push(searchPattern, searchPattern, searchPattern, searchPattern, searchPattern);
       } else {
         // 搜索指定字段
         const fields = searchFields.split(',');
         const validFields = ['name', 'company_name', 'description', 'category', 'sku'];
-        const fieldConditions = [];
+        const searchColumns: string[] = [];
         
         fields.forEach(field => {
-          if (validFields.includes(field.trim())) {
-            fieldConditions.push(`${field.trim()} LIKE ?`);
-            params.push(searchPattern);
+          if (validFields.includes(field.trim()) && !searchColumns.includes(field.trim())) {
+            searchColumns.push(field.trim());
           }
         });
         
-        if (fieldConditions.length > 0) {
-          whereClause += " AND (" + fieldConditions.join(' OR ') + ")";
+        if (searchColumns.length > 0) {
+          const matchQuery = trigramMatchQuery(search, searchColumns);
+          if (matchQuery) {
+            whereClause += " AND id IN (SELECT rowid FROM products_trigram WHERE products_trigram MATCH ?)";
+            params.push(matchQuery);
+            usedTrigram = true;
+          }
+          whereClause += " AND (" + searchColumns.map(field => `${field} LIKE ?`).join(' OR ') + ")";
+          searchColumns.forEach(() => params.push(searchPattern));
         }
       }
     }
@@ -757,14 +851,67 @@ app.get('/api/products', async (c) => {
     }
     
     // 验证排序字段安全性
-    const allowedSortFields = ['id', 'name', 'company_name', 'price', 'stock', 'created_at'];
-    const safeSortBy = allowedSortFields.includes(sortBy) ? sortBy : 'id';
+    const safeSortBy = PRODUCTS_SORT_FIELDS.includes(sortBy) ? sortBy : 'id';
     const safeSortOrder = sortOrder.toUpperCase() === 'ASC' ? 'ASC' : 'DESC';
     
-    // 查询总数
-    const countQuery = `SELECT COUNT(*) as total FROM products ${whereClause}`;
-    const countResult = await env.DB.prepare(countQuery).bind(...params).first();
-    const total = countResult?.total || 0;
+    // 游标模式（带 cursor 参数，cursor= 为第一页）：按 (排序字段, id) 从上一页末尾继续读，不随页数变慢；
+    // 总数只在 includeTotal=1 时返回
+    const cursorParam = c.req.query('cursor');
+    if (cursorParam !== undefined) {
+      const cursorLimit = Math.min(Math.max(limit || 20, 1), CURSOR_MAX_LIMIT);
+      let keysetClause = whereClause;
+      const keysetParams = [...params];
+      
+      if (cursorParam) {
+        const cursor = decodeCursor(cursorParam);
+        if (!cursor || cursor.s !== safeSortBy || cursor.o !== safeSortOrder) {
+          return c.json({ success: false, error: '无效的游标（排序方式需与上一页一致）' }, 400);
+        }
+        const op = safeSortOrder === 'ASC' ? '>' : '<';
+        if (safeSortBy === 'id') {
+          keysetClause += ` AND id ${op} ?`;
+          keysetParams.push(cursor.id);
+        } else {
+          keysetClause += ` AND (${safeSortBy}, id) ${op} (?, ?)`;
+          keysetParams.push(cursor.v, cursor.id);
+        }
+      }
+      
+      const orderBy = safeSortBy === 'id' ? `id ${safeSortOrder}` : `${safeSortBy} ${safeSortOrder}, id ${safeSortOrder}`;
+      // 多取一行用来判断是否还有下一页
+      const result = await env.DB.prepare(`
+        SELECT id, name, company_name, price, stock, description, category, sku, status, 
+               created_at, updated_at
+        FROM products 
+        ${keysetClause}
+        ORDER BY ${orderBy}
+        LIMIT ?
+      `).bind(...keysetParams, cursorLimit + 1).all();
+      
+      const rows = result.results as any[];
+      const hasMore = rows.length > cursorLimit;
+      if (hasMore) {
+        rows.length = cursorLimit;
+      }
+      const last = rows[rows.length - 1];
+      const includeTotal = ['1', 'true'].includes(c.req.query('includeTotal') || '');
+      
+      return c.json({
+        success: true,
+        data: rows,
+        pagination: {
+          limit: cursorLimit,
+          hasMore,
+          nextCursor: hasMore
+            ? encodeCursor({ s: safeSortBy, o: safeSortOrder, v: last[safeSortBy], id: last.id })
+            : null,
+          total: includeTotal ? await countProducts(env, whereClause, params, true) : null
+        }
+      });
+    }
+    
+    // 查询总数：第一页总是重新计数，后面的页复用缓存的总数
+    const total = await countProducts(env, whereClause, params, page > 1);
     
     // 查询商品数据
     const dataQuery = `
@@ -792,9 +939,43 @@ app.get('/api/products', async (c) => {
     });
     
   } catch (error) {
+    if (usedTrigram && String(error).includes('products_trigram')) {
+      // 三元组索引还没有迁移：之后的请求都用 LIKE
+      console.error('Trigram index unavailable, falling back to LIKE:', error);
+      trigramIndexMissing = true;
+      return listProducts(c);
+    }
     console.error('Query products error:', error);
     return c.json({ success: false, error: '查询商品失败' }, 500);
   }
+}
+
+app.get('/api/products', listProducts);
+
+// 按id游标分页导出已有SKU，供导入工具在本地过滤已存在的商品（需注册在 /api/products/:id 之前）
+app.get('/api/products/skus', async (c) => {
+  const { env } = c;
+  const afterId = parseInt(c.req.query('afterId') || '0');
+  const limit = Math.min(parseInt(c.req.query('limit') || '5000'), 10000);
+
+  try {
+    const result = await env.DB.prepare(`
+      SELECT id, sku FROM products WHERE id > ? AND sku IS NOT NULL ORDER BY id LIMIT ?
+    `).bind(afterId, limit).all();
+
+    const rows = result.results as { id: number; sku: string }[];
+    return c.json({
+      success: true,
+      data: {
+        skus: rows.map(row => row.sku),
+        lastId: rows.length > 0 ? rows[rows.length - 1].id : afterId,
+        hasMore: rows.length === limit
+      }
+    });
+  } catch (error) {
+    console.error('List skus error:', error);
+    return c.json({ success: false, error: '获取SKU列表失败' }, 500);
+  }
 });
 
 // 根据ID获取单个商品
@@ -944,6 +1125,87 @@ app.delete('/api/products/:id', async (c) => {
   }
 });
 
+// 按条件批量删除商品：按 id 区间分块执行，每块一条语句，单次请求最多处理 maxChunks 块，
+// 未处理完时返回 done=false 和 nextId，客户端带上 minId=nextId 继续调用。
+// 两种模式都只改 status 并更新 updated_at，不物理删除：默认 status='inactive'（停用），
+// mode=delete 时 status='deleted'，增量导出和快照合并把它们当作删除标记（tombstone）
+const BULK_DELETE_STATEMENTS_PER_BATCH = 50; // 每次 DB.batch 的语句数（一个事务、一次往返）
+
+app.post('/api/products/bulk-delete', adminMiddleware, async (c) => {
+  const { env } = c;
+
+  try {
+    const body = await c.req.json();
+    const category: string = body.category || '';
+    const company: string = body.company || '';
+    const skuPrefix: string = body.skuPrefix || '';
+    const minId = parseInt(body.minId ?? '0') || 0;
+    const maxId = body.maxId !== undefined && body.maxId !== null ? parseInt(body.maxId) : null;
+    const dryRun = body.dryRun === true;
+    const hardDelete = body.mode === 'delete';
+    const chunkSize = Math.min(Math.max(parseInt(body.chunkSize || '5000'), 100), 20000);
+    const maxChunks = Math.min(Math.max(parseInt(body.maxChunks || '200'), 1), 500);
+
+    if (!category && !company && !skuPrefix && !minId && maxId === null) {
+      return c.json({ success: false, error: '至少需要指定一个筛选条件（category、company、skuPrefix 或 id 范围）' }, 400);
+    }
+
+    let filter = "status = 'active'";
+    const params: any[] = [];
+    if (category) {
+      filter += " AND category = ?";
+      params.push(category);
+    }
+    if (company) {
+      filter += " AND company_name = ?";
+      params.push(company);
+    }
+    if (skuPrefix) {
+      filter += " AND substr(sku, 1, ?) = ?";
+      params.push(skuPrefix.length, skuPrefix);
+    }
+
+    const range = await env.DB.prepare(`
+      SELECT MIN(id) as lo, MAX(id) as hi, COUNT(*) as matched FROM products
+      WHERE ${filter} AND id >= ? ${maxId !== null ? 'AND id <= ?' : ''}
+    `).bind(...params, minId, ...(maxId !== null ? [maxId] : [])).first<{ lo: number; hi: number; matched: number }>();
+
+    const matched = range?.matched || 0;
+    if (dryRun || matched === 0) {
+      return c.json({ success: true, data: { matched, affected: 0, dryRun, done: true, nextId: null } });
+    }
+
+    const statement = env.DB.prepare(
+      `UPDATE products SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id >= ? AND id < ? AND ${filter}`
+    );
+    const newStatus = hardDelete ? 'deleted' : 'inactive';
+
+    let affected = 0;
+    let lo = range!.lo;
+    const hi = range!.hi;
+    let chunks = 0;
+    while (chunks < maxChunks && lo <= hi) {
+      const batch: D1PreparedStatement[] = [];
+      for (; batch.length < BULK_DELETE_STATEMENTS_PER_BATCH && chunks < maxChunks && lo <= hi; chunks++) {
+        batch.push(statement.bind(newStatus, lo, Math.min(lo + chunkSize, hi + 1), ...params));
+        lo += chunkSize;
+      }
+      const results = await env.DB.batch(batch);
+      affected += results.reduce((sum, result) => sum + (result.meta?.changes || 0), 0);
+    }
+
+    const done = lo > hi;
+    return c.json({
+      success: true,
+      data: { matched, affected, dryRun: false, done, nextId: done ? null : lo }
+    });
+
+  } catch (error) {
+    console.error('Bulk delete products error:', error);
+    return c.json({ success: false, error: '批量删除商品失败' }, 500);
+  }
+});
+
 // 辅助函数：生成唯一SKU
 function generateUniqueSKU(name: string, index: number): string {
   const timestamp = Date.now().toString().slice(-6);
@@ -952,91 +1214,132 @@ function generateUniqueSKU(name: string, index: number): string {
   return `CONN-${namePrefix || 'PROD'}-${timestamp}-${randomSuffix}`;
 }
 
-// 批量导入商品
-app.post('/api/products/batch', async (c) => {
-  const { env } = c;
+// 批量导入时每条语句处理的行数：整块数据作为一个JSON数组参数绑定，用 json_each 展开
+const IMPORT_ROWS_PER_STATEMENT = 1000;
+
+const IMPORT_INSERT_SQL = `
+  INSERT OR IGNORE INTO products (name, company_name, price, stock, description, category, sku, status, created_at, updated_at)
+  SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]'), json_extract(value, '$[2]'), json_extract(value, '$[3]'),
+         json_extract(value, '$[4]'), json_extract(value, '$[5]'), json_extract(value, '$[6]'), json_extract(value, '$[7]'),
+         CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+  FROM json_each(?)
+  RETURNING sku
+`;
+
+// 辅助函数：批量导入商品，返回逐行的成功/失败统计；lineNumbers 给出错误信息中使用的行号
+// 所有查询和插入放在一次 DB.batch 调用中（一个事务、一次往返），不再每行两次往返
+async function importProducts(env: Bindings, products: Product[], lineNumbers?: number[]) {
+  const rowErrors: (string | undefined)[] = new Array(products.length);
+  const lineOf = (i: number) => lineNumbers ? lineNumbers[i] : i + 1;
+  const pending: number[] = [];
+  const batchSkus = new Set<string>();
   
-  try {
-    const { products }: { products: Product[] } = await c.req.json();
+  // 1. 验证必填字段、智能填充缺失字段；同一批中重复的SKU只保留第一次出现的行
+  for (let i = 0; i < products.length; i++) {
+    const product = products[i];
     
-    if (!Array.isArray(products) || products.length === 0) {
-      return c.json({ success: false, error: '商品数据格式错误' }, 400);
+    if (!product.name || !product.company_name || product.price === undefined || product.stock === undefined) {
+      rowErrors[i] = `第${lineOf(i)}行: 商品名称、公司名称、价格和库存为必填字段`;
+      continue;
     }
     
-    let successCount = 0;
-    let errorCount = 0;
-    const errors: string[] = [];
+    if (!product.sku) {
+      product.sku = generateUniqueSKU(product.name, i);
+    }
     
-    // 批量处理
-    for (let i = 0; i < products.length; i++) {
-      const product = products[i];
-      
+    if (!product.category) {
+      product.category = '连接器'; // 默认分类
+    }
+    
+    if (!product.description) {
+      product.description = `连接器产品 - ${product.name}`;
+    }
+    
+    if (batchSkus.has(product.sku)) {
+      rowErrors[i] = `第${lineOf(i)}行: SKU ${product.sku} 已存在，跳过导入`;
+      continue;
+    }
+    batchSkus.add(product.sku);
+    pending.push(i);
+  }
+  
+  const rowValues = (product: Product) => [
+    product.name,
+    product.company_name,
+    product.price,
+    product.stock,
+    product.description || '',
+    product.category || '',
+    product.sku || null,
+    product.status || 'active'
+  ];
+  
+  // 2. 每块一条查询（插入前已存在的有效SKU）和一条多行插入（RETURNING 返回实际插入的SKU）
+  const statements: D1PreparedStatement[] = [];
+  for (let start = 0; start < pending.length; start += IMPORT_ROWS_PER_STATEMENT) {
+    const chunk = pending.slice(start, start + IMPORT_ROWS_PER_STATEMENT);
+    statements.push(env.DB.prepare(`
+      SELECT sku FROM products WHERE status = 'active' AND sku IN (SELECT value FROM json_each(?))
+    `).bind(JSON.stringify(chunk.map(i => products[i].sku))));
+    statements.push(env.DB.prepare(IMPORT_INSERT_SQL).bind(JSON.stringify(chunk.map(i => rowValues(products[i])))));
+  }
+  
+  const existing = new Set<string>();
+  const inserted = new Set<string>();
+  try {
+    const results = statements.length > 0 ? await env.DB.batch<{ sku: string }>(statements) : [];
+    results.forEach((result, k) => {
+      for (const row of result.results || []) {
+        (k % 2 === 0 ? existing : inserted).add(row.sku);
+      }
+    });
+  } catch (error) {
+    // 整批失败时事务已回滚，逐行重试以便把错误定位到具体的行
+    console.error('Batch insert failed, retrying row by row:', error);
+    for (const i of pending) {
       try {
-        // 验证必填字段
-        if (!product.name || !product.company_name || product.price === undefined || product.stock === undefined) {
-          errors.push(`第${i + 1}行: 商品名称、公司名称、价格和库存为必填字段`);
-          errorCount++;
+        const existingProduct = await env.DB.prepare(`
+          SELECT id FROM products WHERE sku = ? AND status = 'active'
+        `).bind(products[i].sku).first();
+        if (existingProduct) {
+          existing.add(products[i].sku!);
           continue;
         }
-        
-        // 智能填充缺失字段
-        if (!product.sku) {
-          product.sku = generateUniqueSKU(product.name, i);
-        }
-        
-        if (!product.category) {
-          product.category = '连接器'; // 默认分类
-        }
-        
-        if (!product.description) {
-          product.description = `连接器产品 - ${product.name}`;
-        }
-        
-        // 先检查SKU是否已存在（用于统计）
-        let isUpdate = false;
-        if (product.sku) {
-          const existingProduct = await env.DB.prepare(`
-            SELECT id FROM products WHERE sku = ? AND status = 'active'
-          `).bind(product.sku).first();
-          
-          if (existingProduct) {
-            isUpdate = true;
-            errors.push(`第${i + 1}行: SKU ${product.sku} 已存在，跳过导入`);
-            errorCount++;
-            continue;
-          }
-        }
-        
-        // 使用INSERT OR IGNORE来安全插入，避免约束冲突
-        const result = await env.DB.prepare(`
-          INSERT OR IGNORE INTO products (name, company_name, price, stock, description, category, sku, status, created_at, updated_at)
-          VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-        `).bind(
-          product.name,
-          product.company_name,
-          product.price,
-          product.stock,
-          product.description || '',
-          product.category || '',
-          product.sku || null,
-          product.status || 'active'
-        ).run();
-        
-        // 检查是否实际插入了记录
-        if (result.changes === 0 && product.sku) {
-          // 记录未插入，说明存在冲突（但这不应该发生，因为我们已经检查过了）
-          errors.push(`第${i + 1}行: SKU ${product.sku} 插入失败，可能存在冲突`);
-          errorCount++;
-          continue;
+        const result = await env.DB.prepare(IMPORT_INSERT_SQL).bind(JSON.stringify([rowValues(products[i])])).all<{ sku: string }>();
+        if (result.results && result.results.length > 0) {
+          inserted.add(products[i].sku!);
         }
-        
-        successCount++;
-        
-      } catch (error) {
-        errors.push(`第${i + 1}行: ${error}`);
-        errorCount++;
+      } catch (rowError) {
+        rowErrors[i] = `第${lineOf(i)}行: ${rowError}`;
       }
     }
+  }
+  
+  // 3. 没有插入的行：插入前已存在的是重复导入，否则是与停用商品的SKU冲突
+  for (const i of pending) {
+    const sku = products[i].sku!;
+    if (rowErrors[i] || inserted.has(sku)) continue;
+    rowErrors[i] = existing.has(sku)
+      ? `第${lineOf(i)}行: SKU ${sku} 已存在，跳过导入`
+      : `第${lineOf(i)}行: SKU ${sku} 插入失败，可能存在冲突`;
+  }
+  
+  const errors = rowErrors.filter((error): error is string => error !== undefined);
+  return { successCount: products.length - errors.length, errorCount: errors.length, errors };
+}
+
+// 批量导入商品
+app.post('/api/products/batch', async (c) => {
+  const { env } = c;
+  
+  try {
+    const { products }: { products: Product[] } = await c.req.json();
+    
+    if (!Array.isArray(products) || products.length === 0) {
+      return c.json({ success: false, error: '商品数据格式错误' }, 400);
+    }
+    
+    const { successCount, errorCount, errors } = await importProducts(env, products);
     
     return c.json({
       success: true,
@@ -1054,6 +1357,97 @@ app.post('/api/products/batch', async (c) => {
   }
 });
 
+// NDJSON流式导入：请求体每行一个商品JSON对象，可以用 Content-Encoding: gzip 压缩；
+// 边接收边解析，每攒够 NDJSON_FLUSH_ROWS 行写入一次，内存中只保留当前这一块
+const NDJSON_FLUSH_ROWS = 100;
+const NDJSON_MAX_ERRORS = 100;
+
+app.post('/api/products/import-ndjson', async (c) => {
+  const { env } = c;
+  
+  const body = c.req.raw.body;
+  if (!body) {
+    return c.json({ success: false, error: '请求体为空' }, 400);
+  }
+  
+  let total = 0;
+  let successCount = 0;
+  let errorCount = 0;
+  const errors: string[] = [];
+  let products: Product[] = [];
+  let lineNumbers: number[] = [];
+  let lineNumber = 0;
+  
+  const flush = async () => {
+    if (products.length === 0) return;
+    const result = await importProducts(env, products, lineNumbers);
+    successCount += result.successCount;
+    errorCount += result.errorCount;
+    errors.push(...result.errors.slice(0, NDJSON_MAX_ERRORS - errors.length));
+    products = [];
+    lineNumbers = [];
+  };
+  
+  const handleLine = async (line: string) => {
+    lineNumber++;
+    if (!line.trim()) return;
+    total++;
+    let product: any;
+    try {
+      product = JSON.parse(line);
+    } catch {
+      product = null;
+    }
+    if (!product || typeof product !== 'object' || Array.isArray(product)) {
+      errorCount++;
+      if (errors.length < NDJSON_MAX_ERRORS) errors.push(`第${lineNumber}行: 不是有效的JSON对象`);
+      return;
+    }
+    products.push(product);
+    lineNumbers.push(lineNumber);
+    if (products.length >= NDJSON_FLUSH_ROWS) await flush();
+  };
+  
+  try {
+    let stream: ReadableStream<Uint8Array> = body;
+    if ((c.req.header('Content-Encoding') || '').toLowerCase().includes('gzip')) {
+      stream = stream.pipeThrough(new DecompressionStream('gzip'));
+    }
+    const reader = stream.pipeThrough(new TextDecoderStream()).getReader();
+    
+    let buffered = '';
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      const lines = (buffered + value).split('\n');
+      buffered = lines.pop() || '';
+      for (const line of lines) {
+        await handleLine(line);
+      }
+    }
+    await handleLine(buffered);
+    await flush();
+    
+    return c.json({
+      success: true,
+      data: {
+        total,
+        successCount,
+        errorCount,
+        errors
+      }
+    });
+    
+  } catch (error) {
+    console.error('NDJSON import error:', error);
+    return c.json({
+      success: false,
+      error: `流式导入失败: ${error}`,
+      data: { total, successCount, errorCount, errors }
+    }, 500);
+  }
+});
+
 // CSV文本批量导入API
 app.post('/api/products/import-csv', async (c) => {
   const { env } = c;
@@ -1138,7 +1532,12 @@ app.post('/api/products/import-csv', async (c) => {
         '库存�': '库存',
         'Ϻ': '海'
       };
-      
+
+      // 干净的UTF-8（客户端已用 transcode_csv.py 转码）不含任何乱码字符，直接返回，不做逐条正则替换
+      if (!/[�ƼϺֿ]/.test(text)) {
+        return text;
+      }
+
       let result = text;
       for (const [gbk, utf8] of Object.entries(gbkMappings)) {
         result = result.replace(new RegExp(gbk, 'g'), utf8);
@@ -1382,6 +1781,39 @@ app.get('/api/search-fields', async (c) => {
 app.get('/api/stats', async (c) => {
   const { env } = c;
   
+  try {
+    // 汇总表由 products 上的触发器增量维护（migrations/0005），读取只需两次主键/索引查找，合并为一次往返
+    const [totals, categories] = await env.DB.batch([
+      env.DB.prepare(`
+        SELECT total_products, total_stock, total_value, total_companies FROM stats_totals WHERE id = 1
+      `),
+      env.DB.prepare(`
+        SELECT category, product_count as count
+        FROM stats_categories
+        WHERE category != ''
+        ORDER BY product_count DESC
+        LIMIT 10
+      `)
+    ]);
+    const rollup: any = totals.results?.[0];
+    
+    if (rollup) {
+      return c.json({
+        success: true,
+        data: {
+          totalProducts: rollup.total_products || 0,
+          totalStock: rollup.total_stock || 0,
+          totalValue: rollup.total_value || 0,
+          totalCompanies: rollup.total_companies || 0,
+          topCategories: categories.results
+        }
+      });
+    }
+  } catch (error) {
+    // 汇总表还没有迁移时回退到直接聚合
+    console.error('Read stats rollup error:', error);
+  }
+  
   try {
     // 商品总数
     const totalProducts = await env.DB.prepare(`
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+/api/stats 汇总表的校验和重建
+
+汇总表（stats_totals / stats_companies / stats_categories，见 migrations/0005）由
+products 上的触发器增量维护。这个工具从 products 全表重新聚合，与汇总表逐项比较，
+报告偏差；rebuild 在一个事务中从头重新计算汇总表，然后再校验一次。
+
+总价值是浮点数累加，长期增减后会有极小的舍入误差，相对误差在 1e-9 以内不算偏差。
+对远程库执行 rebuild 时如果同时有写入，重建期间的变更可能漏算，建议在导入间隙执行。
+
+用法:
+    python3 stats_rollup.py verify                      # 本地D1 SQLite文件
+    python3 stats_rollup.py rebuild --db standin.sqlite # 指定SQLite文件（替身API、基准数据库）
+    python3 stats_rollup.py verify --remote             # 通过 wrangler 访问远程库
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+from d1_client import STATS_ROLLUP_REBUILD_SQL, SqliteBackend, WranglerBackend, open_backend
+
+VALUE_TOLERANCE = 1e-9
+MAX_LISTED = 10
+
+EXPECTED_TOTALS_SQL = """
+    SELECT COUNT(*) as total_products, COALESCE(SUM(stock), 0) as total_stock,
+           COALESCE(SUM(price * stock), 0) as total_value, COUNT(DISTINCT company_name) as total_companies
+    FROM products WHERE status = 'active'
+"""
+EXPECTED_COMPANIES_SQL = """
+    SELECT company_name as name, COUNT(*) as count FROM products WHERE status = 'active' GROUP BY company_name
+"""
+EXPECTED_CATEGORIES_SQL = """
+    SELECT category as name, COUNT(*) as count FROM products
+    WHERE status = 'active' AND category IS NOT NULL GROUP BY category
+"""
+
+def _query(backend, sql):
+    rows = backend.query(sql)
+    if rows is None:
+        raise RuntimeError(f"查询失败: {' '.join(sql.split())[:80]}")
+    return rows
+
+def _counts(rows):
+    return {row['name']: row['count'] for row in rows}
+
+def diff_counts(label, expected, actual):
+    """比较两个 {名称: 数量} 字典，返回偏差描述列表"""
+    problems = []
+    for name in sorted(set(expected) | set(actual), key=str):
+        e, a = expected.get(name, 0), actual.get(name, 0)
+        if e != a:
+            problems.append(f"{label} {name!r}: 汇总表 {a}，实际 {e}")
+    return problems
+
+def verify(backend):
+    """返回偏差描述列表（空列表表示汇总表正确）"""
+    actual_rows = _query(backend, "SELECT * FROM stats_totals WHERE id = 1")
+    if not actual_rows:
+        return ["stats_totals 中没有汇总行（id = 1）"]
+    actual = actual_rows[0]
+    expected = _query(backend, EXPECTED_TOTALS_SQL)[0]
+
+    problems = []
+    for key in ('total_products', 'total_stock', 'total_companies'):
+        if expected[key] != actual[key]:
+            problems.append(f"{key}: 汇总表 {actual[key]}，实际 {expected[key]}（偏差 {actual[key] - expected[key]:+}）")
+    drift = actual['total_value'] - expected['total_value']
+    if abs(drift) > VALUE_TOLERANCE * max(1.0, abs(expected['total_value'])):
+        problems.append(f"total_value: 汇总表 {actual['total_value']}，实际 {expected['total_value']}（偏差 {drift:+.6f}）")
+
+    problems += diff_counts('公司', _counts(_query(backend, EXPECTED_COMPANIES_SQL)), _counts(_query(
+        backend, "SELECT company_name as name, product_count as count FROM stats_companies")))
+    problems += diff_counts('分类', _counts(_query(backend, EXPECTED_CATEGORIES_SQL)), _counts(_query(
+        backend, "SELECT category as name, product_count as count FROM stats_categories")))
+    return problems
+
+def rebuild(backend):
+    """在一个事务中从 products 重新计算汇总表"""
+    if isinstance(backend, SqliteBackend):
+        backend.conn.executescript(f"BEGIN;\n{STATS_ROLLUP_REBUILD_SQL}\nCOMMIT;")
+        return
+    with tempfile.NamedTemporaryFile('w', suffix='.sql', delete=False, encoding='utf-8') as f:
+        f.write(STATS_ROLLUP_REBUILD_SQL)
+    try:
+        if backend.execute_file(f.name) is None:
+            raise RuntimeError("执行重建SQL失败")
+    finally:
+        os.remove(f.name)
+
+def open_target(args, writable):
+    if args.db:
+        return SqliteBackend(args.db, readonly=not writable)
+    if args.remote:
+        return WranglerBackend(remote=True)
+    backend = open_backend('sqlite')
+    if writable:
+        backend.close()
+        backend = SqliteBackend(backend.path, readonly=False)
+    return backend
+
+def main():
+    parser = argparse.ArgumentParser(description='/api/stats 汇总表的校验和重建')
+    parser.add_argument('command', choices=['verify', 'rebuild'])
+    parser.add_argument('--db', help='SQLite数据库文件（默认使用本地D1文件）')
+    parser.add_argument('--remote', action='store_true', help='通过 wrangler 访问远程数据库')
+    args = parser.parse_args()
+
+    backend = open_target(args, writable=args.command == 'rebuild')
+    try:
+        if args.command == 'rebuild':
+            print("🔄 从 products 重新计算汇总表...")
+            rebuild(backend)
+        problems = verify(backend)
+    finally:
+        backend.close()
+
+    if not problems:
+        print("✅ 汇总表与 products 一致")
+        return
+    print(f"⚠️  发现 {len(problems)} 处偏差:")
+    for problem in problems[:MAX_LISTED]:
+        print(f"   {problem}")
+    if len(problems) > MAX_LISTED:
+        print(f"   ……共 {len(problems)} 处")
+    print("   可以运行 python3 stats_rollup.py rebuild 重新计算")
+    sys.exit(1)
+
+if __name__ == '__main__':
+    main()
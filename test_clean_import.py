@@ -1,15 +1,16 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import requests
 import json
 import csv
 from io import StringIO
 
+from d1_client import API_BASE_URL, ApiClient
+
 def test_clean_import():
     """在清空数据库后测试导入前5条数据"""
     
-    base_url = "https://3000-i210jj9hxq7tsgvpii0sp-6532622b.e2b.dev"
+    api = ApiClient()
     
     print("📄 读取CSV文件前5条数据...")
     
@@ -39,19 +40,12 @@ def test_clean_import():
     for i, product in enumerate(test_products, 1):
         print(f"   {i}. {product['name']} (SKU: {product['sku']})")
     
-    print(f"\n📤 测试导入（无认证）...")
+    print(f"\n📤 测试导入...")
     
-    # 测试导入（这个API不需要认证）
-    headers = {"Content-Type": "application/json"}
     import_data = {"products": test_products}
     
     try:
-        response = requests.post(
-            f"{base_url}/api/products/batch",
-            json=import_data,
-            headers=headers,
-            timeout=30
-        )
+        response = api.post("/api/products/batch", json=import_data, timeout=30)
         
         print(f"导入响应状态: {response.status_code}")
         
@@ -89,7 +83,7 @@ if __name__ == '__main__':
     if success:
         print(f"\n✅ 前5条数据导入成功！")
         print(f"💡 现在您可以在前端使用相同的CSV文件进行批量导入")
-        print(f"🔗 访问: https://3000-i210jj9hxq7tsgvpii0sp-6532622b.e2b.dev")
+        print(f"🔗 访问: {API_BASE_URL}")
         print(f"🔑 登录: admin/admin")
     else:
         print(f"\n❌ 导入测试失败，请检查问题")
\ No newline at end of file
@@ -1,37 +1,28 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import requests
-import json
+from d1_client import ApiClient, ApiError
 
 def test_complete_auth_flow():
     """测试完整的认证和API访问流程"""
     
-    base_url = "https://3000-i210jj9hxq7tsgvpii0sp-6532622b.e2b.dev"
+    api = ApiClient()
     
     print("🔐 步骤1: 管理员登录...")
     
-    # 1. 管理员登录
-    response = requests.post(
-        f"{base_url}/api/auth/login",
-        json={"username": "admin", "password": "admin"},
-        headers={"Content-Type": "application/json"}
-    )
-    
-    if response.status_code != 200 or not response.json().get("success"):
-        print(f"❌ 登录失败: {response.text}")
+    # 1. 管理员登录（强制重新登录，验证登录接口本身）
+    try:
+        admin_token = api.login(force=True)
+    except ApiError as e:
+        print(f"❌ {e}")
         return
     
-    admin_token = response.json()["data"]["token"]
     print(f"✅ 管理员登录成功! Token: {admin_token[:50]}...")
     
     print(f"\n📊 步骤2: 访问统计信息API...")
     
     # 2. 使用Token访问受保护的API
-    response = requests.get(
-        f"{base_url}/api/stats",
-        headers={"Authorization": f"Bearer {admin_token}"}
-    )
+    response = api.get("/api/stats")
     
     if response.status_code == 200:
         stats = response.json()
@@ -50,10 +41,7 @@ def test_complete_auth_flow():
     print(f"\n📋 步骤3: 访问商品列表...")
     
     # 3. 获取商品列表
-    response = requests.get(
-        f"{base_url}/api/products?limit=5",
-        headers={"Authorization": f"Bearer {admin_token}"}
-    )
+    response = api.get("/api/products", params={"limit": 5})
     
     if response.status_code == 200:
         products = response.json()
@@ -71,10 +59,7 @@ def test_complete_auth_flow():
     print(f"\n🔍 步骤4: 搜索连接器商品...")
     
     # 4. 搜索连接器商品
-    response = requests.get(
-        f"{base_url}/api/products?category=连接器&limit=3",
-        headers={"Authorization": f"Bearer {admin_token}"}
-    )
+    response = api.get("/api/products", params={"category": "连接器", "limit": 3})
     
     if response.status_code == 200:
         connectors = response.json()
@@ -92,7 +77,7 @@ def test_complete_auth_flow():
     print(f"\n🚫 步骤5: 测试无Token访问(应该失败)...")
     
     # 5. 测试无Token访问
-    response = requests.get(f"{base_url}/api/stats")
+    response = api.get("/api/stats", auth=False)
     
     if response.status_code == 401:
         print("✅ 无Token访问正确被拒绝")
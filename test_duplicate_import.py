@@ -1,29 +1,26 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import requests
 import json
 import csv
 from io import StringIO
 
+from d1_client import ApiClient, ApiError
+
 def test_duplicate_import():
     """测试重复导入相同CSV数据"""
     
-    base_url = "https://3000-i210jj9hxq7tsgvpii0sp-6532622b.e2b.dev"
+    api = ApiClient()
     
     print("🔐 步骤1: 登录获取Token...")
     
-    # 1. 登录获取Token
-    response = requests.post(
-        f"{base_url}/api/auth/login",
-        json={"username": "admin", "password": "admin"}
-    )
-    
-    if response.status_code != 200:
-        print(f"❌ 登录失败: {response.text}")
+    # 1. 登录获取Token（有未过期的缓存令牌时直接复用）
+    try:
+        api.login()
+    except ApiError as e:
+        print(f"❌ {e}")
         return
     
-    token = response.json()["data"]["token"]
     print(f"✅ 登录成功!")
     
     print(f"\n📄 步骤2: 准备测试数据（前5条）...")
@@ -57,20 +54,10 @@ def test_duplicate_import():
     print(f"\n📤 步骤3: 测试重复导入...")
     
     # 3. 测试导入（这些SKU应该已经存在）
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
-    
     import_data = {"products": test_products}
     
     try:
-        response = requests.post(
-            f"{base_url}/api/products/batch",
-            json=import_data,
-            headers=headers,
-            timeout=30
-        )
+        response = api.post("/api/products/batch", json=import_data, timeout=30)
         
         print(f"导入响应状态: {response.status_code}")
         
@@ -101,10 +88,7 @@ def test_duplicate_import():
     
     # 4. 检查数据库中连接器商品总数
     try:
-        response = requests.get(
-            f"{base_url}/api/stats",
-            headers=headers
-        )
+        response = api.get("/api/stats")
         
         if response.status_code == 200:
             stats = response.json()["data"]
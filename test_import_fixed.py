@@ -2,52 +2,42 @@
 # -*- coding: utf-8 -*-
 
 import json
-import requests
-import csv
-from io import StringIO
 
-def csv_to_products(csv_content):
-    """将CSV内容转换为products数组"""
-    products = []
-    
-    csv_reader = csv.DictReader(StringIO(csv_content))
-    
-    for row in csv_reader:
-        product = {
-            "name": row.get("name", "").strip(),
-            "company_name": row.get("company_name", "").strip(),
-            "price": float(row.get("price", 0)),
-            "stock": int(row.get("stock", 0)),
-            "sku": row.get("sku", "").strip(),
-            "category": row.get("category", "").strip(),
-            "description": row.get("description", "").strip()
-        }
-        products.append(product)
-    
-    return products
+from d1_client import ApiClient
+from sku_filter import load_sku_index
+from validate_csv import load_valid_products
 
 def test_batch_import_fixed():
     """测试批量导入API（修复版本）"""
     
-    base_url = "https://3000-i210jj9hxq7tsgvpii0sp-6532622b.e2b.dev"
+    api = ApiClient()
     
     print("📄 步骤1: 读取修复后的CSV文件...")
     
-    # 1. 读取修复后的CSV文件并转换为products数组
+    # 1. 读取修复后的CSV文件，校验后转换为products数组（无效行不上传）
     csv_file = "51连接器-9.1-utf8-fixed.csv"
     try:
-        with open(csv_file, 'r', encoding='utf-8') as f:
-            csv_content = f.read()
-        
-        products = csv_to_products(csv_content)
-        print(f"✅ 成功读取CSV文件，共{len(products)}条商品数据")
+        products, rejected = load_valid_products(csv_file)
+        print(f"✅ 成功读取CSV文件，共{len(products)}条有效商品数据")
+        for line, reason in rejected[:10]:
+            print(f"⚠️  第{line}行未通过校验: {reason}")
+        if len(rejected) > 10:
+            print(f"⚠️  ……共 {len(rejected)} 行未通过校验（完整列表可用 validate_csv.py 生成）")
         print(f"📋 第一条商品示例: {json.dumps(products[0], indent=2, ensure_ascii=False)}")
         
     except Exception as e:
         print(f"❌ 读取CSV文件失败: {e}")
         return
     
-    print(f"\n📤 步骤2: 测试批量导入API（无认证模式）...")
+    # 丢弃数据库中确定已存在的SKU，只上传可能是新数据的行
+    sku_index = load_sku_index(api)
+    products, skipped = sku_index.filter_new(products)
+    print(f"⏭️  跳过 {skipped} 条已存在的商品，剩余 {len(products)} 条待导入")
+    if not products:
+        print("✅ 所有商品都已存在，无需导入")
+        return
+    
+    print(f"\n📤 步骤2: 测试批量导入API...")
     
     # 2. 先尝试少量数据测试（前5条）
     test_products = products[:5]
@@ -56,15 +46,8 @@ def test_batch_import_fixed():
         "products": test_products
     }
     
-    headers = {"Content-Type": "application/json"}
-    
     try:
-        response = requests.post(
-            f"{base_url}/api/products/batch",
-            json=import_data,
-            headers=headers,
-            timeout=30
-        )
+        response = api.post("/api/products/batch", json=import_data, timeout=30)
         
         print(f"导入响应状态: {response.status_code}")
         print(f"导入响应内容: {response.text}")
@@ -80,12 +63,7 @@ def test_batch_import_fixed():
                 
                 full_import_data = {"products": products}
                 
-                response = requests.post(
-                    f"{base_url}/api/products/batch",
-                    json=full_import_data,
-                    headers=headers,
-                    timeout=60
-                )
+                response = api.post("/api/products/batch", json=full_import_data, timeout=60)
                 
                 print(f"完整导入响应状态: {response.status_code}")
                 result = response.json()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上传前的CSV编码检测和转码（GBK/GB18030 → UTF-8）
+
+取文件开头的一段字节判断编码：有BOM按BOM；能按UTF-8严格解码就是UTF-8；
+否则按GB18030（GBK的超集）解码。转码用增量解码器按固定大小的块读写，
+内存占用与文件大小无关；整个目录的分片文件用进程池并行处理，输出原子替换。
+
+这样上传到Worker的一定是干净的UTF-8，服务端不再需要乱码替换表。
+
+用法:
+    python3 transcode_csv.py 51连接器-9.1.csv                # 输出 51连接器-9.1-utf8.csv
+    python3 transcode_csv.py 9.16数据/ -o 9.16数据-utf8/ --workers 8
+    python3 transcode_csv.py 9.16数据/ --in-place
+"""
+
+import argparse
+import codecs
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from csv_common import detect_encoding, expand_inputs
+
+BLOCK_SIZE = 1024 * 1024
+
+def transcode_file(input_path, output_path, encoding=None, block_size=BLOCK_SIZE):
+    """把文件按块转码为UTF-8（无BOM），返回统计信息字典"""
+    started = time.monotonic()
+    encoding = encoding or detect_encoding(input_path)
+    decoder = codecs.getincrementaldecoder(encoding)(errors='strict')
+    tmp_path = output_path + '.tmp'
+    read_bytes = 0
+    written_bytes = 0
+
+    try:
+        with open(input_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            while True:
+                block = src.read(block_size)
+                text = decoder.decode(block, final=not block)
+                read_bytes += len(block)
+                if text:
+                    data = text.encode('utf-8')
+                    dst.write(data)
+                    written_bytes += len(data)
+                if not block:
+                    break
+    except UnicodeDecodeError as e:
+        os.remove(tmp_path)
+        raise ValueError(f"{input_path}: 第 {read_bytes} 字节之后的数据块按 {encoding} 解码失败: {e.reason}") from e
+
+    os.replace(tmp_path, output_path)
+    return {
+        'input': input_path,
+        'output': output_path,
+        'encoding': encoding,
+        'bytes_in': read_bytes,
+        'bytes_out': written_bytes,
+        'seconds': time.monotonic() - started,
+    }
+
+def output_path_for(input_path, output_dir=None, suffix='-utf8', in_place=False):
+    if in_place:
+        return input_path
+    stem, ext = os.path.splitext(os.path.basename(input_path))
+    return os.path.join(output_dir or os.path.dirname(input_path), f"{stem}{suffix}{ext or '.csv'}")
+
+def transcode_files(files, output_dir=None, suffix='-utf8', in_place=False, workers=None):
+    """并行转码多个文件，返回每个文件的统计信息"""
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = {
+            pool.submit(transcode_file, path, output_path_for(path, output_dir, suffix, in_place)): path
+            for path in files
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"❌ {path}: {e}")
+                results.append({'input': path, 'error': str(e), 'bytes_in': 0, 'bytes_out': 0})
+    return sorted(results, key=lambda r: r['input'])
+
+def main():
+    parser = argparse.ArgumentParser(description='检测CSV编码并转码为UTF-8')
+    parser.add_argument('inputs', nargs='+', help='CSV文件、目录或通配符')
+    parser.add_argument('-o', '--output-dir', help='输出目录（默认与输入文件相同）')
+    parser.add_argument('--suffix', default='-utf8', help='输出文件名后缀')
+    parser.add_argument('--in-place', action='store_true', help='直接替换原文件')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='并行进程数')
+    parser.add_argument('--detect-only', action='store_true', help='只检测编码，不转码')
+    args = parser.parse_args()
+
+    files = expand_inputs(args.inputs)
+    if not files:
+        print("❌ 没有找到CSV文件")
+        sys.exit(1)
+
+    if args.detect_only:
+        for path in files:
+            try:
+                print(f"{path}: {detect_encoding(path)}")
+            except ValueError as e:
+                print(f"❌ {e}")
+        return
+
+    print(f"🔧 转码 {len(files)} 个文件，{args.workers} 个进程并行...")
+    started = time.monotonic()
+    results = transcode_files(files, args.output_dir, args.suffix, args.in_place, args.workers)
+    elapsed = time.monotonic() - started
+
+    failed = [r for r in results if 'error' in r]
+    by_encoding = {}
+    for r in results:
+        if 'encoding' in r:
+            by_encoding[r['encoding']] = by_encoding.get(r['encoding'], 0) + 1
+    megabytes = sum(r['bytes_in'] for r in results) / 1e6
+
+    print(f"\n🎉 转码完成! {len(results) - len(failed)}/{len(results)} 个文件成功，"
+          f"编码分布: {', '.join(f'{k}={v}' for k, v in sorted(by_encoding.items()))}")
+    print(f"📊 共 {megabytes:.1f} MB，耗时 {elapsed:.2f}s ({megabytes / elapsed if elapsed else 0:.1f} MB/秒)")
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+导入前的CSV批量校验和规范化
+
+把整个CSV读成按列存放的数组，逐列批量检查：
+  - 商品名称、公司名称不能为空
+  - 价格为非负十进制数，最多6位小数（直接按字符串校验，不经过float，不会有精度误差）
+  - 库存为非负整数
+  - 文件内SKU重复、规范化后的 (名称, 公司) 重复（只保留第一次出现的行）
+
+通过校验的行写入 *-clean.csv（价格、库存已规范化），其余行连同行号和原因
+写入 *-rejected.csv。只有干净的行才需要发送到 /api/products/batch。
+
+用法:
+    python3 validate_csv.py 51连接器-9.1-utf8-fixed.csv
+    python3 validate_csv.py 9.16数据/ -o validated/ --workers 8
+    python3 validate_csv.py part_001.csv --allow-duplicate-names
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from csv_common import FIELD_MAPPING, detect_encoding, expand_inputs, normalize_key, normalize_prices, normalize_stocks
+
+REQUIRED_FIELDS = ['name', 'company_name', 'price', 'stock']
+
+def read_columns(path, encoding=None):
+    """读取CSV为 (字段名列表, {字段: 值列表}, 行号列表)，缺少的单元格补空字符串"""
+    encoding = encoding or detect_encoding(path)
+    if encoding == 'utf-8':
+        encoding = 'utf-8-sig'
+    with open(path, 'r', encoding=encoding, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            raise ValueError(f"{path} 是空文件")
+        fields = [FIELD_MAPPING.get(h.strip(), h.strip()) for h in header]
+        width = len(fields)
+        records = []
+        lines = []
+        for record in reader:
+            if not record or not any(record):
+                continue
+            if len(record) < width:
+                record += [''] * (width - len(record))
+            records.append(record[:width])
+            lines.append(reader.line_num)
+
+    missing = [f for f in REQUIRED_FIELDS if f not in fields]
+    if missing:
+        raise ValueError(f"{path} 缺少必须的列: {', '.join(missing)}")
+    columns = dict(zip(fields, map(list, zip(*records)))) if records else {f: [] for f in fields}
+    return fields, columns, lines
+
+def check_required(values):
+    return [None if v.strip() else '为空' for v in values]
+
+def find_duplicates(keys, lines, label):
+    """重复出现的键（第一次出现的行除外）返回原因，空键不参与比较"""
+    counts = Counter(k for k in keys if k)
+    if all(n == 1 for n in counts.values()):
+        return [None] * len(keys)
+    first_seen = {}
+    reasons = []
+    for key, line in zip(keys, lines):
+        if not key or counts[key] == 1:
+            reasons.append(None)
+        elif key in first_seen:
+            reasons.append(f"{label}与第{first_seen[key]}行重复")
+        else:
+            first_seen[key] = line
+            reasons.append(None)
+    return reasons
+
+def validate_columns(columns, lines, dedupe_names=True):
+    """按列批量校验，返回每行的错误原因列表（None 表示通过），并原地规范化价格和库存列"""
+    checks = [
+        [r and f"商品名称{r}" for r in check_required(columns['name'])],
+        [r and f"公司名称{r}" for r in check_required(columns['company_name'])],
+    ]
+    columns['name'] = [v.strip() for v in columns['name']]
+    columns['company_name'] = [v.strip() for v in columns['company_name']]
+    columns['price'], price_reasons = normalize_prices(columns['price'])
+    columns['stock'], stock_reasons = normalize_stocks(columns['stock'])
+    checks += [price_reasons, stock_reasons]
+
+    if 'sku' in columns:
+        columns['sku'] = [v.strip() for v in columns['sku']]
+        checks.append(find_duplicates(columns['sku'], lines, 'SKU'))
+    if dedupe_names:
+        keys = [f"{normalize_key(n)}\x1f{normalize_key(c)}" if n and c else ''
+                for n, c in zip(columns['name'], columns['company_name'])]
+        checks.append(find_duplicates(keys, lines, '名称和公司'))
+
+    return ['; '.join(r for r in row if r) or None for row in zip(*checks)] if lines else []
+
+def _write_atomic(path, header, rows):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    os.replace(tmp_path, path)
+
+def validate_file(input_path, clean_path, rejected_path, dedupe_names=True, encoding=None):
+    """校验单个CSV文件，写出干净文件和拒绝文件，返回统计信息字典"""
+    started = time.monotonic()
+    fields, columns, lines = read_columns(input_path, encoding)
+    raw = [columns[f][:] for f in fields]
+    reasons = validate_columns(columns, lines, dedupe_names)
+
+    clean_rows = []
+    rejected_rows = []
+    normalized = [columns[f] for f in fields]
+    for i, reason in enumerate(reasons):
+        if reason is None:
+            clean_rows.append([col[i] for col in normalized])
+        else:
+            rejected_rows.append([col[i] for col in raw] + [lines[i], reason])
+
+    _write_atomic(clean_path, fields, clean_rows)
+    if rejected_rows:
+        _write_atomic(rejected_path, fields + ['line', 'reason'], rejected_rows)
+    elif os.path.exists(rejected_path):
+        os.remove(rejected_path)
+
+    return {
+        'input': input_path,
+        'clean': clean_path,
+        'rejected': rejected_path if rejected_rows else None,
+        'rows': len(lines),
+        'valid': len(clean_rows),
+        'invalid': len(rejected_rows),
+        'seconds': time.monotonic() - started,
+    }
+
+def load_valid_products(path, dedupe_names=True):
+    """读取并校验CSV，返回 (可以上传的商品字典列表, 被拒绝的 (行号, 原因) 列表)"""
+    fields, columns, lines = read_columns(path)
+    reasons = validate_columns(columns, lines, dedupe_names)
+    products = []
+    rejected = []
+    for i, reason in enumerate(reasons):
+        if reason is not None:
+            rejected.append((lines[i], reason))
+            continue
+        product = {field: columns[field][i] for field in fields}
+        product['price'] = float(product['price'])
+        product['stock'] = int(product['stock'])
+        products.append(product)
+    return products, rejected
+
+def output_paths_for(input_path, output_dir=None):
+    stem, ext = os.path.splitext(os.path.basename(input_path))
+    directory = output_dir or os.path.dirname(input_path)
+    ext = ext or '.csv'
+    return os.path.join(directory, f"{stem}-clean{ext}"), os.path.join(directory, f"{stem}-rejected{ext}")
+
+def validate_files(files, output_dir=None, workers=None, dedupe_names=True):
+    """用进程池并行校验多个文件，返回每个文件的统计信息"""
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = {
+            pool.submit(validate_file, path, *output_paths_for(path, output_dir), dedupe_names): path
+            for path in files
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"❌ {path}: {e}")
+                results.append({'input': path, 'error': str(e), 'rows': 0, 'valid': 0, 'invalid': 0})
+    return sorted(results, key=lambda r: r['input'])
+
+def main():
+    parser = argparse.ArgumentParser(description='导入前批量校验CSV，拆分为干净文件和拒绝文件')
+    parser.add_argument('inputs', nargs='+', help='CSV文件、目录或通配符')
+    parser.add_argument('-o', '--output-dir', help='输出目录（默认与输入文件相同）')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='并行进程数')
+    parser.add_argument('--allow-duplicate-names', action='store_true',
+                        help='不检查名称和公司相同的重复行（只检查SKU重复）')
+    args = parser.parse_args()
+
+    files = [f for f in expand_inputs(args.inputs) if not f.endswith(('-clean.csv', '-rejected.csv'))]
+    if not files:
+        print("❌ 没有找到CSV文件")
+        sys.exit(1)
+
+    print(f"🔍 校验 {len(files)} 个文件，{args.workers} 个进程并行...")
+    started = time.monotonic()
+    results = validate_files(files, args.output_dir, args.workers, not args.allow_duplicate_names)
+    elapsed = time.monotonic() - started
+
+    for r in results:
+        if r.get('invalid'):
+            print(f"⚠️  {r['input']}: {r['invalid']}/{r['rows']} 行未通过校验 → {r['rejected']}")
+
+    rows = sum(r['rows'] for r in results)
+    valid = sum(r['valid'] for r in results)
+    failed = [r for r in results if 'error' in r]
+    print(f"\n🎉 校验完成! {len(results) - len(failed)}/{len(results)} 个文件成功")
+    print(f"📊 共 {rows} 行，通过 {valid} 行，拒绝 {rows - valid} 行，耗时 {elapsed:.2f}s "
+          f"({rows / elapsed if elapsed else 0:,.0f} 行/秒)")
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()